@@ -0,0 +1,230 @@
+import functools
+import inspect
+import math
+import threading
+import time
+
+import jwt
+from flask import request, jsonify, current_app
+
+from config import ADMISSION_CONTROL_ENABLED, ADMISSION_QUEUE_TIMEOUT
+from db import logger
+from redis_client import get_redis
+from ttl_cache import TTLCache, MISSING
+
+# rate: tokens refilled per second per user, burst: bucket size,
+# max_concurrent: in-flight requests per endpoint and process, max_queue: requests allowed to wait for a slot
+ENDPOINT_LIMITS = {
+    "chat": {"rate": 1.0, "burst": 10, "max_concurrent": 16, "max_queue": 32},
+    "ask": {"rate": 0.5, "burst": 5, "max_concurrent": 8, "max_queue": 16},
+    "ocr": {"rate": 0.2, "burst": 3, "max_concurrent": 2, "max_queue": 4},
+}
+
+# Atomic refill-and-take on a Redis hash so every worker shares the same bucket
+_REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Take one token; returns (allowed, seconds until a token is available)."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True, 0.0
+            return False, (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    def __init__(self, endpoint, rate, burst, max_concurrent, max_queue, queue_timeout=5.0, redis_client=None):
+        self.endpoint = endpoint
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.redis = redis_client
+        self.redis_down = False
+        self._buckets = TTLCache(maxsize=50000, ttl=max(60, math.ceil(burst / rate) * 2))
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.counters = {"admitted": 0, "rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _redis_state(self, down, error=None):
+        """Log when Redis goes down or comes back, once per outage rather than on every request."""
+        with self._lock:
+            if self.redis_down == down:
+                return
+            self.redis_down = down
+        if down:
+            logger.warning(f"Redis token bucket unavailable for {self.endpoint}, using local buckets: {error}")
+        else:
+            logger.info(f"Redis token bucket for {self.endpoint} is back")
+
+    def take_token(self, client_key):
+        if self.redis is not None:
+            try:
+                allowed, tokens = self.redis.eval(
+                    _REDIS_TOKEN_BUCKET, 1, f"admission:{self.endpoint}:{client_key}",
+                    self.rate, self.burst, time.time()
+                )
+                self._redis_state(down=False)
+                return bool(allowed), 0.0 if allowed else (1 - float(tokens)) / self.rate
+            except Exception as e:
+                self._redis_state(down=True, error=e)
+        bucket = self._buckets.get(client_key)
+        if bucket is MISSING:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets.set(client_key, bucket)
+        return bucket.take()
+
+    def acquire_slot(self):
+        """Wait for an in-flight slot; returns None when admitted or a rejection reason."""
+        if self._slots.acquire(blocking=False):
+            with self._lock:
+                self.in_flight += 1
+            return None
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                return "queue_full"
+            self.waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        if not acquired:
+            return "queue_timeout"
+        with self._lock:
+            self.in_flight += 1
+        return None
+
+    def release_slot(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                **self.counters,
+            }
+
+
+controllers = {
+    endpoint: AdmissionController(endpoint, queue_timeout=ADMISSION_QUEUE_TIMEOUT, redis_client=get_redis(), **limits)
+    for endpoint, limits in ENDPOINT_LIMITS.items()
+}
+
+
+def get_admission_metrics():
+    return {endpoint: controller.metrics() for endpoint, controller in controllers.items()}
+
+
+def _client_key():
+    """Bucket key: the authenticated user, else the client address.
+
+    request.remote_addr is the peer address unless app.py wraps the app in ProxyFix for
+    TRUSTED_PROXY_HOPS proxies; X-Forwarded-For is never read here, since clients set it freely.
+    """
+    token = request.headers.get('Authorization', '').strip()
+    if token.lower().startswith('bearer '):
+        token = token[7:]
+    if token:
+        try:
+            decoded = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+            if decoded.get("user_id"):
+                return f"user:{decoded['user_id']}"
+        except jwt.InvalidTokenError:
+            pass
+    return f"ip:{request.remote_addr or ''}"
+
+
+def _reject(controller, reason, retry_after):
+    controller._count(reason)
+    retry_after = max(1, math.ceil(retry_after))
+    logger.warning(f"Admission rejected for {controller.endpoint} ({reason}), retry after {retry_after}s")
+    response = jsonify({"error": "Too many requests—this space is at capacity, try again shortly! 🚦"})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def _admit(controller):
+    allowed, retry_after = controller.take_token(_client_key())
+    if not allowed:
+        return _reject(controller, "rate_limited", retry_after)
+    reason = controller.acquire_slot()
+    if reason:
+        return _reject(controller, reason, controller.queue_timeout)
+    controller._count("admitted")
+    return None
+
+
+def admission_controlled(endpoint):
+    """Limit a route with the per-user bucket and concurrency cap configured for `endpoint`."""
+    controller = controllers[endpoint]
+
+    def decorator(f):
+        if inspect.iscoroutinefunction(f):
+            @functools.wraps(f)
+            async def decorated(*args, **kwargs):
+                if not ADMISSION_CONTROL_ENABLED:
+                    return await f(*args, **kwargs)
+                rejection = _admit(controller)
+                if rejection is not None:
+                    return rejection
+                try:
+                    return await f(*args, **kwargs)
+                finally:
+                    controller.release_slot()
+            return decorated
+
+        @functools.wraps(f)
+        def decorated(*args, **kwargs):
+            if not ADMISSION_CONTROL_ENABLED:
+                return f(*args, **kwargs)
+            rejection = _admit(controller)
+            if rejection is not None:
+                return rejection
+            try:
+                return f(*args, **kwargs)
+            finally:
+                controller.release_slot()
+        return decorated
+    return decorator
@@ -0,0 +1,151 @@
+import bisect
+import queue
+import sqlite3
+import threading
+from collections import defaultdict
+
+import httpx
+
+from db import logger, db_path
+from deal_models import comp_type, deal_value
+from list_views import table_version
+from notifications import notification_service
+from utils import get_user_settings, get_webhook_url, log_user_activity
+
+DEAL_ALERT_SMS_TO = "+1234567890"
+
+
+class AlertIndex:
+    """Deal-alert thresholds held in memory, sorted per (user, deal type).
+
+    Alerts fire when a deal is worth more than the threshold, so the matches for a value
+    are a prefix of the sorted list found with one bisect: O(log n + matches).
+
+    Each user's thresholds are loaded on first use and re-read whenever their deal_alerts
+    version in table_versions (bumped by triggers on every write) moves, so alerts set
+    through another worker process take effect here on the next match.
+    """
+
+    def __init__(self):
+        self._thresholds = defaultdict(list)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _refresh_user(self, user_id, cursor):
+        version = table_version(user_id, "deal_alerts", cursor)
+        if self._versions.get(user_id) == version:
+            return
+        cursor.execute("SELECT deal_type, threshold FROM deal_alerts WHERE user_id = ?", (user_id,))
+        rows = cursor.fetchall()
+        with self._lock:
+            for key in [k for k in self._thresholds if k[0] == user_id]:
+                del self._thresholds[key]
+            for deal_type, threshold in rows:
+                bisect.insort(self._thresholds[(user_id, deal_type)], float(threshold))
+            self._versions[user_id] = version
+
+    def matches(self, user_id, deal_type, value, cursor, previous=None):
+        """(alert deal type, threshold) for every alert of the user that `value` exceeds.
+
+        With `previous`, only thresholds crossed on the way from previous to value match,
+        so editing a deal that already triggered an alert does not trigger it again.
+        """
+        self._refresh_user(user_id, cursor)
+        matched = []
+        with self._lock:
+            for alert_type in (deal_type, "Any"):
+                thresholds = self._thresholds.get((user_id, alert_type), [])
+                start = bisect.bisect_left(thresholds, previous) if previous is not None else 0
+                matched.extend((alert_type, t) for t in thresholds[start:bisect.bisect_left(thresholds, value)])
+        return matched
+
+
+class AlertDispatcher:
+    """Delivers deal alerts from a background thread so requests never wait on SMTP, Twilio or webhooks."""
+
+    def __init__(self, maxsize=1000):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.metrics = {"queued": 0, "dropped": 0, "sent": 0, "failed": 0}
+
+    def submit(self, alert):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(alert)
+            self.metrics["queued"] += 1
+        except queue.Full:
+            self.metrics["dropped"] += 1
+            logger.warning(f"Deal alert queue full; dropped alert for user {alert['user_id']}")
+
+    def _ensure_worker(self):
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="deal-alerts", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        while True:
+            alert = self._queue.get()
+            try:
+                self._deliver(alert, cursor, conn)
+                self.metrics["sent"] += 1
+            except Exception as e:
+                self.metrics["failed"] += 1
+                logger.error(f"Failed to deliver deal alert for user {alert['user_id']}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, alert, cursor, conn):
+        user_id = alert["user_id"]
+        settings = get_user_settings(user_id, cursor, conn)
+        webhook_url = get_webhook_url(user_id, cursor)
+        if webhook_url:
+            with httpx.Client(timeout=10) as client:
+                client.post(webhook_url, json=alert)
+            log_user_activity(user_id, "trigger_webhook", {"webhook_url": webhook_url, "data": alert}, cursor, conn)
+        # SMS and email go through the pooled notification service, which merges bursts per recipient
+        if settings.get("sms_notifications"):
+            notification_service.send_sms(DEAL_ALERT_SMS_TO, alert["message"])
+        if settings.get("email_notifications"):
+            cursor.execute("SELECT email FROM users WHERE id = ?", (user_id,))
+            row = cursor.fetchone()
+            if row and row[0]:
+                notification_service.send_email(row[0], "Deal Alert Notification", alert["message"])
+
+    def join(self):
+        """Block until every queued alert has been handled (used by tests and shutdown)."""
+        self._queue.join()
+
+
+alert_index = AlertIndex()
+alert_dispatcher = AlertDispatcher()
+
+
+def evaluate_value(user_id, deal_type, value, cursor, source="deal", previous=None):
+    """Queue one notification per alert of `user_id` that a `deal_type` deal worth `value` exceeds."""
+    if not value:
+        return 0
+    matched = alert_index.matches(user_id, deal_type, float(value), cursor, previous)
+    label = "predicted" if source == "prediction" else "added"
+    for _, threshold in matched:
+        alert_dispatcher.submit({
+            "user_id": user_id,
+            "deal_type": deal_type,
+            "value": value,
+            "threshold": threshold,
+            "source": source,
+            "message": f"New {deal_type} deal {label}: ${float(value):.2f} exceeds your threshold of ${threshold}."
+        })
+    return len(matched)
+
+
+def evaluate_deal(user_id, deal, cursor, source="deal", old_deal=None):
+    """Evaluate a created or updated deals/comps row (dict with deal_type and value fields)."""
+    deal_type = comp_type(deal.get("deal_type"))
+    previous = None
+    if old_deal and comp_type(old_deal.get("deal_type")) == deal_type:
+        previous = float(deal_value(old_deal, deal_type) or 0)
+    return evaluate_value(user_id, deal_type, deal_value(deal, deal_type), cursor, source, previous)
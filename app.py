@@ -1,13 +1,21 @@
 import os
 from flask import Flask, redirect, url_for
 from flask_socketio import SocketIO
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from admission import get_admission_metrics
+from notifications import notification_service
+from contact_outbox import contact_sync_worker
+from db import cursor
+from config import SOCKETIO_MESSAGE_QUEUE, SOCKETIO_ASYNC_MODE, TRUSTED_PROXY_HOPS, redis_url
 
 # Blueprints
 from routes.main_routes import main_routes
 from blueprints.chat import create_chat_blueprint
-from blueprints.auth import auth_bp
+from blueprints.auth import auth_bp, token_required
 from blueprints.contacts import contacts_bp
 from blueprints.deals import deals_bp
+from blueprints.realnex import realnex_bp
 from blueprints.tasks import create_tasks_blueprint
 from blueprints.user import user_bp
 from blueprints.webhooks import webhooks_bp
@@ -15,9 +23,18 @@ from blueprints.webhooks import webhooks_bp
 # --- App Initialization ---
 app = Flask(__name__, template_folder="templates", static_folder="static")
 app.config['SECRET_KEY'] = os.environ.get("SECRET_KEY", "dev_secret_key")
+# Behind a proxy, take the client address from the entries our own proxies appended, never the client's
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
 
 # SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*")
+# With a message queue, emits from any worker or node reach clients connected elsewhere
+socketio_options = {"cors_allowed_origins": "*"}
+if SOCKETIO_MESSAGE_QUEUE:
+    socketio_options["message_queue"] = redis_url() if SOCKETIO_MESSAGE_QUEUE == "redis" else SOCKETIO_MESSAGE_QUEUE
+if SOCKETIO_ASYNC_MODE:
+    socketio_options["async_mode"] = SOCKETIO_ASYNC_MODE
+socketio = SocketIO(app, **socketio_options)
 
 # --- Register Blueprints ---
 app.register_blueprint(main_routes)
@@ -25,10 +42,14 @@ app.register_blueprint(create_chat_blueprint(socketio), url_prefix="/chat")
 app.register_blueprint(auth_bp, url_prefix="/auth")
 app.register_blueprint(contacts_bp, url_prefix="/contacts")
 app.register_blueprint(deals_bp, url_prefix="/deals")
+app.register_blueprint(realnex_bp, url_prefix="/realnex")
 app.register_blueprint(create_tasks_blueprint(socketio), url_prefix="/tasks")
 app.register_blueprint(user_bp, url_prefix="/user")
 app.register_blueprint(webhooks_bp, url_prefix="/webhooks")
 
+# Contact sync events left in the outbox by a previous run are pushed without waiting for a new write
+contact_sync_worker.start()
+
 # --- Optional: Redirect home to chat ---
 @app.route('/')
 def home():
@@ -39,6 +60,22 @@ def home():
 def ping():
     return {"status": "ok"}
 
+# --- Admission control counters per endpoint ---
+@app.route('/metrics/admission')
+@token_required
+def admission_metrics(user_id):
+    return get_admission_metrics()
+
+# --- Notification throughput and latency per channel ---
+@app.route('/metrics/notifications')
+def notification_metrics():
+    return notification_service.get_metrics()
+
+# --- Contact sync outbox backlog and push counters ---
+@app.route('/metrics/contact-sync')
+def contact_sync_metrics():
+    return contact_sync_worker.get_metrics(cursor)
+
 # --- Entry Point ---
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))
@@ -1,28 +1,45 @@
 import functools
+import inspect
 import jwt
 from flask import request, jsonify, current_app
 from db import logger
 
+def _decode_user_id():
+    """Returns (user_id, None) for a valid bearer token, otherwise (None, error response)."""
+    token = request.headers.get('Authorization')
+    if not token:
+        return None, (jsonify({"error": "Token is missing—don’t ghost me like an empty office space! 👻"}), 401)
+
+    try:
+        token = token.strip()
+        if token.lower().startswith('bearer '):
+            token = token[7:]
+        data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+        user_id = data['user_id']
+        logger.info(f"Token validated for user {user_id}—they’re ready to roll in the CRE world! 🏢")
+    except jwt.ExpiredSignatureError:
+        logger.warning("Expired token attempt.")
+        return None, (jsonify({"error": "Token has expired—time to renew that lease! ⏰"}), 401)
+    except jwt.InvalidTokenError as e:
+        logger.warning(f"Invalid token attempt: {e}")
+        return None, (jsonify({"error": "Invalid token—looks like a bad deal! 🚫"}), 401)
+    return user_id, None
+
 def token_required(f):
+    # Async views need an async wrapper, or Flask would receive an un-awaited coroutine
+    if inspect.iscoroutinefunction(f):
+        @functools.wraps(f)
+        async def decorated_async(*args, **kwargs):
+            user_id, error = _decode_user_id()
+            if error:
+                return error
+            return await f(user_id, *args, **kwargs)
+        return decorated_async
+
     @functools.wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({"error": "Token is missing—don’t ghost me like an empty office space! 👻"}), 401
-
-        try:
-            token = token.strip()
-            if token.lower().startswith('bearer '):
-                token = token[7:]
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            user_id = data['user_id']
-            logger.info(f"Token validated for user {user_id}—they’re ready to roll in the CRE world! 🏢")
-        except jwt.ExpiredSignatureError:
-            logger.warning("Expired token attempt.")
-            return jsonify({"error": "Token has expired—time to renew that lease! ⏰"}), 401
-        except jwt.InvalidTokenError as e:
-            logger.warning(f"Invalid token attempt: {e}")
-            return jsonify({"error": "Invalid token—looks like a bad deal! 🚫"}), 401
-
+        user_id, error = _decode_user_id()
+        if error:
+            return error
         return f(user_id, *args, **kwargs)
     return decorated
@@ -5,7 +5,10 @@ import jwt
 from flask_socketio import emit, join_room
 from db import logger, cursor, conn
 import commands
+from chat_turns import ChatTurn
+from utils import get_webhook_url
 from blueprints.auth import token_required  # ← ADD THIS
+from admission import admission_controlled
 
 
 def create_chat_blueprint(socketio):
@@ -35,6 +38,7 @@ def create_chat_blueprint(socketio):
         return render_template('index.html')
 
     @chat_bp.route('/chat', methods=['POST'])
+    @admission_controlled("chat")
     def chat():
         data = request.get_json()
         message = data.get('message')
@@ -53,24 +57,16 @@ def create_chat_blueprint(socketio):
                 logger.warning("Invalid token used for chat")
 
         timestamp = datetime.now().isoformat()
+        turn = ChatTurn(user_id or "anonymous", message, timestamp)
 
         try:
-            # Save user message
-            cursor.execute(
-                "INSERT INTO chat_messages (user_id, sender, message, timestamp) VALUES (?, ?, ?, ?)",
-                (user_id or "anonymous", "user", message, timestamp)
-            )
-            conn.commit()
-
-            # Generate bot response
-            bot_response = commands.process_message(message, user_id, cursor, conn, socketio) or f"Echo: {message}"
+            # Generate bot response; activity logged by the command is buffered into the turn
+            with turn.active():
+                bot_response = commands.process_message(message, user_id, cursor, conn, socketio) or f"Echo: {message}"
 
-            # Save bot response
-            cursor.execute(
-                "INSERT INTO chat_messages (user_id, sender, message, timestamp) VALUES (?, ?, ?, ?)",
-                (user_id or "anonymous", "bot", bot_response, datetime.now().isoformat())
-            )
-            conn.commit()
+            # Save user message, bot response and activity in one commit
+            turn.reply(bot_response)
+            turn.save(cursor, conn)
 
             # Emit to user room if available
             socketio.emit('message', {
@@ -81,19 +77,17 @@ def create_chat_blueprint(socketio):
             }, namespace='/chat', room=user_id or None)
 
             # Trigger webhook if applicable
-            if user_id:
-                cursor.execute("SELECT webhook_url FROM webhooks WHERE user_id = ?", (user_id,))
-                webhook = cursor.fetchone()
-                if webhook:
-                    try:
-                        httpx.post(webhook[0], json={
-                            "user_id": user_id,
-                            "message": message,
-                            "response": bot_response,
-                            "timestamp": timestamp
-                        })
-                    except Exception as e:
-                        logger.error(f"Webhook failed: {e}")
+            webhook_url = get_webhook_url(user_id, cursor) if user_id else None
+            if webhook_url:
+                try:
+                    httpx.post(webhook_url, json={
+                        "user_id": user_id,
+                        "message": message,
+                        "response": bot_response,
+                        "timestamp": timestamp
+                    })
+                except Exception as e:
+                    logger.error(f"Webhook failed: {e}")
 
             logger.info(f"Bot response: {bot_response}")
             return jsonify({"bot": bot_response})
@@ -1,6 +1,5 @@
 import json
-import hashlib
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from datetime import datetime
 import httpx
 import uuid
@@ -9,13 +8,22 @@ import uuid
 from db import logger, cursor, conn
 
 # Import utility functions
-from utils import get_user_settings, get_token, log_user_activity, log_duplicate, sync_to_mailchimp, search_realnex_entities
+from utils import get_user_settings, get_token, log_user_activity, log_duplicate, search_realnex_entities
+from duplicate_index import index_contact, index_contacts
+from contact_import import IMPORT_FORMATS, get_import, load_field_mapping, start_import
+from contact_search import SEARCH_LIMIT, search_contacts
+from contact_outbox import record_contact_change, record_contact_changes
+from bulk_ops import (apply_patches, check_items, delete_results, delete_rows, fetch_rows, merge_ids, normalize_id,
+                      ordered_results, patch_ids, validate_patches)
+from list_views import EMAIL_DOMAIN_SQL, keyset_page, list_etag, page_args, select_fields, table_version
 
 # Import token_required decorator
 from blueprints.auth import token_required
 
 contacts_bp = Blueprint('contacts', __name__)
 
+CONTACT_LIST_FIELDS = ['id', 'name', 'email', 'phone', 'company']
+
 @contacts_bp.route('', methods=['POST'])
 @token_required
 def create_contact(user_id):
@@ -28,28 +36,18 @@ def create_contact(user_id):
         name = data.get('name', '')
         email = data.get('email', '')
         phone = data.get('phone', '')
+        company = data.get('company', '')
 
-        # Insert contact into database
-        cursor.execute("INSERT INTO contacts (id, name, email, phone, user_id) VALUES (?, ?, ?, ?, ?)",
-                       (contact_id, name, email, phone, user_id))
+        # Insert contact and its sync event in one transaction; the outbox worker pushes it to Mailchimp/RealNex
+        cursor.execute("INSERT INTO contacts (id, name, email, phone, company, user_id) VALUES (?, ?, ?, ?, ?, ?)",
+                       (contact_id, name, email, phone, company, user_id))
+        record_contact_change(user_id, contact_id, "upsert", cursor)
         conn.commit()
+        index_contact(user_id, contact_id, cursor, conn)
 
         # Log the activity
         log_user_activity(user_id, "create_contact", {"contact_id": contact_id}, cursor, conn)
 
-        # Prepare contact data for syncing
-        contact_data = {
-            "id": contact_id,
-            "name": name,
-            "email": email,
-            "phone": phone,
-            "firstName": name.split()[0] if name else "",
-            "lastName": " ".join(name.split()[1:]) if len(name.split()) > 1 else ""
-        }
-
-        # Sync to Mailchimp
-        sync_to_mailchimp(user_id, contact_data, cursor, conn)
-
         logger.info(f"Contact created for user {user_id}: {contact_id}—they’re building their CRE network like a pro! 🤝")
         return jsonify({"status": "Contact created", "contact_id": contact_id})
     except Exception as e:
@@ -60,14 +58,54 @@ def create_contact(user_id):
 @token_required
 def get_contacts(user_id):
     try:
-        cursor.execute("SELECT id, name, email, phone FROM contacts WHERE user_id = ?", (user_id,))
-        contacts = [{"id": row[0], "name": row[1], "email": row[2], "phone": row[3]} for row in cursor.fetchall()]
+        fields = select_fields(request.args.get('fields'), CONTACT_LIST_FIELDS)
+        limit, after = page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid contact list query: {e}—let’s square up that rent roll! 📋"}), 400
+
+    try:
+        # Polling dashboards get a 304 until one of the user's contacts changes
+        etag = list_etag(user_id, "contacts", table_version(user_id, "contacts", cursor), request.args)
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"})
+
+        where, params = ["user_id = ?"], [user_id]
+        email_domain = request.args.get('email_domain')
+        if email_domain:
+            where.append(f"{EMAIL_DOMAIN_SQL} = ?")
+            params.append(email_domain.strip().lstrip('@').lower())
+        contacts, next_cursor = keyset_page(cursor, "contacts", fields, where, params, ["id"], after, limit)
+
         logger.info(f"Contacts retrieved for user {user_id}—they’ve got a network hotter than a CRE market boom! 🔥")
-        return jsonify({"contacts": contacts})
+        response = jsonify({"contacts": contacts, "next_cursor": next_cursor})
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    except ValueError as e:
+        return jsonify({"error": f"Invalid contact list query: {e}—let’s square up that rent roll! 📋"}), 400
     except Exception as e:
         logger.error(f"Failed to retrieve contacts for user {user_id}: {e}")
         return jsonify({"error": f"Failed to retrieve contacts: {str(e)}"}), 500
 
+@contacts_bp.route('/search', methods=['GET'])
+@token_required
+def search_contacts_route(user_id):
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Give me something to search for—a name, email, phone or company! 🔍"}), 400
+    try:
+        limit = int(request.args.get('limit', SEARCH_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be a number—let’s keep the square footage numeric! 📐"}), 400
+
+    try:
+        # Served from the local FTS5 index: ranked prefix matching, no RealNex round trip
+        contacts = search_contacts(user_id, query, cursor, max(limit, 1))
+        return jsonify({"contacts": contacts, "count": len(contacts)})
+    except Exception as e:
+        logger.error(f"Failed to search contacts for user {user_id}: {e}")
+        return jsonify({"error": f"Failed to search contacts: {str(e)}"}), 500
+
 @contacts_bp.route('/<contact_id>', methods=['PUT'])
 @token_required
 def update_contact(user_id, contact_id):
@@ -83,6 +121,7 @@ def update_contact(user_id, contact_id):
         name = data.get('name')
         email = data.get('email')
         phone = data.get('phone')
+        company = data.get('company')
 
         update_fields = []
         values = []
@@ -95,6 +134,9 @@ def update_contact(user_id, contact_id):
         if phone is not None:
             update_fields.append("phone = ?")
             values.append(phone)
+        if company is not None:
+            update_fields.append("company = ?")
+            values.append(company)
 
         if not update_fields:
             return jsonify({"error": "No valid fields to update—let’s fill that vacancy! 🏙️"}), 400
@@ -102,23 +144,14 @@ def update_contact(user_id, contact_id):
         values.extend([contact_id, user_id])
         query = f"UPDATE contacts SET {', '.join(update_fields)} WHERE id = ? AND user_id = ?"
         cursor.execute(query, values)
+        # Repeated edits before the next push collapse into a single push of the latest values
+        record_contact_change(user_id, contact_id, "upsert", cursor)
         conn.commit()
+        if name is not None or email is not None:
+            index_contact(user_id, contact_id, cursor, conn)
 
         log_user_activity(user_id, "update_contact", {"contact_id": contact_id}, cursor, conn)
 
-        cursor.execute("SELECT * FROM contacts WHERE id = ? AND user_id = ?", (contact_id, user_id))
-        contact = cursor.fetchone()
-        contact_data = {
-            "id": contact[0],
-            "name": contact[1],
-            "email": contact[2],
-            "phone": contact[3],
-            "firstName": contact[1].split()[0] if contact[1] else "",
-            "lastName": " ".join(contact[1].split()[1:]) if len(contact[1].split()) > 1 else ""
-        }
-
-        sync_to_mailchimp(user_id, contact_data, cursor, conn)
-
         logger.info(f"Contact updated for user {user_id}: {contact_id}—they’re keeping their CRE network fresh! 🌟")
         return jsonify({"status": "Contact updated"})
     except Exception as e:
@@ -129,12 +162,17 @@ def update_contact(user_id, contact_id):
 @token_required
 def delete_contact(user_id, contact_id):
     try:
-        cursor.execute("SELECT * FROM contacts WHERE id = ? AND user_id = ?", (contact_id, user_id))
-        if not cursor.fetchone():
+        cursor.execute("SELECT id, name, email, phone, company FROM contacts WHERE id = ? AND user_id = ?",
+                       (contact_id, user_id))
+        contact = cursor.fetchone()
+        if not contact:
             return jsonify({"error": "Contact not found—looks like this space is already vacated! 🏙️"}), 404
 
         cursor.execute("DELETE FROM contacts WHERE id = ? AND user_id = ?", (contact_id, user_id))
+        record_contact_change(user_id, contact_id, "delete", cursor,
+                              dict(zip(["id", "name", "email", "phone", "company"], contact)))
         conn.commit()
+        index_contact(user_id, contact_id, cursor, conn)
 
         log_user_activity(user_id, "delete_contact", {"contact_id": contact_id}, cursor, conn)
         logger.info(f"Contact deleted for user {user_id}: {contact_id}—they’re clearing space for new CRE opportunities! 🏢")
@@ -143,6 +181,119 @@ def delete_contact(user_id, contact_id):
         logger.error(f"Failed to delete contact for user {user_id}: {e}")
         return jsonify({"error": f"Failed to delete contact: {str(e)}"}), 500
 
+@contacts_bp.route('/bulk', methods=['PATCH'])
+@token_required
+def bulk_update_contacts(user_id):
+    """Apply {"contacts": [{"id": ..., "name": ...}, ...]} in one transaction; one result per item."""
+    patches = (request.get_json(silent=True) or {}).get('contacts')
+    try:
+        check_items(patches)
+    except ValueError as e:
+        return jsonify({"error": f"Bulk update needs contacts: {e}—no empty lots here! 🏗️"}), 400
+
+    try:
+        existing = fetch_rows("contacts", CONTACT_LIST_FIELDS[1:], user_id, patch_ids(patches), cursor)
+        valid, results = validate_patches(patches, CONTACT_LIST_FIELDS[1:], existing)
+        updated_ids = [item_id for _, item_id, _ in valid]
+        apply_patches("contacts", user_id, valid, cursor)
+        record_contact_changes(user_id, updated_ids, cursor)
+        conn.commit()
+        index_contacts(user_id, [item_id for _, item_id, fields in valid if {"name", "email"} & set(fields)], cursor, conn)
+        for index, item_id, _ in valid:
+            results[index] = {"id": item_id, "status": "updated"}
+
+        log_user_activity(user_id, "bulk_update_contacts", {"updated": len(valid), "rejected": len(patches) - len(valid)}, cursor, conn)
+        logger.info(f"Bulk contact update for user {user_id}: {len(valid)} of {len(patches)} applied—renovation complete! 🔨")
+        return jsonify({"updated": len(valid), "results": ordered_results(len(patches), results)})
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Failed bulk contact update for user {user_id}: {e}")
+        return jsonify({"error": f"Failed to update contacts: {str(e)}"}), 500
+
+@contacts_bp.route('/bulk-delete', methods=['POST'])
+@token_required
+def bulk_delete_contacts(user_id):
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    try:
+        check_items(ids)
+    except ValueError as e:
+        return jsonify({"error": f"Bulk delete needs ids: {e}—nothing to demolish! 🏚️"}), 400
+
+    try:
+        normalized = [normalize_id(i) for i in ids]
+        existing = fetch_rows("contacts", CONTACT_LIST_FIELDS[1:], user_id, set(normalized) - {None}, cursor)
+        to_delete = [i for i in dict.fromkeys(normalized) if i in existing]
+        delete_rows("contacts", user_id, to_delete, cursor)
+        record_contact_changes(user_id, to_delete, cursor, op="delete", contacts=[existing[i] for i in to_delete])
+        conn.commit()
+        index_contacts(user_id, to_delete, cursor, conn)
+
+        results = delete_results(ids, existing)
+        log_user_activity(user_id, "bulk_delete_contacts", {"deleted": len(to_delete)}, cursor, conn)
+        logger.info(f"Bulk contact delete for user {user_id}: {len(to_delete)} removed—clearing the lot! 🏢")
+        return jsonify({"deleted": len(to_delete), "results": results})
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Failed bulk contact delete for user {user_id}: {e}")
+        return jsonify({"error": f"Failed to delete contacts: {str(e)}"}), 500
+
+@contacts_bp.route('/merge', methods=['POST'])
+@token_required
+def merge_contacts(user_id):
+    """Merge duplicates: {"merges": [{"keep": id, "remove": [ids]}]}.
+
+    The kept contact takes any field it is missing from the removed ones (in the order given);
+    the removed contacts are deleted. Every merge is applied in the same transaction.
+    """
+    merges = (request.get_json(silent=True) or {}).get('merges')
+    try:
+        check_items(merges)
+    except ValueError as e:
+        return jsonify({"error": f"Merge needs merges: {e}—no parcels to combine! 🧩"}), 400
+
+    try:
+        parsed = [merge_ids(merge) for merge in merges]
+        wanted = {i for keep, remove, error in parsed if not error for i in (keep, *remove)}
+        existing = fetch_rows("contacts", CONTACT_LIST_FIELDS[1:], user_id, wanted, cursor)
+
+        results, patches, removed, claimed = [], [], [], set()
+        for index, (keep, remove, error) in enumerate(parsed):
+            group = [keep, *remove]
+            if error:
+                results.append({"keep": keep, "status": "invalid", "error": error})
+            elif claimed & set(group):
+                results.append({"keep": keep, "status": "invalid", "error": "contact already used by another merge"})
+            elif not all(i in existing for i in group):
+                results.append({"keep": keep, "status": "not_found", "missing": [i for i in group if i not in existing]})
+            else:
+                claimed.update(group)
+                fields = {}
+                for field in CONTACT_LIST_FIELDS[1:]:
+                    if not existing[keep][field]:
+                        value = next((existing[i][field] for i in remove if existing[i][field]), None)
+                        if value:
+                            fields[field] = value
+                if fields:
+                    patches.append((index, keep, fields))
+                removed.extend(remove)
+                results.append({"keep": keep, "removed": remove, "status": "merged", "filled": sorted(fields)})
+
+        apply_patches("contacts", user_id, patches, cursor)
+        delete_rows("contacts", user_id, removed, cursor)
+        kept = [r["keep"] for r in results if r["status"] == "merged"]
+        record_contact_changes(user_id, kept, cursor)
+        record_contact_changes(user_id, removed, cursor, op="delete", contacts=[existing[i] for i in removed])
+        conn.commit()
+        index_contacts(user_id, kept + removed, cursor, conn)
+
+        log_user_activity(user_id, "merge_contacts", {"merged": len(kept), "removed": len(removed)}, cursor, conn)
+        logger.info(f"Merged {len(removed)} duplicate contacts into {len(kept)} for user {user_id}—one tidy portfolio! 🤝")
+        return jsonify({"merged": len(kept), "removed": len(removed), "results": results})
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Failed to merge contacts for user {user_id}: {e}")
+        return jsonify({"error": f"Failed to merge contacts: {str(e)}"}), 500
+
 @contacts_bp.route('/upload-file', methods=['POST'])
 @token_required
 def upload_file(user_id):
@@ -150,37 +301,38 @@ def upload_file(user_id):
         return jsonify({"error": "No file uploaded—don’t leave me empty like an unleased property! 🏢"}), 400
 
     file = request.files['file']
+    if not file.filename.lower().endswith(IMPORT_FORMATS):
+        return jsonify({"error": "Upload a .csv or .xlsx file—that format’s not zoned for contacts! 🏗️"}), 400
+
     try:
-        # Mock file processing for example
-        contact_data = {
-            "id": str(uuid.uuid4()),
-            "name": "John Doe",
-            "email": "john.doe@example.com",
-            "phone": "123-456-7890",
-            "firstName": "John",
-            "lastName": "Doe"
-        }
-
-        contact_hash = hashlib.md5(json.dumps(contact_data, sort_keys=True).encode()).hexdigest()
-        cursor.execute("SELECT * FROM duplicates_log WHERE contact_hash = ? AND user_id = ?",
-                       (contact_hash, user_id))
-        if cursor.fetchone():
-            log_duplicate(user_id, contact_data, "contact", cursor, conn)
-            return jsonify({"status": "Duplicate contact detected—already leased this space! 🏙️"})
-
-        cursor.execute("INSERT INTO contacts (id, name, email, phone, user_id) VALUES (?, ?, ?, ?, ?)",
-                       (contact_data["id"], contact_data["name"], contact_data["email"],
-                        contact_data["phone"], user_id))
-        conn.commit()
+        # Column mapping: a saved one by name, or one sent inline as {"File Column": "name" | "email" | ...}
+        mapping = None
+        if request.form.get('mapping_name'):
+            saved = load_field_mapping(user_id, request.form['mapping_name'], cursor)
+            if saved is None:
+                return jsonify({"error": "Saved field mapping not found—that floor plan’s not on file! 🗂️"}), 404
+            mapping = saved.get("contacts", saved)
+        elif request.form.get('mapping'):
+            mapping = json.loads(request.form['mapping'])
 
-        sync_to_mailchimp(user_id, contact_data, cursor, conn)
-        log_user_activity(user_id, "upload_contact_file", {"contact_id": contact_data["id"]}, cursor, conn)
-        logger.info(f"File uploaded and contact created for user {user_id}: {contact_data['id']}—they’re filling their CRE pipeline! 📈")
-        return jsonify({"status": "File processed", "contact_id": contact_data["id"]})
+        # Large files would tie up the request: the import runs in the background and reports progress
+        import_id = start_import(user_id, file, mapping, cursor, conn)
+        log_user_activity(user_id, "upload_contact_file", {"import_id": import_id, "filename": file.filename}, cursor, conn)
+        logger.info(f"Contact import {import_id} queued for user {user_id}—they’re filling their CRE pipeline! 📈")
+        return jsonify({"status": "Import started", "import_id": import_id,
+                        "progress_url": f"/contacts/imports/{import_id}"}), 202
     except Exception as e:
         logger.error(f"Failed to process file upload for user {user_id}: {e}")
         return jsonify({"error": f"Failed to process file: {str(e)}"}), 500
 
+@contacts_bp.route('/imports/<import_id>', methods=['GET'])
+@token_required
+def import_progress(user_id, import_id):
+    progress = get_import(user_id, import_id, cursor)
+    if not progress:
+        return jsonify({"error": "Import not found—no such listing on the books! 🏙️"}), 404
+    return jsonify(progress)
+
 @contacts_bp.route('/realnex', methods=['GET'])
 @token_required
 def search_realnex(user_id):
@@ -1,12 +1,34 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, send_file
 from datetime import datetime
+import json
+import math
 import uuid
 
+import pandas as pd
+
 from db import logger, cursor, conn
 from blueprints.auth import token_required
+from deal_models import apply_deal_change, apply_deal_changes, comp_type
+from deal_valuation import DealValuationModel, comps_frame, COMP_COLUMNS
+from deal_charts import chart_path, wait_for_chart
+from deal_trends import PERIOD_FORMATS, MAX_POINTS, trend_series, trend_etag, downsample
+from list_views import DEAL_SORT_SQL, keyset_page, list_etag, page_args, select_fields, table_version
+from comps_mirror import get_comps
+from alert_engine import evaluate_deal
+from bulk_ops import (apply_patches, check_items, delete_results, delete_rows, fetch_rows, normalize_id, ordered_results,
+                      patch_ids, validate_patches)
 
 deals_bp = Blueprint('deals', __name__)
 
+DEAL_FIELDS = ['amount', 'close_date', 'sq_ft', 'rent_month', 'sale_price', 'deal_type']
+DEAL_LIST_FIELDS = ['id'] + DEAL_FIELDS
+MAX_BATCH_PROPERTIES = 10000
+
+def _fetch_deal(user_id, deal_id):
+    cursor.execute(f"SELECT {', '.join(DEAL_FIELDS)} FROM deals WHERE id = ? AND user_id = ?", (deal_id, user_id))
+    row = cursor.fetchone()
+    return dict(zip(DEAL_FIELDS, row)) if row else None
+
 def init_socketio(socketio):
     @socketio.on('deal_update', namespace='/deals')
     def handle_deal_update(data):
@@ -38,26 +60,55 @@ def create_deal(user_id):
             INSERT INTO deals (id, amount, close_date, user_id, sq_ft, rent_month, sale_price, deal_type)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """, (deal_id, amount, close_date, user_id, sq_ft, rent_month, sale_price, deal_type))
+        new_deal = {"amount": amount, "close_date": close_date, "sq_ft": sq_ft, "rent_month": rent_month,
+                    "sale_price": sale_price, "deal_type": deal_type}
+        apply_deal_change(user_id, None, new_deal, cursor)
         conn.commit()
+        evaluate_deal(user_id, new_deal, cursor)
 
         logger.info(f"Deal created for user {user_id}: {deal_id}")
         return jsonify({"status": "Deal created", "deal_id": deal_id})
     except Exception as e:
+        conn.rollback()
         logger.error(f"Failed to create deal for user {user_id}: {e}")
         return jsonify({"error": f"Failed to create deal: {str(e)}"}), 500
 
 @deals_bp.route('', methods=['GET'])
 @token_required
 def get_deals(user_id):
+    """Deals newest first, one keyset page at a time: filters deal_type (comma-separated), start, end."""
     try:
-        cursor.execute("""
-            SELECT id, amount, close_date, sq_ft, rent_month, sale_price, deal_type
-            FROM deals WHERE user_id = ?
-        """, (user_id,))
-        deals = [{"id": row[0], "amount": row[1], "close_date": row[2], "sq_ft": row[3],
-                  "rent_month": row[4], "sale_price": row[5], "deal_type": row[6]} for row in cursor.fetchall()]
+        fields = select_fields(request.args.get('fields'), DEAL_LIST_FIELDS)
+        limit, after = page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        etag = list_etag(user_id, "deals", table_version(user_id, "deals", cursor), request.args)
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"})
+
+        where, params = ["user_id = ?"], [user_id]
+        deal_types = [t.strip() for t in request.args.get('deal_type', '').split(',') if t.strip()]
+        if deal_types:
+            where.append(f"deal_type IN ({', '.join('?' * len(deal_types))})")
+            params.extend(deal_types)
+        if request.args.get('start'):
+            where.append(f"{DEAL_SORT_SQL} >= ?")
+            params.append(request.args['start'])
+        if request.args.get('end'):
+            where.append(f"{DEAL_SORT_SQL} <= ?")
+            params.append(request.args['end'])
+        deals, next_cursor = keyset_page(cursor, "deals", fields, where, params, [DEAL_SORT_SQL, "id"],
+                                         after, limit, descending=True)
+
         logger.info(f"Deals retrieved for user {user_id}")
-        return jsonify({"deals": deals})
+        response = jsonify({"deals": deals, "next_cursor": next_cursor})
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Failed to retrieve deals for user {user_id}: {e}")
         return jsonify({"error": f"Failed to retrieve deals: {str(e)}"}), 500
@@ -69,14 +120,14 @@ def update_deal(user_id, deal_id):
     if not data:
         return jsonify({"error": "No update data provided"}), 400
     try:
-        cursor.execute("SELECT * FROM deals WHERE id = ? AND user_id = ?", (deal_id, user_id))
-        if not cursor.fetchone():
+        old_deal = _fetch_deal(user_id, deal_id)
+        if not old_deal:
             return jsonify({"error": "Deal not found"}), 404
 
         update_fields = []
         values = []
 
-        for field in ['amount', 'close_date', 'sq_ft', 'rent_month', 'sale_price', 'deal_type']:
+        for field in DEAL_FIELDS:
             if field in data:
                 update_fields.append(f"{field} = ?")
                 values.append(data[field])
@@ -87,11 +138,15 @@ def update_deal(user_id, deal_id):
         values.extend([deal_id, user_id])
         query = f"UPDATE deals SET {', '.join(update_fields)} WHERE id = ? AND user_id = ?"
         cursor.execute(query, values)
+        new_deal = {**old_deal, **{f: data[f] for f in DEAL_FIELDS if f in data}}
+        apply_deal_change(user_id, old_deal, new_deal, cursor)
         conn.commit()
+        evaluate_deal(user_id, new_deal, cursor, old_deal=old_deal)
 
         logger.info(f"Deal updated for user {user_id}: {deal_id}")
         return jsonify({"status": "Deal updated"})
     except Exception as e:
+        conn.rollback()
         logger.error(f"Failed to update deal for user {user_id}: {e}")
         return jsonify({"error": f"Failed to update deal: {str(e)}"}), 500
 
@@ -99,15 +154,181 @@ def update_deal(user_id, deal_id):
 @token_required
 def delete_deal(user_id, deal_id):
     try:
-        cursor.execute("SELECT * FROM deals WHERE id = ? AND user_id = ?", (deal_id, user_id))
-        if not cursor.fetchone():
+        old_deal = _fetch_deal(user_id, deal_id)
+        if not old_deal:
             return jsonify({"error": "Deal not found"}), 404
 
         cursor.execute("DELETE FROM deals WHERE id = ? AND user_id = ?", (deal_id, user_id))
+        apply_deal_change(user_id, old_deal, None, cursor)
         conn.commit()
 
         logger.info(f"Deal deleted for user {user_id}: {deal_id}")
         return jsonify({"status": "Deal deleted"})
     except Exception as e:
+        conn.rollback()
         logger.error(f"Failed to delete deal for user {user_id}: {e}")
         return jsonify({"error": f"Failed to delete deal: {str(e)}"}), 500
+
+@deals_bp.route('/bulk', methods=['PATCH'])
+@token_required
+def bulk_update_deals(user_id):
+    """Apply {"deals": [{"id": ..., "deal_type": "sale"}, ...]} in one transaction; one result per item."""
+    patches = (request.get_json(silent=True) or {}).get('deals')
+    try:
+        check_items(patches)
+    except ValueError as e:
+        return jsonify({"error": f"deals: {e}"}), 400
+
+    try:
+        existing = fetch_rows("deals", DEAL_FIELDS, user_id, patch_ids(patches), cursor)
+        valid, results = validate_patches(patches, DEAL_FIELDS, existing)
+        apply_patches("deals", user_id, valid, cursor)
+        changes = []
+        for index, deal_id, fields in valid:
+            old_deal = {f: existing[deal_id][f] for f in DEAL_FIELDS}
+            changes.append((old_deal, {**old_deal, **fields}))
+            results[index] = {"id": deal_id, "status": "updated"}
+        # The statistics fold into the same transaction, committed once
+        apply_deal_changes(user_id, changes, cursor)
+        conn.commit()
+        for old_deal, new_deal in changes:
+            evaluate_deal(user_id, new_deal, cursor, old_deal=old_deal)
+
+        logger.info(f"Bulk deal update for user {user_id}: {len(valid)} of {len(patches)} applied")
+        return jsonify({"updated": len(valid), "results": ordered_results(len(patches), results)})
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Failed bulk deal update for user {user_id}: {e}")
+        return jsonify({"error": f"Failed to update deals: {str(e)}"}), 500
+
+@deals_bp.route('/bulk-delete', methods=['POST'])
+@token_required
+def bulk_delete_deals(user_id):
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    try:
+        check_items(ids)
+    except ValueError as e:
+        return jsonify({"error": f"ids: {e}"}), 400
+
+    try:
+        normalized = [normalize_id(i) for i in ids]
+        existing = fetch_rows("deals", DEAL_FIELDS, user_id, set(normalized) - {None}, cursor)
+        to_delete = [i for i in dict.fromkeys(normalized) if i in existing]
+        delete_rows("deals", user_id, to_delete, cursor)
+        apply_deal_changes(user_id, [({f: existing[i][f] for f in DEAL_FIELDS}, None) for i in to_delete], cursor)
+        conn.commit()
+
+        logger.info(f"Bulk deal delete for user {user_id}: {len(to_delete)} removed")
+        return jsonify({"deleted": len(to_delete),
+                        "results": delete_results(ids, existing)})
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Failed bulk deal delete for user {user_id}: {e}")
+        return jsonify({"error": f"Failed to delete deals: {str(e)}"}), 500
+
+@deals_bp.route('/predict', methods=['POST'])
+@token_required
+async def predict_deals(user_id):
+    """Value a list of properties from one comps load and one fitted model; NDJSON when streamed."""
+    data = request.get_json() or {}
+    deal_type = data.get('deal_type')
+    properties = data.get('properties')
+    if deal_type not in ("LeaseComp", "SaleComp"):
+        return jsonify({"error": "deal_type must be LeaseComp or SaleComp"}), 400
+    if not isinstance(properties, list) or not properties:
+        return jsonify({"error": "properties must be a non-empty list"}), 400
+    if len(properties) > MAX_BATCH_PROPERTIES:
+        return jsonify({"error": f"At most {MAX_BATCH_PROPERTIES} properties per request"}), 400
+
+    valid, errors = [], []
+    for index, prop in enumerate(properties):
+        sq_ft = prop.get('sq_ft') if isinstance(prop, dict) else None
+        # bool is an int subclass, so JSON true would otherwise be valued as a 1 sq ft property
+        if isinstance(sq_ft, bool) or not isinstance(sq_ft, (int, float)) or not 0 < sq_ft < math.inf:
+            errors.append({"index": index, "id": prop.get('id') if isinstance(prop, dict) else None,
+                           "error": "sq_ft must be a positive number"})
+            continue
+        valid.append({"index": index, "id": prop.get('id'), "sq_ft": sq_ft,
+                      "close_date": prop.get('close_date')})
+
+    try:
+        comps = comps_frame(await get_comps(user_id, deal_type, cursor))
+        cursor.execute(f"SELECT {', '.join(COMP_COLUMNS)} FROM deals WHERE user_id = ? AND sq_ft > 0", (user_id,))
+        local = comps_frame(cursor.fetchall())
+        local = local[local["deal_type"].map(comp_type) == deal_type]
+        model = DealValuationModel(deal_type).fit(pd.concat([comps, local], ignore_index=True))
+    except ValueError:
+        return jsonify({"error": "No historical data available for prediction."}), 404
+    except Exception as e:
+        logger.error(f"Failed to load comps for batch prediction for user {user_id}: {e}")
+        return jsonify({"error": f"Failed to load comps: {str(e)}"}), 500
+
+    results = []
+    if valid:
+        frame = model.predict([{"sq_ft": p["sq_ft"], "close_date": p["close_date"]} for p in valid]).round(2)
+        results = [{"index": p["index"], "id": p["id"], **row} for p, row in zip(valid, frame.to_dict('records'))]
+    logger.info(f"Batch prediction for user {user_id}: {len(results)} properties from {model.n_samples} comps")
+
+    if request.args.get('stream') or 'application/x-ndjson' in request.headers.get('Accept', ''):
+        def generate():
+            yield json.dumps({"deal_type": deal_type, "n_comps": model.n_samples, "count": len(results)}) + "\n"
+            for item in sorted(results + errors, key=lambda r: r["index"]):
+                yield json.dumps(item) + "\n"
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    return jsonify({"deal_type": deal_type, "n_comps": model.n_samples, "predictions": results, "errors": errors})
+
+@deals_bp.route('/trends', methods=['GET'])
+@token_required
+def get_deal_trends(user_id):
+    """Per-period deal aggregates for client-side charts, LTTB-downsampled to at most `points` periods."""
+    deal_type = request.args.get('deal_type', 'LeaseComp')
+    period = request.args.get('period', 'month')
+    start = request.args.get('start')
+    end = request.args.get('end')
+    if deal_type not in ("LeaseComp", "SaleComp"):
+        return jsonify({"error": "deal_type must be LeaseComp or SaleComp"}), 400
+    if period not in PERIOD_FORMATS:
+        return jsonify({"error": f"period must be one of {', '.join(PERIOD_FORMATS)}"}), 400
+    try:
+        max_points = min(max(int(request.args.get('points', MAX_POINTS)), 3), 1000)
+    except ValueError:
+        return jsonify({"error": "points must be an integer"}), 400
+
+    try:
+        etag = trend_etag(user_id, deal_type, period, start, end, max_points,
+                          table_version(user_id, "deals", cursor))
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"})
+
+        series = trend_series(user_id, deal_type, period, cursor, start, end)
+        points = downsample(series, max_points)
+        response = jsonify({"deal_type": deal_type, "period": period, "total_periods": len(series),
+                            "downsampled": len(points) < len(series), "series": points})
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    except Exception as e:
+        logger.error(f"Failed to build deal trends for user {user_id}: {e}")
+        return jsonify({"error": f"Failed to build deal trends: {str(e)}"}), 500
+
+@deals_bp.route('/charts/<chart_key>.png', methods=['GET'])
+@token_required
+def get_deal_chart(user_id, chart_key):
+    """Serve a trend chart from the requesting user's own charts; another user's key is simply not found.
+
+    Charts are content-addressed, so a rendered PNG never changes: it may be cached indefinitely, but only privately.
+    """
+    if not chart_key.isalnum():
+        return jsonify({"error": "Invalid chart key"}), 400
+    status = wait_for_chart(user_id, chart_key)
+    if status == "missing":
+        return jsonify({"error": "Chart not found. Ask for the prediction again to re-render it. 📉"}), 404
+    if status == "rendering":
+        return jsonify({"status": "Chart is still rendering"}), 202, {"Retry-After": "2"}
+    cache_control = "private, max-age=31536000, immutable"
+    if request.headers.get('If-None-Match', '').strip('"') == chart_key:
+        return Response(status=304, headers={"ETag": f'"{chart_key}"', "Cache-Control": cache_control})
+    response = send_file(chart_path(user_id, chart_key), mimetype='image/png', etag=chart_key, conditional=True)
+    response.headers["Cache-Control"] = cache_control
+    return response
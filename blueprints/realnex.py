@@ -0,0 +1,61 @@
+from flask import Blueprint, request, jsonify
+
+from db import logger, cursor, conn
+from blueprints.auth import token_required
+from list_views import keyset_page, page_args
+from realnex_mirror import MIRROR_ENTITIES, mirror_filters, resolve_property, sync_state
+
+realnex_bp = Blueprint('realnex', __name__)
+
+
+def _mirror_page(user_id, entity, filters):
+    """One keyset page of a mirror table plus when it was last synced."""
+    limit, after = page_args(request.args)
+    table, columns = MIRROR_ENTITIES[entity]
+    where, params = mirror_filters(filters, columns)
+    items, next_cursor = keyset_page(cursor, table, columns, ["user_id = ?"] + where, [user_id] + params,
+                                     ["id"], after, limit)
+    state = sync_state(user_id, entity, cursor)
+    return jsonify({entity: items, "next_cursor": next_cursor, "synced_at": state[0] if state else None})
+
+
+@realnex_bp.route('/companies', methods=['GET'])
+@token_required
+def get_companies(user_id):
+    """Mirrored RealNex companies: filters name (prefix), city, zip."""
+    try:
+        return _mirror_page(user_id, "companies", request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Failed to retrieve RealNex companies for user {user_id}: {e}")
+        return jsonify({"error": f"Failed to retrieve companies: {str(e)}"}), 500
+
+
+@realnex_bp.route('/properties', methods=['GET'])
+@token_required
+def get_properties(user_id):
+    """Mirrored RealNex properties: filters name (prefix), city, zip."""
+    try:
+        return _mirror_page(user_id, "properties", request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Failed to retrieve RealNex properties for user {user_id}: {e}")
+        return jsonify({"error": f"Failed to retrieve properties: {str(e)}"}), 500
+
+
+@realnex_bp.route('/properties/<property_ref>/spaces', methods=['GET'])
+@token_required
+def get_property_spaces(user_id, property_ref):
+    """Mirrored spaces of one property, given its RealNex id, name or address."""
+    try:
+        prop = resolve_property(user_id, property_ref, cursor)
+        if not prop:
+            return jsonify({"error": "Property not found"}), 404
+        return _mirror_page(user_id, "spaces", {"property_id": prop["id"]})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Failed to retrieve spaces for user {user_id}, property {property_ref}: {e}")
+        return jsonify({"error": f"Failed to retrieve spaces: {str(e)}"}), 500
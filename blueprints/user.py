@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from db import logger, cursor, conn
 from blueprints.auth import token_required
+from utils import invalidate_realnex_queries
 
 user_bp = Blueprint('user', __name__)
 
@@ -59,6 +60,9 @@ def update_settings(user_id):
 
         cursor.execute(query, values)
         conn.commit()
+        if "realnex_api_key" in settings:
+            # Results cached under the old key may belong to another RealNex account
+            invalidate_realnex_queries(user_id)
 
         logger.info(f"Settings updated for user {user_id}")
         return jsonify({"status": "Settings updated—your CRE game just leveled up! 🚀"})
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from db import logger, cursor, conn
 from blueprints.auth import token_required
+from utils import invalidate_webhook_url
 
 webhooks_bp = Blueprint('webhooks', __name__)
 
@@ -19,6 +20,7 @@ def set_webhook(user_id):
             (user_id, webhook_url)
         )
         conn.commit()
+        invalidate_webhook_url(user_id)
         logger.info(f"Webhook set for user {user_id}: {webhook_url}—ready to roll like a CRE deal on fire! 🔥")
         return jsonify({"status": "Webhook set—let’s keep the CRE notifications flowing! 📬"})
     except Exception as e:
@@ -0,0 +1,120 @@
+from collections import defaultdict
+
+MAX_BULK_ITEMS = 5000
+# Keeps each IN (...) list well under SQLite's bound-parameter limit
+_CHUNK = 500
+
+
+def fetch_rows(table, columns, user_id, ids, cursor):
+    """id -> row dict (id plus `columns`) for those of `ids` that belong to the user."""
+    rows = {}
+    ids = list(ids)
+    for start in range(0, len(ids), _CHUNK):
+        chunk = ids[start:start + _CHUNK]
+        cursor.execute(f"""
+            SELECT id, {", ".join(columns)} FROM {table}
+            WHERE user_id = ? AND id IN ({", ".join("?" * len(chunk))})
+        """, (user_id, *chunk))
+        rows.update((row[0], dict(zip(["id", *columns], row))) for row in cursor.fetchall())
+    return rows
+
+
+def normalize_id(value):
+    """Ids arrive as JSON strings or integers and are stored as TEXT; anything else is None."""
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        return None
+    return str(value) or None
+
+
+def patch_ids(patches):
+    """The normalized ids of a bulk-update body, for fetch_rows."""
+    return {normalize_id(p.get("id")) for p in patches if isinstance(p, dict)} - {None}
+
+
+def merge_ids(merge):
+    """(keep, remove, error) of one {"keep": id, "remove": [ids]} merge, ids normalized and de-duplicated."""
+    if not isinstance(merge, dict):
+        return None, [], "each merge must be an object"
+    keep = normalize_id(merge.get("keep"))
+    if keep is None:
+        return None, [], "keep must be a string or integer id"
+    remove = merge.get("remove")
+    if not isinstance(remove, list) or not remove:
+        return keep, [], "remove must be a non-empty list of ids"
+    remove = [normalize_id(i) for i in remove]
+    if None in remove:
+        return keep, [], "remove ids must be strings or integers"
+    remove = list(dict.fromkeys(remove))
+    if keep in remove:
+        return keep, [], "keep cannot also be removed"
+    return keep, remove, None
+
+
+def check_items(items, key="id"):
+    """Reject non-list or oversized bodies up front; ValueError carries the message for the 400."""
+    if not isinstance(items, list) or not items:
+        raise ValueError("expected a non-empty list")
+    if len(items) > MAX_BULK_ITEMS:
+        raise ValueError(f"at most {MAX_BULK_ITEMS} items per request")
+
+
+def validate_patches(patches, allowed, existing_ids):
+    """Split patches into applicable (id, fields) pairs and per-item errors, in one pass.
+
+    Returns (valid, results) where results maps item index -> result dict for rejected items.
+    """
+    valid, results, seen = [], {}, set()
+    for index, patch in enumerate(patches):
+        raw_id = patch.get("id") if isinstance(patch, dict) else None
+        if raw_id is None or raw_id == "":
+            results[index] = {"id": raw_id, "status": "invalid", "error": "id is required"}
+            continue
+        item_id = normalize_id(raw_id)
+        if item_id is None:
+            results[index] = {"id": raw_id, "status": "invalid", "error": "id must be a string or integer"}
+            continue
+        fields = {k: v for k, v in patch.items() if k != "id"}
+        unknown = [k for k in fields if k not in allowed]
+        if unknown:
+            results[index] = {"id": item_id, "status": "invalid", "error": f"unknown fields: {', '.join(unknown)}"}
+        elif not fields:
+            results[index] = {"id": item_id, "status": "invalid", "error": "no fields to update"}
+        elif item_id in seen:
+            results[index] = {"id": item_id, "status": "invalid", "error": "id appears more than once"}
+        elif item_id not in existing_ids:
+            results[index] = {"id": item_id, "status": "not_found"}
+        else:
+            seen.add(item_id)
+            valid.append((index, item_id, fields))
+    return valid, results
+
+
+def apply_patches(table, user_id, patches, cursor):
+    """UPDATE every (index, id, fields) patch, one executemany per distinct set of patched columns."""
+    groups = defaultdict(list)
+    for _, item_id, fields in patches:
+        columns = tuple(sorted(fields))
+        groups[columns].append((*[fields[c] for c in columns], item_id, user_id))
+    for columns, rows in groups.items():
+        cursor.executemany(f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ? AND user_id = ?",
+                           rows)
+
+
+def delete_rows(table, user_id, ids, cursor):
+    cursor.executemany(f"DELETE FROM {table} WHERE id = ? AND user_id = ?", [(i, user_id) for i in ids])
+
+
+def delete_results(ids, existing):
+    """Per-item results of a bulk delete in request order; ids that are not strings or integers are invalid."""
+    results = []
+    for raw_id in ids:
+        item_id = normalize_id(raw_id)
+        if item_id is None:
+            results.append({"id": raw_id, "status": "invalid", "error": "id must be a string or integer"})
+        else:
+            results.append({"id": item_id, "status": "deleted" if item_id in existing else "not_found"})
+    return results
+
+
+def ordered_results(count, results):
+    return [results[index] for index in range(count)]
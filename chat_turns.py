@@ -0,0 +1,47 @@
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+# The turn currently being processed, so log_user_activity can buffer into it
+current_chat_turn = ContextVar("current_chat_turn", default=None)
+
+
+class ChatTurn:
+    """Collects the rows one chat exchange writes and persists them in a single commit."""
+
+    def __init__(self, user_id, message, timestamp=None):
+        self.user_id = user_id
+        self.timestamp = timestamp or datetime.now().isoformat()
+        self.messages = [(user_id, "user", message, self.timestamp)]
+        self.activities = []
+
+    def log_activity(self, user_id, action, details, timestamp=None):
+        self.activities.append((user_id, action, json.dumps(details), timestamp or datetime.now().isoformat()))
+
+    def reply(self, bot_message, timestamp=None):
+        self.messages.append((self.user_id, "bot", bot_message, timestamp or datetime.now().isoformat()))
+
+    @contextmanager
+    def active(self):
+        token = current_chat_turn.set(self)
+        try:
+            yield self
+        finally:
+            current_chat_turn.reset(token)
+
+    def save(self, cursor, conn):
+        try:
+            cursor.executemany(
+                "INSERT INTO chat_messages (user_id, sender, message, timestamp) VALUES (?, ?, ?, ?)",
+                self.messages
+            )
+            if self.activities:
+                cursor.executemany(
+                    "INSERT INTO user_activity_log (user_id, action, details, timestamp) VALUES (?, ?, ?, ?)",
+                    self.activities
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
@@ -1,14 +1,92 @@
+import time
+
 from flask import jsonify
 from config import *
 from database import conn, cursor
 from utils import log_user_activity
+from conversation_state import conversation_state
+
+FLOW = "draft_email"
+DEFAULT_SUBJECT = "Your CRE Update"
+# A bare reply only answers the pending question within this many seconds of it being asked
+REPLY_WINDOW = 300
+
+
+def _campaign_type(message, state):
+    if "realblast" in message:
+        return "RealBlast"
+    if "mailchimp" in message:
+        return "Mailchimp"
+    return state.get("campaign_type", "Mailchimp")
+
+
+def _draft(user_id, campaign_type, subject, audience_id, state, openai_client):
+    # Same campaign, subject and audience as the last draft: reuse it instead of another LLM call
+    draft_key = f"{campaign_type}|{subject}|{audience_id}"
+    content = state.get("content") if state.get("draft_key") == draft_key else None
+
+    if content is None:
+        if not openai_client:
+            return jsonify({"error": "OpenAI client not initialized. Check server logs for details."}), 500
+        try:
+            target = f"group {audience_id}" if campaign_type == "RealBlast" else f"audience {audience_id}"
+            response = openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a professional email writer for a commercial real estate chatbot."},
+                    {"role": "user", "content": f"Draft a {campaign_type} email for {target} with subject '{subject}'."}
+                ]
+            )
+            content = response.choices[0].message.content
+        except Exception as e:
+            answer = f"Failed to draft email: {str(e)}. Try again."
+            return jsonify({"answer": answer, "tts": answer})
+    conversation_state.update(user_id, FLOW, audience_id=audience_id, draft_key=draft_key, content=content, step="done")
+
+    if campaign_type == "RealBlast":
+        answer = f"Here’s your RealBlast email for group {audience_id}:\nSubject: {subject}\nContent:\n{content}\n\nCopy and paste this into your RealNex RealBlast setup. 📧"
+        log_user_activity(user_id, "draft_email", {"type": "RealBlast", "group_id": audience_id}, cursor, conn)
+    else:
+        answer = f"Here’s your Mailchimp email for audience {audience_id}:\nSubject: {subject}\nContent:\n{content}\n\nCopy and paste this into your Mailchimp campaign setup. 📧"
+        log_user_activity(user_id, "draft_email", {"type": "Mailchimp", "audience_id": audience_id}, cursor, conn)
+    return jsonify({"answer": answer, "tts": answer})
+
+
+def _pending_step(user_id, state):
+    """The step a bare reply answers, or None; a flow left unanswered past REPLY_WINDOW is dropped."""
+    step = state.get("step")
+    if step not in ("subject", "audience"):
+        return None
+    if time.time() - state.get("asked_at", 0) > REPLY_WINDOW:
+        conversation_state.clear(user_id, FLOW)
+        return None
+    return step
+
+
+def _start_draft(user_id, state, **values):
+    """Replace the flow state for a new draft; only the last draft (keyed on all its inputs) carries over."""
+    conversation_state.clear(user_id, FLOW)
+    cached = {k: state[k] for k in ("draft_key", "content") if k in state}
+    return conversation_state.update(user_id, FLOW, **cached, **values)
+
+
+def _set_subject(user_id, campaign_type, subject):
+    conversation_state.update(user_id, FLOW, campaign_type=campaign_type, subject=subject, step="audience",
+                              asked_at=time.time())
+    if campaign_type == "RealBlast":
+        answer = f"Got the subject: '{subject}'. Which RealNex group ID should this go to? (e.g., 'group123')"
+    else:
+        answer = f"Got the subject: '{subject}'. Which Mailchimp audience ID should this go to? (e.g., 'audience456')"
+    return jsonify({"answer": answer, "tts": answer})
+
 
 def handle_draft_email(message, user_id, settings, openai_client):
+    state = conversation_state.get(user_id, FLOW)
+    pending = _pending_step(user_id, state)
+
     if 'draft an email' in message:
         campaign_type = "RealBlast" if "realblast" in message else "Mailchimp"
-        subject = "Your CRE Update"
-        audience_id = None
-        content = None
+        _start_draft(user_id, state, campaign_type=campaign_type, step="subject", asked_at=time.time())
 
         if "realblast" in message:
             answer = "Let’s draft a RealBlast email! What’s the subject? (e.g., 'New Property Listing') Or say 'suggest a subject' to get ideas."
@@ -22,7 +100,7 @@ def handle_draft_email(message, user_id, settings, openai_client):
             answer = "Subject line generator is disabled in settings. Enable it to get suggestions! ⚙️"
             return jsonify({"answer": answer, "tts": answer})
 
-        campaign_type = "RealBlast" if "realblast" in message else "Mailchimp"
+        campaign_type = _campaign_type(message, state)
         if not openai_client:
             return jsonify({"error": "OpenAI client not initialized. Check server logs for details."}), 500
         try:
@@ -34,6 +112,8 @@ def handle_draft_email(message, user_id, settings, openai_client):
                 ]
             )
             subject = response.choices[0].message.content.strip()
+            conversation_state.update(user_id, FLOW, campaign_type=campaign_type, suggested_subject=subject, step="subject",
+                                      asked_at=time.time())
             answer = f"Suggested subject: '{subject}'. Does this work? Say the subject to use it, or provide your own!"
             log_user_activity(user_id, "suggest_subject", {"campaign_type": campaign_type, "subject": subject}, cursor, conn)
             return jsonify({"answer": answer, "tts": answer})
@@ -41,54 +121,35 @@ def handle_draft_email(message, user_id, settings, openai_client):
             answer = f"Failed to generate subject line: {str(e)}. Try providing your own subject."
             return jsonify({"answer": answer, "tts": answer})
 
-    elif 'subject' in message and 'realblast' in message:
+    elif 'subject' in message and ('realblast' in message or 'mailchimp' in message):
         subject = message.split('subject')[-1].strip()
-        answer = f"Got the subject: '{subject}'. Which RealNex group ID should this go to? (e.g., 'group123')"
-        return jsonify({"answer": answer, "tts": answer})
+        campaign_type = _campaign_type(message, state)
+        _start_draft(user_id, state)
+        return _set_subject(user_id, campaign_type, subject)
 
+    # Only a subject given for the draft awaiting its audience applies; anything older is another campaign's
     elif 'group id' in message:
         audience_id = message.split('group id')[-1].strip()
-        if not openai_client:
-            return jsonify({"error": "OpenAI client not initialized. Check server logs for details."}), 500
-        try:
-            response = openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a professional email writer for a commercial real estate chatbot."},
-                    {"role": "user", "content": f"Draft a RealBlast email for group {audience_id} with subject 'Your CRE Update'."}
-                ]
-            )
-            content = response.choices[0].message.content
-            answer = f"Here’s your RealBlast email for group {audience_id}:\nSubject: Your CRE Update\nContent:\n{content}\n\nCopy and paste this into your RealNex RealBlast setup. 📧"
-            log_user_activity(user_id, "draft_email", {"type": "RealBlast", "group_id": audience_id}, cursor, conn)
-            return jsonify({"answer": answer, "tts": answer})
-        except Exception as e:
-            answer = f"Failed to draft email: {str(e)}. Try again."
-            return jsonify({"answer": answer, "tts": answer})
-
-    elif 'subject' in message and 'mailchimp' in message:
-        subject = message.split('subject')[-1].strip()
-        answer = f"Got the subject: '{subject}'. Which Mailchimp audience ID should this go to? (e.g., 'audience456')"
-        return jsonify({"answer": answer, "tts": answer})
+        subject = state.get("subject", DEFAULT_SUBJECT) if pending == "audience" else DEFAULT_SUBJECT
+        return _draft(user_id, "RealBlast", subject, audience_id, state, openai_client)
 
     elif 'audience id' in message:
         audience_id = message.split('audience id')[-1].strip()
-        if not openai_client:
-            return jsonify({"error": "OpenAI client not initialized. Check server logs for details."}), 500
-        try:
-            response = openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a professional email writer for a commercial real estate chatbot."},
-                    {"role": "user", "content": f"Draft a Mailchimp email for audience {audience_id} with subject 'Your CRE Update'."}
-                ]
-            )
-            content = response.choices[0].message.content
-            answer = f"Here’s your Mailchimp email for audience {audience_id}:\nSubject: Your CRE Update\nContent:\n{content}\n\nCopy and paste this into your Mailchimp campaign setup. 📧"
-            log_user_activity(user_id, "draft_email", {"type": "Mailchimp", "audience_id": audience_id}, cursor, conn)
-            return jsonify({"answer": answer, "tts": answer})
-        except Exception as e:
-            answer = f"Failed to draft email: {str(e)}. Try again."
-            return jsonify({"answer": answer, "tts": answer})
+        subject = state.get("subject", DEFAULT_SUBJECT) if pending == "audience" else DEFAULT_SUBJECT
+        return _draft(user_id, "Mailchimp", subject, audience_id, state, openai_client)
+
+    elif message.strip() == 'cancel' and state.get("step") in ("subject", "audience"):
+        conversation_state.clear(user_id, FLOW)
+        answer = "No problem, I’ve dropped that email draft. ✉️"
+        return jsonify({"answer": answer, "tts": answer})
+
+    # Resume an open flow: a reply within REPLY_WINDOW of the last question is the value itself
+    elif pending == "subject":
+        if state.get("suggested_subject") and message.strip() in ("yes", "use it", "that works", "sounds good"):
+            return _set_subject(user_id, state["campaign_type"], state["suggested_subject"])
+        return _set_subject(user_id, state["campaign_type"], message.strip())
+
+    elif pending == "audience":
+        return _draft(user_id, state["campaign_type"], state.get("subject", DEFAULT_SUBJECT), message.strip(), state, openai_client)
 
     return None
@@ -1,11 +1,9 @@
 from flask import jsonify
-from email.mime.text import MIMEText
-import smtplib
 from datetime import datetime
 
-from config import SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASSWORD
 from database import conn, cursor
 from utils import log_user_activity
+from notifications import notification_service
 
 def handle_help_phrases(message, user_id):
     help_phrases = ["i need a human", "more help", "support help", "billing help", "sales support"]
@@ -24,16 +22,11 @@ def handle_help_phrases(message, user_id):
             f"Details: {message}\n\n"
             "Please assist this user as soon as possible."
         )
-        msg = MIMEText(body)
-        msg['Subject'] = subject
-        msg['From'] = SMTP_USER
-        msg['To'] = to_email
-
+        # Queued on the pooled notification service; the chat reply does not wait for SMTP
+        delivery = notification_service.send_email(to_email, subject, body)
         try:
-            with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-                server.starttls()
-                server.login(SMTP_USER, SMTP_PASSWORD)
-                server.sendmail(SMTP_USER, to_email, msg.as_string())
+            if delivery.done():
+                delivery.result()
             contact_info = (
                 "I’ve sent a support request to the RealNex team for you! They’ll get back to you soon. "
                 "If you need to reach them directly, here’s their contact info:\n"
@@ -4,10 +4,17 @@ import re
 from config import *
 from database import conn, cursor
 from utils import *
+from conversation_state import conversation_state
+from comps_index import get_comps_index
 
-def handle_negotiate_deal(message, user_id, openai_client):
+FLOW = "negotiate_deal"
+NEGOTIATION_NEAREST_COMPS = 12
+
+async def handle_negotiate_deal(message, user_id, openai_client):
     if 'negotiate deal' in message:
-        deal_type = "LeaseComp" if "leasecomp" in message else "SaleComp" if "salecomp" in message else None
+        # Details given in earlier turns carry over, so a follow-up only needs what changed
+        state = conversation_state.get(user_id, FLOW)
+        deal_type = "LeaseComp" if "leasecomp" in message else "SaleComp" if "salecomp" in message else state.get("deal_type")
         sq_ft = None
         offered_value = None
         if 'square footage' in message or 'sq ft' in message:
@@ -16,6 +23,9 @@ def handle_negotiate_deal(message, user_id, openai_client):
         if 'offered' in message:
             offered_value = re.search(r'offered\s*\$\s*([\d.]+)', message)
             offered_value = float(offered_value.group(1)) if offered_value else None
+        sq_ft = sq_ft or state.get("sq_ft")
+        offered_value = offered_value or state.get("offered_value")
+        conversation_state.update(user_id, FLOW, deal_type=deal_type, sq_ft=sq_ft, offered_value=offered_value)
 
         if not deal_type or not sq_ft or not offered_value:
             answer = "To negotiate a deal, I need the deal type (LeaseComp or SaleComp), square footage, and offered value. Say something like 'negotiate deal for LeaseComp with 5000 sq ft offered $5000'. What’s the deal type, square footage, and offered value? 🤝"
@@ -26,23 +36,31 @@ def handle_negotiate_deal(message, user_id, openai_client):
             answer = "Please fetch your RealNex JWT token in Settings to negotiate a deal. 🔑"
             return jsonify({"answer": answer, "tts": answer})
 
+        # Same negotiation asked again: answer from the last LLM result
+        negotiation_key = f"{deal_type}|{sq_ft}|{offered_value}"
+        if state.get("negotiation_key") == negotiation_key and state.get("answer"):
+            return jsonify({"answer": state["answer"], "tts": state["answer"]})
+
         if not openai_client:
             return jsonify({"error": "OpenAI client not initialized. Check server logs for details."}), 500
 
-        historical_data = await get_realnex_data(user_id, f"{deal_type}s", cursor)
-        if not historical_data:
+        index = await get_comps_index(user_id, deal_type, cursor)
+        if not index:
             answer = "No historical data available for negotiation."
             return jsonify({"answer": answer, "tts": answer})
 
+        unit = 'per month' if deal_type == 'LeaseComp' else 'total'
         prompt = (
             f"You are a commercial real estate negotiation expert. Based on the following historical {deal_type} data, "
             f"suggest a counteroffer for a property with {sq_ft} square feet, where the offered value is ${offered_value} "
-            f"({'per month' if deal_type == 'LeaseComp' else 'total'}). Historical data (square footage, value):\n"
+            f"({unit}). The {NEGOTIATION_NEAREST_COMPS} most similar comps (square footage, value, close date):\n"
         )
-        for item in historical_data:
-            sq_ft_value = item.get("sq_ft", 0)
-            value = item.get("rent_month", 0) if deal_type == "LeaseComp" else item.get("sale_price", 0)
-            prompt += f"- {sq_ft_value} sq ft: ${value} {'per month' if deal_type == 'LeaseComp' else 'total'}\n"
+        # Only the nearest comps go in verbatim; the whole history is represented by precomputed statistics
+        prompt += "\n".join(
+            f"- {comp['sq_ft']:,.0f} sq ft: ${comp['value']:,.2f} {unit} (${comp['price_per_sq_ft']}/sq ft, {comp['close_date'] or 'undated'})"
+            for comp in index.nearest(sq_ft, NEGOTIATION_NEAREST_COMPS)
+        ) + "\n"
+        prompt += "\n".join(index.summary_lines(unit)) + "\n"
         prompt += "Provide a counteroffer with a confidence score (0-100) and a brief explanation."
 
         try:
@@ -71,6 +89,7 @@ def handle_negotiate_deal(message, user_id, openai_client):
                 f"Explanation: {explanation}\n"
                 f"Ready to close this deal? 🤝"
             )
+            conversation_state.update(user_id, FLOW, negotiation_key=negotiation_key, answer=answer)
             log_user_activity(user_id, "negotiate_deal", {"deal_type": deal_type, "sq_ft": sq_ft, "offered_value": offered_value, "counteroffer": counteroffer}, cursor, conn)
             return jsonify({"answer": answer, "tts": answer})
         except Exception as e:
@@ -1,7 +1,8 @@
 import re
 import logging
-import httpx
-from .utils import get_token, log_user_activity
+from .utils import get_token, log_user_activity, cached_realnex_get
+from .contact_search import search_contacts
+from .realnex_mirror import find_companies, find_properties, resolve_property, spaces_at_property, sync_state
 
 # Configure logging
 logging.basicConfig(
@@ -14,6 +15,61 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+RECENT_DEALS_TTL = 30
+
+def _format_properties(properties):
+    return "\n".join([f"ID: {p['id']}, {p['name'] or p['address'] or 'N/A'}, {p['city'] or 'N/A'} {p['zip'] or ''}".rstrip()
+                      for p in properties])
+
+
+def _query_mirror(text, user_id, cursor, conn):
+    """Answer property, space and company lookups from the local mirror; None for any other query."""
+    zip_match = re.match(r'properties in zip (\S+)$', text, re.IGNORECASE)
+    city_match = re.match(r'properties in (.+)$', text, re.IGNORECASE)
+    spaces_match = re.match(r'spaces (?:at|in) property (.+)$', text, re.IGNORECASE)
+    company_match = re.match(r'find company (.+)$', text, re.IGNORECASE)
+    if zip_match or city_match:
+        entities = ["properties"]
+    elif spaces_match:
+        # The property is resolved from the properties mirror before its spaces are read
+        entities = ["properties", "spaces"]
+    elif company_match:
+        entities = ["companies"]
+    else:
+        return None
+    unsynced = [entity for entity in entities if not sync_state(user_id, entity, cursor)]
+    if unsynced:
+        commands = " and ".join(f"'sync {entity}'" for entity in unsynced)
+        return f"Your RealNex {' and '.join(unsynced)} haven't been synced yet. Run {commands} first."
+
+    if zip_match or city_match:
+        where = {"zip": zip_match.group(1)} if zip_match else {"city": city_match.group(1).strip()}
+        properties = find_properties(user_id, cursor, **where)
+        log_user_activity(user_id, "realnex_query", {"query": text, "source": "mirror"}, cursor, conn)
+        if not properties:
+            return f"No properties found in {next(iter(where.values()))}."
+        return f"Properties in {next(iter(where.values()))}:\n{_format_properties(properties)}"
+
+    if spaces_match:
+        prop = resolve_property(user_id, spaces_match.group(1), cursor)
+        if not prop:
+            return f"No property '{spaces_match.group(1).strip()}' found in your synced RealNex properties."
+        spaces = spaces_at_property(user_id, prop["id"], cursor)
+        log_user_activity(user_id, "realnex_query", {"query": text, "source": "mirror"}, cursor, conn)
+        label = prop["name"] or prop["address"] or prop["id"]
+        if not spaces:
+            return f"No spaces found at {label}."
+        space_list = "\n".join([f"Space {s['space_number'] or s['id']}, Sq Ft: {s['sq_ft'] or 'N/A'}" for s in spaces])
+        return f"Spaces at {label}:\n{space_list}"
+
+    companies = find_companies(user_id, cursor, name=company_match.group(1))
+    log_user_activity(user_id, "realnex_query", {"query": text, "source": "mirror"}, cursor, conn)
+    if not companies:
+        return f"No companies found for '{company_match.group(1).strip()}'."
+    company_list = "\n".join([f"Name: {c['name']}, Address: {c['address'] or 'N/A'}" for c in companies])
+    return f"Companies Found:\n{company_list}"
+
+
 def handle_realnex_query(query, user_id, cursor, conn):
     """Handle RealNex-related queries by fetching data from the API."""
     match = re.match(r'realnex (.*)', query, re.IGNORECASE)
@@ -21,6 +77,21 @@ def handle_realnex_query(query, user_id, cursor, conn):
         return "Invalid RealNex query. Use: 'realnex <query>'"
 
     realnex_query = match.group(1).lower().strip()
+
+    # Companies, properties and spaces mirrored by 'sync' are answered locally
+    mirror_answer = _query_mirror(match.group(1).strip(), user_id, cursor, conn)
+    if mirror_answer:
+        return mirror_answer
+
+    # Contacts already synced locally are answered from the search index, without a RealNex round trip
+    if "find contact" in realnex_query:
+        contact_name = realnex_query.replace("find contact", "").strip()
+        local = search_contacts(user_id, contact_name, cursor)
+        if local:
+            contact_list = "\n".join([f"Name: {contact['name']}, Email: {contact['email'] or 'N/A'}" for contact in local])
+            log_user_activity(user_id, "realnex_query", {"query": f"find contact {contact_name}", "source": "local"}, cursor, conn)
+            return f"Contacts Found:\n{contact_list}"
+
     realnex_token = get_token(user_id, "realnex", cursor)
     if not realnex_token:
         return "No RealNex token found. Please set it in settings."
@@ -28,19 +99,14 @@ def handle_realnex_query(query, user_id, cursor, conn):
     # Example queries: "realnex get recent deals", "realnex find contact John Doe"
     if "recent deals" in realnex_query:
         try:
-            with httpx.Client() as client:
-                response = client.get(
-                    "https://api.realnex.com/v1/deals",
-                    headers={'Authorization': f'Bearer {realnex_token}'},
-                    params={"limit": 5, "sort": "created_date_desc"}
-                )
-                response.raise_for_status()
-                deals = response.json()
-                if not deals:
-                    return "No recent deals found in RealNex."
-                deal_list = "\n".join([f"Deal ID: {deal['id']}, Amount: ${deal.get('amount', 'N/A')}, Date: {deal.get('created_date', 'N/A')}" for deal in deals])
-                log_user_activity(user_id, "realnex_query", {"query": "recent deals"}, cursor, conn)
-                return f"Recent RealNex Deals:\n{deal_list}"
+            # New deals should show up quickly, so this listing is only reused for a short while
+            deals = cached_realnex_get(user_id, "https://api.realnex.com/v1/deals", realnex_token,
+                                       {"limit": 5, "sort": "created_date_desc"}, ttl=RECENT_DEALS_TTL)
+            if not deals:
+                return "No recent deals found in RealNex."
+            deal_list = "\n".join([f"Deal ID: {deal['id']}, Amount: ${deal.get('amount', 'N/A')}, Date: {deal.get('created_date', 'N/A')}" for deal in deals])
+            log_user_activity(user_id, "realnex_query", {"query": "recent deals"}, cursor, conn)
+            return f"Recent RealNex Deals:\n{deal_list}"
         except Exception as e:
             logger.error(f"Failed to fetch RealNex deals: {e}")
             return f"Failed to fetch RealNex deals: {str(e)}"
@@ -48,22 +114,18 @@ def handle_realnex_query(query, user_id, cursor, conn):
     elif "find contact" in realnex_query:
         contact_name = realnex_query.replace("find contact", "").strip()
         try:
-            with httpx.Client() as client:
-                response = client.get(
-                    "https://api.realnex.com/v1/contacts",
-                    headers={'Authorization': f'Bearer {realnex_token}'},
-                    params={"search": contact_name}
-                )
-                response.raise_for_status()
-                contacts = response.json()
-                if not contacts:
-                    return f"No contacts found for '{contact_name}' in RealNex."
-                contact_list = "\n".join([f"Name: {contact['name']}, Email: {contact.get('email', 'N/A')}" for contact in contacts])
-                log_user_activity(user_id, "realnex_query", {"query": f"find contact {contact_name}"}, cursor, conn)
-                return f"Contacts Found in RealNex:\n{contact_list}"
+            contacts = cached_realnex_get(user_id, "https://api.realnex.com/v1/contacts", realnex_token,
+                                          {"search": contact_name})
+            if not contacts:
+                return f"No contacts found for '{contact_name}' in RealNex."
+            contact_list = "\n".join([f"Name: {contact['name']}, Email: {contact.get('email', 'N/A')}" for contact in contacts])
+            log_user_activity(user_id, "realnex_query", {"query": f"find contact {contact_name}"}, cursor, conn)
+            return f"Contacts Found in RealNex:\n{contact_list}"
         except Exception as e:
             logger.error(f"Failed to fetch RealNex contacts: {e}")
             return f"Failed to fetch RealNex contacts: {str(e)}"
 
     else:
-        return "Unsupported RealNex query. Try 'realnex get recent deals' or 'realnex find contact <name>'."
+        return ("Unsupported RealNex query. Try 'realnex get recent deals', 'realnex find contact <name>', "
+                "'realnex find company <name>', 'realnex properties in <city>', 'realnex properties in zip <zip>' or "
+                "'realnex spaces at property <id or name>'.")
@@ -7,6 +7,7 @@ from twilio.rest import Client as TwilioClient
 import mailchimp_marketing as Mailchimp
 import httpx
 from .utils import get_user_settings, get_token, send_2fa_code, check_2fa, log_user_activity, award_points
+from .notifications import notification_service
 
 # Configure logging
 logging.basicConfig(
@@ -19,6 +20,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def _report_realblast(user_id, group_id, future):
+    """Done-callback of a queued RealBlast SMS, run on the notification worker."""
+    error = future.exception()
+    if error:
+        logger.error(f"RealBlast to group {group_id} for user {user_id} failed: {error}")
+    else:
+        logger.info(f"RealBlast to group {group_id} for user {user_id} delivered")
+
 def handle_send_campaign(query, user_id, cursor, conn, twilio_client, mailchimp_client):
     """Handle sending a campaign (RealBlast or Mailchimp) based on the query."""
     settings = get_user_settings(user_id, cursor, conn)
@@ -49,14 +58,15 @@ def handle_send_campaign(query, user_id, cursor, conn, twilio_client, mailchimp_
         if not twilio_client:
             return "Twilio client not initialized."
         try:
-            twilio_client.messages.create(
-                body=content,
-                from_='+1234567890',  # Replace with actual Twilio number
-                to=f"+{group_id}"     # Simplified; in reality, resolve group_id to phone numbers
-            )
-            log_user_activity(user_id, "send_realblast", {"group_id": group_id, "content": content}, cursor, conn)
+            # Simplified; in reality, resolve group_id to phone numbers and queue them all.
+            # The reply does not wait for Twilio: the outcome lands in the log and /metrics/notifications
+            delivery = notification_service.send_sms(f"+{group_id}", content)
+            delivery.add_done_callback(lambda future: _report_realblast(user_id, group_id, future))
+            if delivery.done():
+                delivery.result()
+            log_user_activity(user_id, "send_realblast", {"group_id": group_id, "content": content, "status": "queued"}, cursor, conn)
             _, _, _, points_message = award_points(user_id, 10, "sending RealBlast", cursor, conn)
-            return f"RealBlast sent to group {group_id}! {points_message}"
+            return f"RealBlast queued for group {group_id}! {points_message}"
         except Exception as e:
             logger.error(f"Failed to send RealBlast: {e}")
             return f"Failed to send RealBlast: {str(e)}"
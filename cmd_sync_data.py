@@ -3,6 +3,9 @@ import logging
 import httpx
 from datetime import datetime
 from .utils import get_user_settings, get_token, log_user_activity, hash_entity, log_duplicate, log_health_history
+from .duplicate_index import index_contacts
+from .realnex_mirror import refresh_mirror
+from .identity_resolution import email_key, phone_key, resolve_identities
 
 # Configure logging
 logging.basicConfig(
@@ -54,6 +57,15 @@ def check_phone_health(phone):
         logger.error(f"Failed to check phone health for {phone}: {e}")
         return 0
 
+def _health_score(scores, check, value, identity_key):
+    """Health score of an email or phone, validated once per sync however many providers list it."""
+    if not value:
+        return 0
+    key = identity_key(value) or value
+    if key not in scores:
+        scores[key] = check(value)
+    return scores[key]
+
 def handle_sync_data(query, user_id, cursor, conn):
     """Handle syncing data with RealNex, Mailchimp, Constant Contact, Apollo.io, Seamless.AI, and ZoomInfo."""
     match = re.match(r'sync (crm|contacts|companies|properties|spaces|all)', query, re.IGNORECASE)
@@ -79,9 +91,12 @@ def handle_sync_data(query, user_id, cursor, conn):
 
     # Initialize lists for all entities
     all_contacts = []
+    new_contact_ids = []
     all_companies = []
     all_properties = []
     all_spaces = []
+    email_scores = {}
+    phone_scores = {}
 
     # Fetch local entities from database
     if "contacts" in entities_to_sync:
@@ -92,71 +107,53 @@ def handle_sync_data(query, user_id, cursor, conn):
             cursor.execute("SELECT contact_hash FROM duplicates_log WHERE user_id = ? AND contact_hash = ?", (user_id, contact_hash))
             if not cursor.fetchone():
                 # Check email and phone health
-                email_score = check_email_health(contact["email"]) if contact["email"] else 0
-                phone_score = check_phone_health(contact["phone"]) if contact["phone"] else 0
+                email_score = _health_score(email_scores, check_email_health, contact["email"], email_key)
+                phone_score = _health_score(phone_scores, check_phone_health, contact["phone"], phone_key)
                 log_health_history(user_id, contact["id"], email_score, phone_score, cursor, conn)
                 all_contacts.append(contact)
             else:
                 log_duplicate(user_id, contact, "contact", cursor, conn)
 
-    # Fetch companies, properties, spaces from RealNex (simplified for demo)
+    # Companies, properties and spaces are mirrored locally; only rows changed since the last sync come back
     if "companies" in entities_to_sync:
         try:
-            with httpx.Client() as client:
-                response = client.get(
-                    "https://api.realnex.com/v1/companies",
-                    headers={'Authorization': f'Bearer {realnex_token}'}
-                )
-                response.raise_for_status()
-                companies = response.json()
-                for company in companies:
-                    company_data = {"id": company["id"], "name": company.get("name", ""), "address": company.get("address", "")}
-                    company_hash = hash_entity(company_data, "company")
-                    cursor.execute("SELECT contact_hash FROM duplicates_log WHERE user_id = ? AND contact_hash = ?", (user_id, company_hash))
-                    if not cursor.fetchone():
-                        all_companies.append(company_data)
-                    else:
-                        log_duplicate(user_id, company_data, "company", cursor, conn)
+            companies = refresh_mirror(user_id, "companies", realnex_token, cursor, conn)
+            for company in companies:
+                company_data = {"id": company["id"], "name": company.get("name", ""), "address": company.get("address", "")}
+                company_hash = hash_entity(company_data, "company")
+                cursor.execute("SELECT contact_hash FROM duplicates_log WHERE user_id = ? AND contact_hash = ?", (user_id, company_hash))
+                if not cursor.fetchone():
+                    all_companies.append(company_data)
+                else:
+                    log_duplicate(user_id, company_data, "company", cursor, conn)
         except Exception as e:
             logger.error(f"Failed to fetch companies from RealNex: {e}")
 
     if "properties" in entities_to_sync:
         try:
-            with httpx.Client() as client:
-                response = client.get(
-                    "https://api.realnex.com/v1/properties",
-                    headers={'Authorization': f'Bearer {realnex_token}'}
-                )
-                response.raise_for_status()
-                properties = response.json()
-                for prop in properties:
-                    prop_data = {"id": prop["id"], "address": prop.get("address", ""), "city": prop.get("city", ""), "zip": prop.get("zip", "")}
-                    prop_hash = hash_entity(prop_data, "property")
-                    cursor.execute("SELECT contact_hash FROM duplicates_log WHERE user_id = ? AND contact_hash = ?", (user_id, prop_hash))
-                    if not cursor.fetchone():
-                        all_properties.append(prop_data)
-                    else:
-                        log_duplicate(user_id, prop_data, "property", cursor, conn)
+            properties = refresh_mirror(user_id, "properties", realnex_token, cursor, conn)
+            for prop in properties:
+                prop_data = {"id": prop["id"], "address": prop.get("address", ""), "city": prop.get("city", ""), "zip": prop.get("zip", "")}
+                prop_hash = hash_entity(prop_data, "property")
+                cursor.execute("SELECT contact_hash FROM duplicates_log WHERE user_id = ? AND contact_hash = ?", (user_id, prop_hash))
+                if not cursor.fetchone():
+                    all_properties.append(prop_data)
+                else:
+                    log_duplicate(user_id, prop_data, "property", cursor, conn)
         except Exception as e:
             logger.error(f"Failed to fetch properties from RealNex: {e}")
 
     if "spaces" in entities_to_sync:
         try:
-            with httpx.Client() as client:
-                response = client.get(
-                    "https://api.realnex.com/v1/spaces",
-                    headers={'Authorization': f'Bearer {realnex_token}'}
-                )
-                response.raise_for_status()
-                spaces = response.json()
-                for space in spaces:
-                    space_data = {"id": space["id"], "property_id": space.get("property_id", ""), "space_number": space.get("space_number", "")}
-                    space_hash = hash_entity(space_data, "space")
-                    cursor.execute("SELECT contact_hash FROM duplicates_log WHERE user_id = ? AND contact_hash = ?", (user_id, space_hash))
-                    if not cursor.fetchone():
-                        all_spaces.append(space_data)
-                    else:
-                        log_duplicate(user_id, space_data, "space", cursor, conn)
+            spaces = refresh_mirror(user_id, "spaces", realnex_token, cursor, conn)
+            for space in spaces:
+                space_data = {"id": space["id"], "property_id": space.get("property_id", ""), "space_number": space.get("space_number", "")}
+                space_hash = hash_entity(space_data, "space")
+                cursor.execute("SELECT contact_hash FROM duplicates_log WHERE user_id = ? AND contact_hash = ?", (user_id, space_hash))
+                if not cursor.fetchone():
+                    all_spaces.append(space_data)
+                else:
+                    log_duplicate(user_id, space_data, "space", cursor, conn)
         except Exception as e:
             logger.error(f"Failed to fetch spaces from RealNex: {e}")
 
@@ -184,12 +181,14 @@ def handle_sync_data(query, user_id, cursor, conn):
                         contact_hash = hash_entity(contact_data, "contact")
                         cursor.execute("SELECT contact_hash FROM duplicates_log WHERE user_id = ? AND contact_hash = ?", (user_id, contact_hash))
                         if not cursor.fetchone():
-                            email_score = check_email_health(contact_data["email"]) if contact_data["email"] else 0
-                            phone_score = check_phone_health(contact_data["phone"]) if contact_data["phone"] else 0
+                            email_score = _health_score(email_scores, check_email_health, contact_data["email"], email_key)
+                            phone_score = _health_score(phone_scores, check_phone_health, contact_data["phone"], phone_key)
                             log_health_history(user_id, contact_id, email_score, phone_score, cursor, conn)
                             all_contacts.append(contact_data)
                             cursor.execute("INSERT OR IGNORE INTO contacts (id, name, email, phone, user_id) VALUES (?, ?, ?, ?, ?)",
                                            (contact_id, contact_data['name'], contact_data['email'], contact_data['phone'], user_id))
+                            if cursor.rowcount:
+                                new_contact_ids.append(contact_id)
                             conn.commit()
                         else:
                             log_duplicate(user_id, contact_data, "contact", cursor, conn)
@@ -238,12 +237,14 @@ def handle_sync_data(query, user_id, cursor, conn):
                         contact_hash = hash_entity(contact_data, "contact")
                         cursor.execute("SELECT contact_hash FROM duplicates_log WHERE user_id = ? AND contact_hash = ?", (user_id, contact_hash))
                         if not cursor.fetchone():
-                            email_score = check_email_health(contact_data["email"]) if contact_data["email"] else 0
-                            phone_score = check_phone_health(contact_data["phone"]) if contact_data["phone"] else 0
+                            email_score = _health_score(email_scores, check_email_health, contact_data["email"], email_key)
+                            phone_score = _health_score(phone_scores, check_phone_health, contact_data["phone"], phone_key)
                             log_health_history(user_id, contact_id, email_score, phone_score, cursor, conn)
                             all_contacts.append(contact_data)
                             cursor.execute("INSERT OR IGNORE INTO contacts (id, name, email, phone, user_id) VALUES (?, ?, ?, ?, ?)",
                                            (contact_id, contact_data['name'], contact_data['email'], contact_data['phone'], user_id))
+                            if cursor.rowcount:
+                                new_contact_ids.append(contact_id)
                             conn.commit()
                         else:
                             log_duplicate(user_id, contact_data, "contact", cursor, conn)
@@ -273,18 +274,30 @@ def handle_sync_data(query, user_id, cursor, conn):
                         contact_hash = hash_entity(contact_data, "contact")
                         cursor.execute("SELECT contact_hash FROM duplicates_log WHERE user_id = ? AND contact_hash = ?", (user_id, contact_hash))
                         if not cursor.fetchone():
-                            email_score = check_email_health(contact_data["email"]) if contact_data["email"] else 0
-                            phone_score = check_phone_health(contact_data["phone"]) if contact_data["phone"] else 0
+                            email_score = _health_score(email_scores, check_email_health, contact_data["email"], email_key)
+                            phone_score = _health_score(phone_scores, check_phone_health, contact_data["phone"], phone_key)
                             log_health_history(user_id, contact_id, email_score, phone_score, cursor, conn)
                             all_contacts.append(contact_data)
                             cursor.execute("INSERT OR IGNORE INTO contacts (id, name, email, phone, user_id) VALUES (?, ?, ?, ?, ?)",
                                            (contact_id, contact_data['name'], contact_data['email'], contact_data['phone'], user_id))
+                            if cursor.rowcount:
+                                new_contact_ids.append(contact_id)
                             conn.commit()
                         else:
                             log_duplicate(user_id, contact_data, "contact", cursor, conn)
         except Exception as e:
             logger.error(f"Failed to fetch data from ZoomInfo: {e}")
 
+    # New contacts are scored against their blocks only, keeping the duplicates view current
+    index_contacts(user_id, new_contact_ids, cursor, conn)
+
+    # The same person often comes from several providers under different ids: push one golden record each
+    golden_contacts = resolve_identities(all_contacts)
+    if len(golden_contacts) < len(all_contacts):
+        log_user_activity(user_id, "resolve_contact_identities",
+                          {"records": len(all_contacts), "people": len(golden_contacts)}, cursor, conn)
+    all_contacts = golden_contacts
+
     # Sync to RealNex
     try:
         with httpx.Client() as client:
@@ -302,7 +315,8 @@ def handle_sync_data(query, user_id, cursor, conn):
                         }
                     )
                     response.raise_for_status()
-                    log_user_activity(user_id, "sync_realnex_contact", {"contact_id": contact["id"], "group_id": realnex_group_id}, cursor, conn)
+                    log_user_activity(user_id, "sync_realnex_contact", {"contact_id": contact["id"], "merged_ids": contact["merged_ids"],
+                                                                        "group_id": realnex_group_id}, cursor, conn)
 
             if all_companies:
                 for company in all_companies:
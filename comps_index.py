@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from comps_mirror import ensure_comps, load_comps
+from deal_valuation import comps_frame, target_values, EPOCH
+from ttl_cache import TTLCache, MISSING
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# Keyed by the mirror's sync time, so a refresh naturally retires the old index
+_indexes = TTLCache(maxsize=256, ttl=6 * 3600)
+
+
+class CompsIndex:
+    """Comps sorted by square footage for O(log n + k) nearest-neighbour lookups.
+
+    Percentiles and the price-per-sq-ft trend are computed once at build time, so a
+    prompt built from the index costs O(k) no matter how long the comp history is.
+    """
+
+    def __init__(self, comps, deal_type):
+        df = comps_frame(comps)
+        df = df[df["sq_ft"] > 0]
+        order = np.argsort(df["sq_ft"].to_numpy(dtype=float), kind="stable")
+        self.deal_type = deal_type
+        self.sq_ft = df["sq_ft"].to_numpy(dtype=float)[order]
+        self.values = target_values(df, deal_type)[order]
+        self.close_dates = df["close_date"].to_numpy()[order]
+        self.price_per_sq_ft = self.values / self.sq_ft
+        self.summary = self._summarize(df["close_date"].iloc[order])
+
+    def __len__(self):
+        return len(self.sq_ft)
+
+    def _summarize(self, close_dates):
+        if not len(self):
+            return {"count": 0}
+        summary = {
+            "count": len(self),
+            "value_percentiles": dict(zip(PERCENTILES, np.percentile(self.values, PERCENTILES).round(2).tolist())),
+            "ppsf_percentiles": dict(zip(PERCENTILES, np.percentile(self.price_per_sq_ft, PERCENTILES).round(2).tolist())),
+            "ppsf_trend_per_year": None,
+        }
+        dated = close_dates.notna().to_numpy()
+        if dated.sum() >= 2:
+            years = ((close_dates[dated] - EPOCH).dt.days / 365.25).to_numpy(dtype=float)
+            if np.ptp(years) > 0:
+                summary["ppsf_trend_per_year"] = round(float(np.polyfit(years, self.price_per_sq_ft[dated], 1)[0]), 4)
+        return summary
+
+    def nearest(self, sq_ft, k=10):
+        """The k comps closest in square footage, nearest first, found by bisecting the sorted array."""
+        right = int(np.searchsorted(self.sq_ft, sq_ft))
+        left = right - 1
+        picked = []
+        while len(picked) < k and (left >= 0 or right < len(self)):
+            if right >= len(self) or (left >= 0 and sq_ft - self.sq_ft[left] <= self.sq_ft[right] - sq_ft):
+                picked.append(left)
+                left -= 1
+            else:
+                picked.append(right)
+                right += 1
+        return [{"sq_ft": float(self.sq_ft[i]), "value": float(self.values[i]),
+                 "price_per_sq_ft": round(float(self.price_per_sq_ft[i]), 2),
+                 "close_date": None if pd.isna(self.close_dates[i]) else str(self.close_dates[i])[:10]}
+                for i in picked]
+
+    def summary_lines(self, unit):
+        """Precomputed statistics rendered for a prompt."""
+        if not len(self):
+            return []
+        values = self.summary["value_percentiles"]
+        ppsf = self.summary["ppsf_percentiles"]
+        lines = [
+            f"- All {self.summary['count']} comps, value ({unit}) p10/p25/median/p75/p90: "
+            + " / ".join(f"${values[p]:,.2f}" for p in PERCENTILES),
+            "- Price per sq ft p10/p25/median/p75/p90: " + " / ".join(f"${ppsf[p]:,.2f}" for p in PERCENTILES),
+        ]
+        if self.summary["ppsf_trend_per_year"] is not None:
+            lines.append(f"- Price per sq ft trend: {self.summary['ppsf_trend_per_year']:+,.2f} per year")
+        return lines
+
+
+async def get_comps_index(user_id, deal_type, cursor):
+    """Index over the user's mirrored comps, rebuilt only after the mirror refreshes."""
+    synced_at = await ensure_comps(user_id, deal_type, cursor)
+    if synced_at is None:
+        return None
+    key = (user_id, deal_type, synced_at)
+    index = _indexes.get(key)
+    if index is MISSING:
+        index = CompsIndex(load_comps(user_id, deal_type, cursor), deal_type)
+        _indexes.set(key, index)
+    return index
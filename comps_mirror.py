@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import httpx
+
+from config import REALNEX_API_BASE
+from db import logger, db_path
+from deal_models import deal_value, invalidate_deal_models
+from alert_engine import evaluate_deal
+from utils import get_token
+
+# Mirrored comps are served immediately; older than this they are refreshed in the background
+COMPS_REFRESH_TTL = timedelta(minutes=30)
+# Incremental fetches cannot see deletions, so the whole history is re-pulled this often
+COMPS_FULL_REFRESH = timedelta(hours=24)
+MODIFIED_FIELD = "LastModified"
+MIRROR_COLUMNS = ["sq_ft", "rent_month", "sale_price", "amount", "close_date", "deal_type"]
+# Keeps each IN (...) list well under SQLite's bound-parameter limit
+_CHUNK = 500
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="comps-refresh")
+_inflight = {}
+_lock = threading.Lock()
+
+
+def _comp_id(row):
+    key = row.get("key") or row.get("Key") or row.get("id")
+    if key:
+        return str(key)
+    return hashlib.md5(json.dumps(row, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _modified_at(row):
+    return row.get(MODIFIED_FIELD) or row.get("last_modified")
+
+
+def _sync_state(user_id, deal_type, cursor):
+    cursor.execute("SELECT synced_at, full_synced_at, high_water FROM comps_sync WHERE user_id = ? AND deal_type = ?",
+                   (user_id, deal_type))
+    return cursor.fetchone()
+
+
+def _mirrored(user_id, deal_type, comp_ids, cursor):
+    """comp_id -> mirrored row dict for those of `comp_ids` already in realnex_comps."""
+    rows = {}
+    comp_ids = list(comp_ids)
+    for start in range(0, len(comp_ids), _CHUNK):
+        chunk = comp_ids[start:start + _CHUNK]
+        cursor.execute(f"""
+            SELECT comp_id, sq_ft, rent_month, sale_price, amount, close_date FROM realnex_comps
+            WHERE user_id = ? AND deal_type = ? AND comp_id IN ({", ".join("?" * len(chunk))})
+        """, (user_id, deal_type, *chunk))
+        rows.update((row[0], dict(zip(MIRROR_COLUMNS, row[1:] + (deal_type,)))) for row in cursor.fetchall())
+    return rows
+
+
+def _fetch(token, deal_type, since=None):
+    """GET the comps collection, only rows modified after `since` when given."""
+    params = {"$filter": f"{MODIFIED_FIELD} gt {since}"} if since else None
+    with httpx.Client(timeout=30) as client:
+        response = client.get(f"{REALNEX_API_BASE}/{deal_type}s", params=params,
+                              headers={'Authorization': f'Bearer {token}'})
+        response.raise_for_status()
+        return response.json().get("value", [])
+
+
+def _refresh(user_id, deal_type, full=False):
+    """Pull new or changed comps into realnex_comps; runs on the refresh pool with its own connection."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    try:
+        token = get_token(user_id, "realnex", cursor)
+        if not token:
+            return 0
+        state = _sync_state(user_id, deal_type, cursor)
+        now = datetime.now()
+        full = full or not state or not state[1] or now - datetime.fromisoformat(state[1]) > COMPS_FULL_REFRESH
+        since = None if full else state[2]
+        try:
+            rows = _fetch(token, deal_type, since)
+        except httpx.HTTPStatusError as e:
+            if since is None or e.response.status_code != 400:
+                raise
+            # The collection does not support filtering on the modification time: fall back to a full pull
+            full, since = True, None
+            rows = _fetch(token, deal_type)
+
+        records = [(user_id, deal_type, _comp_id(row), row.get("sq_ft"), row.get("rent_month"), row.get("sale_price"),
+                    row.get("amount"), row.get("close_date"), _modified_at(row)) for row in rows]
+        high_water = max([r[8] for r in records if r[8]], default=state[2] if state else None)
+        # Only a pull filtered on the high-water mark holds just new or changed comps; compare those
+        # with the mirror before it is overwritten so alerts see each comp's previous value
+        previous = _mirrored(user_id, deal_type, [r[2] for r in records], cursor) if since is not None else None
+        if full:
+            cursor.execute("DELETE FROM realnex_comps WHERE user_id = ? AND deal_type = ?", (user_id, deal_type))
+        cursor.executemany("""
+            INSERT OR REPLACE INTO realnex_comps
+                (user_id, deal_type, comp_id, sq_ft, rent_month, sale_price, amount, close_date, modified_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, records)
+        cursor.execute("""
+            INSERT OR REPLACE INTO comps_sync (user_id, deal_type, synced_at, full_synced_at, high_water)
+            VALUES (?, ?, ?, ?, ?)
+        """, (user_id, deal_type, now.isoformat(), now.isoformat() if full else state[1], high_water))
+        conn.commit()
+        if full or records:
+            # Deal models seeded from the old mirror re-seed from the new one on the next prediction
+            invalidate_deal_models(user_id, cursor, conn, deal_type)
+        if previous is not None:
+            # New comps, and changed ones whose value moved, go past the user's deal alerts
+            for record, row in zip(records, rows):
+                deal, old_deal = {**row, "deal_type": deal_type}, previous.get(record[2])
+                if old_deal is None or deal_value(old_deal, deal_type) != deal_value(deal, deal_type):
+                    evaluate_deal(user_id, deal, cursor, source="sync", old_deal=old_deal)
+        logger.info(f"Comps mirror refreshed for user {user_id} {deal_type}: {len(records)} rows ({'full' if full else 'incremental'})")
+        return len(records)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _run_refresh(key, user_id, deal_type, full):
+    try:
+        return _refresh(user_id, deal_type, full)
+    except Exception as e:
+        logger.error(f"Comps mirror refresh failed for user {user_id} {deal_type}: {e}")
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+
+
+def refresh_comps(user_id, deal_type, full=False):
+    """Start a mirror refresh, or join the one already running for this user and deal type."""
+    key = (user_id, deal_type)
+    with _lock:
+        future = _inflight.get(key)
+        if future is None:
+            future = _inflight[key] = _executor.submit(_run_refresh, key, user_id, deal_type, full)
+    return future
+
+
+def load_comps(user_id, deal_type, cursor):
+    cursor.execute("""
+        SELECT sq_ft, rent_month, sale_price, amount, close_date
+        FROM realnex_comps WHERE user_id = ? AND deal_type = ?
+    """, (user_id, deal_type))
+    return [dict(zip(MIRROR_COLUMNS, row + (deal_type,))) for row in cursor.fetchall()]
+
+
+async def ensure_comps(user_id, deal_type, cursor):
+    """Make sure the mirror is usable and return its last sync time (None if it never synced).
+
+    Only the very first request waits on RealNex; afterwards stale mirrors are served as-is
+    while a single shared background refresh brings them up to date.
+    """
+    state = _sync_state(user_id, deal_type, cursor)
+    if state is None:
+        try:
+            await asyncio.wrap_future(refresh_comps(user_id, deal_type))
+        except Exception:
+            return None
+        state = _sync_state(user_id, deal_type, cursor)
+        return state[0] if state else None
+    if datetime.now() - datetime.fromisoformat(state[0]) > COMPS_REFRESH_TTL:
+        refresh_comps(user_id, deal_type)
+    return state[0]
+
+
+async def get_comps(user_id, deal_type, cursor):
+    """Comps for a user and deal type from the local mirror."""
+    if await ensure_comps(user_id, deal_type, cursor) is None:
+        return []
+    return load_comps(user_id, deal_type, cursor)
@@ -1,4 +1,5 @@
 import os
+from urllib.parse import quote
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,6 +14,28 @@ REDIS_PORT = int(os.getenv('REDIS_PORT', 11362))
 REDIS_USERNAME = os.getenv('REDIS_USERNAME', 'default')
 REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', '')
 REDIS_CA_PATH = os.getenv('REDIS_CA_PATH', 'certs/redis_ca.pem')
+REDIS_SSL = os.getenv('REDIS_SSL', 'true').lower() == 'true'
+# Optional shared tier for per-user caches and conversation state
+REDIS_CACHE_ENABLED = os.getenv('REDIS_CACHE_ENABLED', 'false').lower() == 'true'
+
+# Socket.IO scale-out: a redis:// URL, or "redis" to build one from the settings above
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+SOCKETIO_ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE') or None
+
+
+def redis_url(db=0):
+    scheme = 'rediss' if REDIS_SSL else 'redis'
+    auth = f"{quote(REDIS_USERNAME)}:{quote(REDIS_PASSWORD)}@" if REDIS_PASSWORD else ''
+    url = f"{scheme}://{auth}{REDIS_HOST}:{REDIS_PORT}/{db}"
+    if REDIS_SSL and REDIS_CA_PATH:
+        url += f"?ssl_ca_certs={quote(REDIS_CA_PATH)}"
+    return url
+
+# Admission control (per-user token buckets and per-endpoint concurrency caps)
+ADMISSION_CONTROL_ENABLED = os.getenv('ADMISSION_CONTROL_ENABLED', 'true').lower() == 'true'
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 5))
+# Reverse proxies in front of the app whose X-Forwarded-For/-Proto entries are trusted (0: use the peer address)
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
 
 # SMTP config
 SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
@@ -0,0 +1,187 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from db import logger, db_path
+from dedupe import normalize_email
+from duplicate_index import index_contacts, reset_duplicate_index
+from contact_outbox import record_contact_changes
+from utils import log_user_activity
+
+IMPORT_FORMATS = (".csv", ".xlsx")
+IMPORT_BATCH_SIZE = 5000
+# Past this many new contacts the duplicate index is rebuilt on next read instead of re-keyed per contact
+INDEX_INLINE_LIMIT = 5000
+IMPORT_DIR = os.getenv("IMPORT_DIR", tempfile.gettempdir())
+MAPPING_FIELDS = ("name", "first_name", "last_name", "email", "phone", "company")
+# Used for any column the saved mapping does not cover
+DEFAULT_MAPPING = {
+    "name": "name", "full name": "name", "contact name": "name",
+    "first name": "first_name", "firstname": "first_name", "last name": "last_name", "lastname": "last_name",
+    "email": "email", "email address": "email", "e-mail": "email",
+    "phone": "phone", "phone number": "phone", "mobile": "phone",
+    "company": "company", "company name": "company", "organization": "company",
+}
+PROGRESS_COLUMNS = ["id", "filename", "status", "rows_read", "inserted", "duplicates", "skipped", "error",
+                    "created_at", "updated_at"]
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="contact-import")
+
+
+def save_field_mapping(user_id, name, mapping, cursor, conn):
+    cursor.execute("INSERT OR REPLACE INTO field_mappings (user_id, name, mapping, updated_at) VALUES (?, ?, ?, ?)",
+                   (user_id, name, json.dumps(mapping), datetime.now().isoformat()))
+    conn.commit()
+
+
+def load_field_mapping(user_id, name, cursor):
+    cursor.execute("SELECT mapping FROM field_mappings WHERE user_id = ? AND name = ?", (user_id, name))
+    row = cursor.fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def column_fields(header, mapping=None):
+    """Column index -> contact field for a header row, saved mapping first, then the default column names."""
+    mapping = {str(k).strip().lower(): v for k, v in (mapping or {}).items()}
+    fields = {}
+    for index, column in enumerate(header):
+        column = str(column or "").strip().lower()
+        field = mapping.get(column) or DEFAULT_MAPPING.get(column)
+        if field in MAPPING_FIELDS and field not in fields.values():
+            fields[index] = field
+    return fields
+
+
+def read_rows(path, filename):
+    """Stream rows (header first) from a CSV or XLSX file without loading it whole."""
+    if filename.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield ["" if value is None else str(value) for value in row]
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+            yield from csv.reader(f)
+
+
+def map_row(row, fields):
+    values = {field: (row[index].strip() if index < len(row) else "") for index, field in fields.items()}
+    name = values.get("name") or " ".join(filter(None, [values.get("first_name"), values.get("last_name")]))
+    return name, values.get("email", "").lower(), values.get("phone", ""), values.get("company", "")
+
+
+def fingerprint(name, email, phone):
+    """8-byte identity of a contact: normalized email, else phone digits, else the name."""
+    local, domain = normalize_email(email)
+    if local:
+        key = f"e:{local}@{domain}"
+    elif re.sub(r"\D", "", phone or ""):
+        key = "p:" + re.sub(r"\D", "", phone)[-10:]
+    else:
+        key = "n:" + " ".join((name or "").lower().split())
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def existing_fingerprints(user_id, cursor):
+    cursor.execute("SELECT name, email, phone FROM contacts WHERE user_id = ?", (user_id,))
+    return {fingerprint(*row) for row in cursor}
+
+
+def _progress(import_id, cursor, **fields):
+    fields["updated_at"] = datetime.now().isoformat()
+    cursor.execute(f"UPDATE contact_imports SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                   (*fields.values(), import_id))
+
+
+def import_contacts(import_id, user_id, path, filename, mapping=None):
+    """Stream the file into contacts one batch (and one transaction) at a time, recording progress as it goes."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    counts = {"rows_read": 0, "inserted": 0, "duplicates": 0, "skipped": 0}
+    try:
+        _progress(import_id, cursor, status="running")
+        conn.commit()
+        seen = existing_fingerprints(user_id, cursor)
+        rows = read_rows(path, filename)
+        fields = column_fields(next(rows, []), mapping)
+        if not {"name", "first_name", "email"} & set(fields.values()):
+            raise ValueError("No name or email column found")
+        new_ids = []
+        while True:
+            batch = list(islice(rows, IMPORT_BATCH_SIZE))
+            if not batch:
+                break
+            records = []
+            for row in batch:
+                name, email, phone, company = map_row(row, fields)
+                if not name and not email:
+                    counts["skipped"] += 1
+                    continue
+                key = fingerprint(name, email, phone)
+                if key in seen:
+                    counts["duplicates"] += 1
+                    continue
+                seen.add(key)
+                records.append((str(uuid.uuid4()), name, email, phone, company, user_id))
+            counts["rows_read"] += len(batch)
+            counts["inserted"] += len(records)
+            cursor.executemany("INSERT INTO contacts (id, name, email, phone, company, user_id) VALUES (?, ?, ?, ?, ?, ?)",
+                               records)
+            # Mailchimp/RealNex pushes are outbox events committed with the batch itself
+            record_contact_changes(user_id, [r[0] for r in records], cursor)
+            _progress(import_id, cursor, **counts)
+            conn.commit()
+            if new_ids is not None:
+                new_ids.extend(r[0] for r in records)
+                if len(new_ids) > INDEX_INLINE_LIMIT:
+                    new_ids = None
+        if new_ids is None:
+            reset_duplicate_index(user_id, cursor, conn)
+        else:
+            index_contacts(user_id, new_ids, cursor, conn)
+        _progress(import_id, cursor, status="completed")
+        conn.commit()
+        log_user_activity(user_id, "import_contacts", {"import_id": import_id, **counts}, cursor, conn)
+        logger.info(f"Contact import {import_id} finished for user {user_id}: {counts}")
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Contact import {import_id} failed for user {user_id}: {e}")
+        _progress(import_id, cursor, status="failed", error=str(e))
+        conn.commit()
+    finally:
+        conn.close()
+        os.remove(path)
+
+
+def start_import(user_id, upload, mapping, cursor, conn):
+    """Spool the upload to disk and import it in the background; returns the import id to poll."""
+    import_id = str(uuid.uuid4())
+    fd, path = tempfile.mkstemp(prefix="contact_import_", suffix=os.path.splitext(upload.filename)[1], dir=IMPORT_DIR)
+    with os.fdopen(fd, "wb") as f:
+        upload.save(f)
+    now = datetime.now().isoformat()
+    cursor.execute("""
+        INSERT INTO contact_imports (id, user_id, filename, status, rows_read, inserted, duplicates, skipped, created_at, updated_at)
+        VALUES (?, ?, ?, 'queued', 0, 0, 0, 0, ?, ?)
+    """, (import_id, user_id, upload.filename, now, now))
+    conn.commit()
+    _executor.submit(import_contacts, import_id, user_id, path, upload.filename, mapping)
+    return import_id
+
+
+def get_import(user_id, import_id, cursor):
+    cursor.execute(f"SELECT {', '.join(PROGRESS_COLUMNS)} FROM contact_imports WHERE id = ? AND user_id = ?",
+                   (import_id, user_id))
+    row = cursor.fetchone()
+    return dict(zip(PROGRESS_COLUMNS, row)) if row else None
@@ -0,0 +1,319 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+
+from db import logger, db_path
+from utils import get_user_settings, get_token, log_user_activity, invalidate_realnex_queries
+
+# Events wait this long before being pushed, so a burst of edits to one contact becomes one push
+COALESCE_DELAY = timedelta(seconds=1)
+POLL_INTERVAL = 1.0
+BATCH_SIZE = 500
+# Claimed events are hidden from other workers (e.g. other gunicorn processes) for this long
+LEASE = timedelta(seconds=60)
+MAX_ATTEMPTS = 8
+MAILCHIMP_BATCH_LIMIT = 500
+CONTACT_COLUMNS = ["id", "name", "email", "phone", "company"]
+
+
+def _now():
+    return datetime.now()
+
+
+def _snapshot(row):
+    return dict(zip(CONTACT_COLUMNS, row)) if row else None
+
+
+def _done_targets(event):
+    """Targets (e.g. "mailchimp", "realnex") an outbox event has already been pushed to."""
+    return set(filter(None, (event[6] or "").split(",")))
+
+
+def _response_id(response):
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    value = (body.get("id") or body.get("key")) if isinstance(body, dict) else None
+    return str(value) if value is not None else None
+
+
+def record_contact_change(user_id, contact_id, op, cursor, contact=None):
+    """Append a change event for `contact_id` ("upsert" or "delete"); committed by the caller with the write itself.
+
+    Deletes carry the contact as it was, since the row is gone by the time the worker runs.
+    """
+    cursor.execute("""
+        INSERT INTO contact_outbox (user_id, contact_id, op, payload, attempts, available_at, created_at)
+        VALUES (?, ?, ?, ?, 0, ?, ?)
+    """, (user_id, contact_id, op, json.dumps(contact) if contact else None,
+          (_now() + COALESCE_DELAY).isoformat(), _now().isoformat()))
+    contact_sync_worker.start()
+
+
+def record_contact_changes(user_id, contact_ids, cursor, op="upsert", contacts=None):
+    """record_contact_change for many contacts in one executemany (imports and bulk endpoints).
+
+    For deletes, `contacts` holds the snapshot of each contact, parallel to `contact_ids`.
+    """
+    available_at, created_at = (_now() + COALESCE_DELAY).isoformat(), _now().isoformat()
+    payloads = [json.dumps(c) for c in contacts] if contacts else [None] * len(contact_ids)
+    cursor.executemany("""
+        INSERT INTO contact_outbox (user_id, contact_id, op, payload, attempts, available_at, created_at)
+        VALUES (?, ?, ?, ?, 0, ?, ?)
+    """, [(user_id, contact_id, op, payload, available_at, created_at)
+          for contact_id, payload in zip(contact_ids, payloads)])
+    contact_sync_worker.start()
+
+
+def _subscriber_hash(email):
+    return hashlib.md5(email.lower().encode()).hexdigest()
+
+
+def _mailchimp_member(contact):
+    name = contact.get("name") or ""
+    return {
+        "email_address": contact["email"],
+        "status": "subscribed",
+        "merge_fields": {
+            "FNAME": name.split()[0] if name else "",
+            "LNAME": " ".join(name.split()[1:]) if len(name.split()) > 1 else ""
+        }
+    }
+
+
+class ContactSyncWorker:
+    """Drains contact_outbox from a background thread.
+
+    Each pass leases a batch of due events, keeps only the latest event per contact, reads
+    settings and tokens once per user, and pushes upserts in batches: one Mailchimp batch
+    subscribe per list, and one RealNex create per contact followed by updates of that record.
+    Events that failed for a target are retried with exponential backoff up to MAX_ATTEMPTS,
+    skipping the targets they already reached.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._wake = threading.Event()
+        self.metrics = {"pushed": 0, "coalesced": 0, "failed": 0, "dropped": 0, "batches": 0}
+
+    def start(self):
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="contact-sync", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        while True:
+            try:
+                if self.process_due(cursor, conn):
+                    continue
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Contact sync pass failed: {e}")
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+
+    def _claim(self, cursor, conn, now):
+        """Lease up to BATCH_SIZE due events; the write lock keeps concurrent workers from claiming the same ones."""
+        # Idle polls only read, so they never queue behind (or block) request writes for the lock
+        cursor.execute("SELECT 1 FROM contact_outbox WHERE available_at <= ? LIMIT 1", (now.isoformat(),))
+        if cursor.fetchone() is None:
+            return []
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            SELECT id, user_id, contact_id, op, payload, attempts, done_targets FROM contact_outbox
+            WHERE available_at <= ? ORDER BY id LIMIT ?
+        """, (now.isoformat(), BATCH_SIZE))
+        events = cursor.fetchall()
+        cursor.executemany("UPDATE contact_outbox SET available_at = ? WHERE id = ?",
+                           [((now + LEASE).isoformat(), event[0]) for event in events])
+        conn.commit()
+        return events
+
+    def process_due(self, cursor, conn, now=None):
+        """Push one batch of due events; returns how many events it handled."""
+        now = now or _now()
+        events = self._claim(cursor, conn, now)
+        if not events:
+            return 0
+        latest = OrderedDict()
+        for event in events:
+            latest.pop((event[1], event[2]), None)
+            latest[(event[1], event[2])] = event
+        self.metrics["coalesced"] += len(events) - len(latest)
+        by_user = defaultdict(list)
+        for (user_id, contact_id), event in latest.items():
+            by_user[user_id].append(event)
+        claimed = defaultdict(list)
+        for event in events:
+            claimed[event[1]].append(event)
+        for user_id, user_events in by_user.items():
+            # Superseded events are covered by the latest one for their contact
+            latest_ids = {event[0] for event in user_events}
+            cursor.executemany("DELETE FROM contact_outbox WHERE id = ?",
+                               [(event[0],) for event in claimed[user_id] if event[0] not in latest_ids])
+            try:
+                pushed, pending, error = self._push_user(user_id, user_events, cursor, conn)
+            except Exception as e:
+                pushed, pending, error = 0, {event[0]: _done_targets(event) for event in user_events}, e
+            self.metrics["pushed"] += pushed
+            cursor.executemany("DELETE FROM contact_outbox WHERE id = ?",
+                               [(event[0],) for event in user_events if event[0] not in pending])
+            if pending:
+                cursor.executemany("UPDATE contact_outbox SET done_targets = ? WHERE id = ?",
+                                   [(",".join(sorted(done)), event_id) for event_id, done in pending.items()])
+                self._retry(user_id, [event for event in user_events if event[0] in pending], error, cursor, conn, now)
+            conn.commit()
+        self.metrics["batches"] += 1
+        return len(events)
+
+    def _retry(self, user_id, events, error, cursor, conn, now):
+        self.metrics["failed"] += len(events)
+        logger.error(f"Contact sync failed for user {user_id} ({len(events)} events): {error}")
+        retry, dropped = [], []
+        for event_id, _, contact_id, _, _, attempts, _ in events:
+            if attempts + 1 >= MAX_ATTEMPTS:
+                dropped.append((event_id,))
+            else:
+                retry.append(((now + timedelta(seconds=min(5 * 2 ** attempts, 900))).isoformat(), event_id))
+        cursor.executemany("UPDATE contact_outbox SET attempts = attempts + 1, available_at = ? WHERE id = ?", retry)
+        if dropped:
+            cursor.executemany("DELETE FROM contact_outbox WHERE id = ?", dropped)
+            self.metrics["dropped"] += len(dropped)
+            log_user_activity(user_id, "contact_sync", {"status": "dropped", "events": len(dropped), "error": str(error)},
+                              cursor, conn)
+
+    def _current(self, user_id, events, cursor):
+        """(event, contact) pairs: the contact as it stands now for upserts (None if it is gone), the snapshot for deletes."""
+        upsert_ids = [event[2] for event in events if event[3] == "upsert"]
+        current = {}
+        for start in range(0, len(upsert_ids), 500):
+            chunk = upsert_ids[start:start + 500]
+            cursor.execute(f"""
+                SELECT {", ".join(CONTACT_COLUMNS)} FROM contacts
+                WHERE user_id = ? AND id IN ({", ".join("?" * len(chunk))})
+            """, (user_id, *chunk))
+            current.update((row[0], _snapshot(row)) for row in cursor.fetchall())
+        return [(event, current.get(event[2]) if event[3] == "upsert" else json.loads(event[4]) if event[4] else None)
+                for event in events]
+
+    def _push_user(self, user_id, events, cursor, conn):
+        """Push the user's latest events to every configured target.
+
+        Returns (contacts pushed, {event id: targets reached} for events not yet pushed everywhere, first error).
+        Targets an event already reached are skipped when it is retried.
+        """
+        settings = get_user_settings(user_id, cursor, conn)
+        mailchimp_key = get_token(user_id, "mailchimp", cursor)
+        realnex_token = get_token(user_id, "realnex", cursor)
+        realnex_group_id = settings.get("realnex_group_id")
+        targets = (["mailchimp"] if mailchimp_key else []) + (["realnex"] if realnex_token and realnex_group_id else [])
+        items = self._current(user_id, events, cursor)
+        done = {event[0]: _done_targets(event) for event in events}
+        pushed, errors = 0, []
+        with httpx.Client(timeout=30) as client:
+            if "mailchimp" in targets:
+                try:
+                    pushed += self._push_mailchimp(client, settings, mailchimp_key, items, done)
+                except Exception as e:
+                    errors.append(e)
+            if "realnex" in targets:
+                try:
+                    pushed += self._push_realnex(client, user_id, realnex_token, realnex_group_id, items, done, cursor, conn)
+                except Exception as e:
+                    errors.append(e)
+        pending = {event_id: reached for event_id, reached in done.items() if not set(targets) <= reached}
+        if targets and not pending:
+            log_user_activity(user_id, "contact_sync", {
+                "status": "success",
+                "upserts": sum(1 for event in events if event[3] == "upsert"),
+                "deletes": sum(1 for event in events if event[3] == "delete")
+            }, cursor, conn)
+        return pushed, pending, errors[0] if errors else None
+
+    def _push_mailchimp(self, client, settings, api_key, items, done):
+        list_id = settings.get("mailchimp_group_id") or "default_list_id"
+        headers = {'Authorization': f'Bearer {api_key}'}
+        todo = []
+        for event, contact in items:
+            if "mailchimp" in done[event[0]]:
+                continue
+            if contact and contact.get("email"):
+                todo.append((event, contact))
+            else:
+                done[event[0]].add("mailchimp")
+        upserts = [(event, contact) for event, contact in todo if event[3] == "upsert"]
+        for start in range(0, len(upserts), MAILCHIMP_BATCH_LIMIT):
+            chunk = upserts[start:start + MAILCHIMP_BATCH_LIMIT]
+            response = client.post(f"https://api.mailchimp.com/3.0/lists/{list_id}", headers=headers,
+                                   json={"members": [_mailchimp_member(c) for _, c in chunk], "update_existing": True})
+            response.raise_for_status()
+            for event, _ in chunk:
+                done[event[0]].add("mailchimp")
+        for event, contact in todo:
+            if event[3] == "delete":
+                response = client.delete(
+                    f"https://api.mailchimp.com/3.0/lists/{list_id}/members/{_subscriber_hash(contact['email'])}",
+                    headers=headers)
+                if response.status_code != 404:
+                    response.raise_for_status()
+                done[event[0]].add("mailchimp")
+        return len(upserts)
+
+    def _push_realnex(self, client, user_id, token, group_id, items, done, cursor, conn):
+        """Create each contact in RealNex once, remembering its RealNex id; later changes update that record."""
+        headers = {'Authorization': f'Bearer {token}'}
+        pushed = 0
+        try:
+            for event, contact in items:
+                if "realnex" in done[event[0]]:
+                    continue
+                if event[3] == "delete" or contact is None:
+                    cursor.execute("DELETE FROM realnex_contact_links WHERE user_id = ? AND contact_id = ?", (user_id, event[2]))
+                    done[event[0]].add("realnex")
+                    continue
+                body = {"name": contact["name"], "email": contact["email"], "phone": contact["phone"],
+                        "company": contact["company"], "source": "CRE Chat Bot", "group_id": group_id}
+                cursor.execute("SELECT realnex_id FROM realnex_contact_links WHERE user_id = ? AND contact_id = ?",
+                               (user_id, event[2]))
+                link = cursor.fetchone()
+                if link is None:
+                    response = client.post("https://api.realnex.com/v1/contacts", headers=headers, json=body)
+                    response.raise_for_status()
+                    cursor.execute("INSERT OR REPLACE INTO realnex_contact_links (user_id, contact_id, realnex_id) VALUES (?, ?, ?)",
+                                   (user_id, event[2], _response_id(response)))
+                    # The link must outlive a failure later in the batch, or the retry would create the contact again
+                    conn.commit()
+                elif link[0]:
+                    response = client.put(f"https://api.realnex.com/v1/contacts/{link[0]}", headers=headers, json=body)
+                    response.raise_for_status()
+                else:
+                    logger.warning(f"RealNex did not return an id for contact {event[2]} of user {user_id}; update not pushed")
+                done[event[0]].add("realnex")
+                pushed += 1
+        finally:
+            if pushed:
+                # Cached RealNex contact searches would not show what was just written
+                invalidate_realnex_queries(user_id, "contacts")
+        return pushed
+
+    def flush(self):
+        """Make the worker look at the outbox now instead of at its next poll."""
+        self._wake.set()
+
+    def get_metrics(self, cursor):
+        cursor.execute("SELECT COUNT(*), MIN(created_at) FROM contact_outbox")
+        backlog, oldest = cursor.fetchone()
+        return {**self.metrics, "backlog": backlog, "oldest_event": oldest}
+
+
+contact_sync_worker = ContactSyncWorker()
@@ -0,0 +1,101 @@
+import re
+
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# user_id is indexed so MATCH only walks one tenant's postings; queries never search it
+SEARCH_COLUMNS = ("name", "email", "phone", "phone_digits", "company")
+FTS_COLUMNS = SEARCH_COLUMNS + ("user_id",)
+# bm25 weights, one per FTS column
+RANK_WEIGHTS = (10.0, 5.0, 1.0, 1.0, 3.0, 0.0)
+# Shorter terms match a large share of any index; prefixes below the shortest indexed one ('2') are not served
+MIN_TERM_LENGTH = 2
+
+
+def _digits_sql(column):
+    digits = column
+    for ch in "-() .+":
+        digits = f"replace({digits}, '{ch}', '')"
+    return digits
+
+
+def create_contact_search_index(cursor):
+    """FTS5 index over contacts, kept current by triggers; filled from existing rows when first created.
+
+    Phones are indexed as typed and, through a generated column, as bare digits so
+    '555-123-4567' and '5551234567' find the same contact. An index from before user_id
+    was indexed is dropped and rebuilt.
+    """
+    cursor.execute("PRAGMA table_xinfo(contacts)")
+    if 'phone_digits' not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f"ALTER TABLE contacts ADD COLUMN phone_digits TEXT GENERATED ALWAYS AS ({_digits_sql('phone')}) VIRTUAL")
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contacts_fts'")
+    exists = cursor.fetchone() is not None
+    if exists:
+        cursor.execute("PRAGMA table_info(contacts_fts)")
+        if 'user_id' not in {row[1] for row in cursor.fetchall()}:
+            for event in ("insert", "delete", "update"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS contacts_fts_{event}")
+            cursor.execute("DROP TABLE contacts_fts")
+            exists = False
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+            {", ".join(FTS_COLUMNS)},
+            content='contacts', content_rowid='rowid', prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    columns = ", ".join(FTS_COLUMNS)
+    new_values = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_insert AFTER INSERT ON contacts BEGIN
+            INSERT INTO contacts_fts (rowid, {columns}) VALUES (new.rowid, {new_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_delete AFTER DELETE ON contacts BEGIN
+            INSERT INTO contacts_fts (contacts_fts, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_update AFTER UPDATE ON contacts BEGIN
+            INSERT INTO contacts_fts (contacts_fts, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+            INSERT INTO contacts_fts (rowid, {columns}) VALUES (new.rowid, {new_values});
+        END
+    ''')
+    if not exists:
+        cursor.execute("INSERT INTO contacts_fts (contacts_fts) VALUES ('rebuild')")
+
+
+def match_expression(query):
+    """FTS5 query where every word of the input must match as a prefix; None if nothing searchable.
+
+    Words shorter than MIN_TERM_LENGTH are dropped.
+    """
+    terms = re.findall(r"\w+", query or "")
+    if len(terms) > 1 and re.fullmatch(r"[\d\s()+.-]+", query):
+        # A partly typed phone number: match it as one digits prefix rather than unrelated groups
+        digits = "".join(terms)
+        return f'phone_digits : "{digits}"*' if len(digits) >= MIN_TERM_LENGTH else None
+    terms = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_contacts(user_id, query, cursor, limit=SEARCH_LIMIT):
+    """Best-ranked contacts of a user for a free-text query, straight from the local index."""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    # The user_id phrase keeps MATCH inside this user's rows; c.user_id guards ids that tokenize alike
+    user_phrase = '"' + str(user_id).replace('"', '""') + '"'
+    scoped = f"user_id : {user_phrase} AND {{{' '.join(SEARCH_COLUMNS)}}} : ({expression})"
+    cursor.execute(f"""
+        SELECT c.id, c.name, c.email, c.phone, c.company
+        FROM contacts_fts JOIN contacts c ON c.rowid = contacts_fts.rowid
+        WHERE contacts_fts MATCH ? AND c.user_id = ?
+        ORDER BY bm25(contacts_fts, {", ".join(map(str, RANK_WEIGHTS))})
+        LIMIT ?
+    """, (scoped, user_id, min(int(limit), MAX_SEARCH_LIMIT)))
+    return [{"id": row[0], "name": row[1], "email": row[2], "phone": row[3], "company": row[4]}
+            for row in cursor.fetchall()]
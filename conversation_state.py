@@ -0,0 +1,61 @@
+import json
+import logging
+
+from ttl_cache import TTLCache, MISSING
+from redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationStateStore:
+    """Per-user state for multi-turn command flows.
+
+    Entries live in an in-memory LRU/TTL cache and, when Redis is enabled, are
+    mirrored there so a flow can resume on whichever worker gets the next turn.
+    """
+
+    def __init__(self, maxsize=10000, ttl=1800, redis_client=None, prefix="convstate"):
+        self.ttl = ttl
+        self.prefix = prefix
+        self.redis = redis_client
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def _redis_key(self, user_id, flow):
+        return f"{self.prefix}:{user_id}:{flow}"
+
+    def get(self, user_id, flow):
+        state = self._local.get((user_id, flow))
+        if state is not MISSING:
+            return dict(state)
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(self._redis_key(user_id, flow))
+                if raw:
+                    state = json.loads(raw)
+                    self._local.set((user_id, flow), state)
+                    return dict(state)
+            except Exception as e:
+                logger.warning(f"Conversation state read from Redis failed: {e}")
+        return {}
+
+    def update(self, user_id, flow, **values):
+        state = self.get(user_id, flow)
+        state.update(values)
+        self._local.set((user_id, flow), state)
+        if self.redis is not None:
+            try:
+                self.redis.set(self._redis_key(user_id, flow), json.dumps(state), ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"Conversation state write to Redis failed: {e}")
+        return state
+
+    def clear(self, user_id, flow):
+        self._local.pop((user_id, flow))
+        if self.redis is not None:
+            try:
+                self.redis.delete(self._redis_key(user_id, flow))
+            except Exception as e:
+                logger.warning(f"Conversation state delete from Redis failed: {e}")
+
+
+conversation_state = ConversationStateStore(redis_client=get_redis())
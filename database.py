@@ -1,5 +1,9 @@
 import sqlite3
 
+from contact_search import create_contact_search_index
+from list_views import create_list_schema
+from realnex_mirror import create_mirror_schema
+
 def init_db():
     """Initialize SQLite database and create tables."""
     conn = sqlite3.connect('chatbot.db', check_same_thread=False)
@@ -43,16 +47,129 @@ def init_db():
                       email TEXT,
                       user_id TEXT,
                       PRIMARY KEY (id, user_id))''')
+    cursor.execute("PRAGMA table_info(contacts)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if 'phone' not in columns:
+        cursor.execute("ALTER TABLE contacts ADD COLUMN phone TEXT")
+    if 'company' not in columns:
+        cursor.execute("ALTER TABLE contacts ADD COLUMN company TEXT")
     cursor.execute('''CREATE TABLE IF NOT EXISTS deals
                      (id TEXT,
                       amount INTEGER,
                       close_date TEXT,
                       user_id TEXT,
+                      sq_ft INTEGER,
+                      rent_month INTEGER,
+                      sale_price INTEGER,
+                      deal_type TEXT,
                       PRIMARY KEY (id, user_id))''')
+    cursor.execute("PRAGMA table_info(deals)")
+    columns = {row[1] for row in cursor.fetchall()}
+    for column, column_type in (("sq_ft", "INTEGER"), ("rent_month", "INTEGER"), ("sale_price", "INTEGER"), ("deal_type", "TEXT")):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE deals ADD COLUMN {column} {column_type}")
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_deals_user_close_date ON deals (user_id, close_date)')
     cursor.execute('''CREATE TABLE IF NOT EXISTS webhooks
                      (user_id TEXT,
                       webhook_url TEXT,
                       PRIMARY KEY (user_id))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS prompt_summaries
+                     (user_id TEXT,
+                      scope TEXT,
+                      summary TEXT,
+                      fingerprint TEXT,
+                      row_count INTEGER,
+                      updated_at TEXT,
+                      PRIMARY KEY (user_id, scope))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS deal_stats
+                     (user_id TEXT,
+                      deal_type TEXT,
+                      source TEXT,
+                      n REAL,
+                      sum_x REAL,
+                      sum_y REAL,
+                      sum_xx REAL,
+                      sum_xy REAL,
+                      sum_yy REAL,
+                      gram TEXT,
+                      xty TEXT,
+                      updated_at TEXT,
+                      PRIMARY KEY (user_id, deal_type, source))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS realnex_comps
+                     (user_id TEXT,
+                      deal_type TEXT,
+                      comp_id TEXT,
+                      sq_ft REAL,
+                      rent_month REAL,
+                      sale_price REAL,
+                      amount REAL,
+                      close_date TEXT,
+                      modified_at TEXT,
+                      PRIMARY KEY (user_id, deal_type, comp_id))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS comps_sync
+                     (user_id TEXT,
+                      deal_type TEXT,
+                      synced_at TEXT,
+                      full_synced_at TEXT,
+                      high_water TEXT,
+                      PRIMARY KEY (user_id, deal_type))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS contact_block_keys
+                     (user_id TEXT,
+                      block_key INTEGER,
+                      contact_id TEXT,
+                      PRIMARY KEY (user_id, block_key, contact_id))''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_contact_block_keys_contact ON contact_block_keys (user_id, contact_id)')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS duplicate_pairs
+                     (user_id TEXT,
+                      contact_id1 TEXT,
+                      contact_id2 TEXT,
+                      name_similarity INTEGER,
+                      email_similarity INTEGER,
+                      PRIMARY KEY (user_id, contact_id1, contact_id2))''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_duplicate_pairs_contact2 ON duplicate_pairs (user_id, contact_id2)')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS duplicate_index_state
+                     (user_id TEXT PRIMARY KEY,
+                      built_at TEXT)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS field_mappings
+                     (user_id TEXT,
+                      name TEXT,
+                      mapping TEXT,
+                      updated_at TEXT,
+                      PRIMARY KEY (user_id, name))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS contact_imports
+                     (id TEXT PRIMARY KEY,
+                      user_id TEXT,
+                      filename TEXT,
+                      status TEXT,
+                      rows_read INTEGER,
+                      inserted INTEGER,
+                      duplicates INTEGER,
+                      skipped INTEGER,
+                      error TEXT,
+                      created_at TEXT,
+                      updated_at TEXT)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS contact_outbox
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      user_id TEXT,
+                      contact_id TEXT,
+                      op TEXT,
+                      payload TEXT,
+                      attempts INTEGER,
+                      available_at TEXT,
+                      created_at TEXT,
+                      done_targets TEXT)''')
+    cursor.execute("PRAGMA table_info(contact_outbox)")
+    if 'done_targets' not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE contact_outbox ADD COLUMN done_targets TEXT")
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_contact_outbox_available ON contact_outbox (available_at)')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS realnex_contact_links
+                     (user_id TEXT,
+                      contact_id TEXT,
+                      realnex_id TEXT,
+                      PRIMARY KEY (user_id, contact_id))''')
+    create_contact_search_index(cursor)
+    create_list_schema(cursor)
+    create_mirror_schema(cursor)
     conn.commit()
     return conn, cursor
 
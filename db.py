@@ -2,6 +2,10 @@ import os
 import logging
 import sqlite3
 
+from contact_search import create_contact_search_index
+from list_views import create_list_schema
+from realnex_mirror import create_mirror_schema
+
 # Configure logging
 logging.basicConfig(
     level=logging.DEBUG,
@@ -42,6 +46,9 @@ cursor.execute('''
         FOREIGN KEY (user_id) REFERENCES users(id)
     )
 ''')
+cursor.execute("PRAGMA table_info(contacts)")
+if 'company' not in {row[1] for row in cursor.fetchall()}:
+    cursor.execute("ALTER TABLE contacts ADD COLUMN company TEXT")
 cursor.execute('''
     CREATE TABLE IF NOT EXISTS deals (
         id TEXT,
@@ -56,6 +63,7 @@ cursor.execute('''
         FOREIGN KEY (user_id) REFERENCES users(id)
     )
 ''')
+cursor.execute('CREATE INDEX IF NOT EXISTS idx_deals_user_close_date ON deals (user_id, close_date)')
 cursor.execute('''
     CREATE TABLE IF NOT EXISTS chat_messages (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -200,6 +208,147 @@ cursor.execute('''
         FOREIGN KEY (user_id) REFERENCES users(id)
     )
 ''')
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS prompt_summaries (
+        user_id TEXT,
+        scope TEXT,
+        summary TEXT,
+        fingerprint TEXT,
+        row_count INTEGER,
+        updated_at TEXT,
+        PRIMARY KEY (user_id, scope),
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+''')
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS deal_stats (
+        user_id TEXT,
+        deal_type TEXT,
+        source TEXT,
+        n REAL,
+        sum_x REAL,
+        sum_y REAL,
+        sum_xx REAL,
+        sum_xy REAL,
+        sum_yy REAL,
+        gram TEXT,
+        xty TEXT,
+        updated_at TEXT,
+        PRIMARY KEY (user_id, deal_type, source),
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+''')
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS realnex_comps (
+        user_id TEXT,
+        deal_type TEXT,
+        comp_id TEXT,
+        sq_ft REAL,
+        rent_month REAL,
+        sale_price REAL,
+        amount REAL,
+        close_date TEXT,
+        modified_at TEXT,
+        PRIMARY KEY (user_id, deal_type, comp_id),
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+''')
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS comps_sync (
+        user_id TEXT,
+        deal_type TEXT,
+        synced_at TEXT,
+        full_synced_at TEXT,
+        high_water TEXT,
+        PRIMARY KEY (user_id, deal_type),
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+''')
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS contact_block_keys (
+        user_id TEXT,
+        block_key INTEGER,
+        contact_id TEXT,
+        PRIMARY KEY (user_id, block_key, contact_id),
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+''')
+cursor.execute('CREATE INDEX IF NOT EXISTS idx_contact_block_keys_contact ON contact_block_keys (user_id, contact_id)')
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS duplicate_pairs (
+        user_id TEXT,
+        contact_id1 TEXT,
+        contact_id2 TEXT,
+        name_similarity INTEGER,
+        email_similarity INTEGER,
+        PRIMARY KEY (user_id, contact_id1, contact_id2),
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+''')
+cursor.execute('CREATE INDEX IF NOT EXISTS idx_duplicate_pairs_contact2 ON duplicate_pairs (user_id, contact_id2)')
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS duplicate_index_state (
+        user_id TEXT PRIMARY KEY,
+        built_at TEXT,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+''')
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS field_mappings (
+        user_id TEXT,
+        name TEXT,
+        mapping TEXT,
+        updated_at TEXT,
+        PRIMARY KEY (user_id, name),
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+''')
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS contact_imports (
+        id TEXT PRIMARY KEY,
+        user_id TEXT,
+        filename TEXT,
+        status TEXT,
+        rows_read INTEGER,
+        inserted INTEGER,
+        duplicates INTEGER,
+        skipped INTEGER,
+        error TEXT,
+        created_at TEXT,
+        updated_at TEXT,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+''')
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS contact_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,
+        contact_id TEXT,
+        op TEXT,
+        payload TEXT,
+        attempts INTEGER,
+        available_at TEXT,
+        created_at TEXT,
+        done_targets TEXT,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+''')
+cursor.execute("PRAGMA table_info(contact_outbox)")
+if 'done_targets' not in {row[1] for row in cursor.fetchall()}:
+    cursor.execute("ALTER TABLE contact_outbox ADD COLUMN done_targets TEXT")
+cursor.execute('CREATE INDEX IF NOT EXISTS idx_contact_outbox_available ON contact_outbox (available_at)')
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS realnex_contact_links (
+        user_id TEXT,
+        contact_id TEXT,
+        realnex_id TEXT,
+        PRIMARY KEY (user_id, contact_id),
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+''')
+create_contact_search_index(cursor)
+create_list_schema(cursor)
+create_mirror_schema(cursor)
 conn.commit()
 
 
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import matplotlib
+matplotlib.use("Agg")
+logging.getLogger("matplotlib").setLevel(logging.WARNING)
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import numpy as np
+
+from db import logger
+from deal_valuation import comps_frame, target_values
+
+CHART_DIR = Path(os.getenv("CHART_CACHE_DIR", str(Path(__file__).parent / "chart_cache")))
+CHART_DIR.mkdir(parents=True, exist_ok=True)
+# A worker rendering a chart leaves a marker so the others answer "rendering" rather than "missing";
+# markers older than RENDER_TIMEOUT belong to a render that died and are ignored
+RENDER_TIMEOUT = 30
+# Rendered charts are dropped after a week unused, and beyond CHART_MAX_FILES the least recently used go first
+CHART_MAX_AGE = 7 * 24 * 3600
+CHART_MAX_FILES = int(os.getenv("CHART_CACHE_MAX_FILES", 500))
+
+# One render thread: Agg is fast, and serializing keeps matplotlib's global state out of the request path
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chart-render")
+_pending = {}
+_lock = threading.Lock()
+
+
+def chart_series(historical_data, deal_type):
+    df = comps_frame(historical_data)
+    df = df[df["sq_ft"] > 0]
+    return df["sq_ft"].to_numpy(dtype=float), target_values(df, deal_type)
+
+
+def chart_key(deal_type, sq_ft, values):
+    """Content hash of the plotted series: identical data always maps to the same cached PNG."""
+    payload = json.dumps([deal_type, np.round(sq_ft, 2).tolist(), np.round(values, 2).tolist()])
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _user_dir(user_id):
+    """Charts are filed per user, so a key only resolves for the user whose comps it was drawn from."""
+    return CHART_DIR / hashlib.sha256(str(user_id).encode()).hexdigest()[:16]
+
+
+def chart_path(user_id, key):
+    return _user_dir(user_id) / f"{key}.png"
+
+
+def _marker_path(user_id, key):
+    return _user_dir(user_id) / f"{key}.rendering"
+
+
+def _rendering_elsewhere(user_id, key):
+    try:
+        return time.time() - _marker_path(user_id, key).stat().st_mtime < RENDER_TIMEOUT
+    except FileNotFoundError:
+        return False
+
+
+def _claim(user_id, key):
+    """Create the render marker for `key`; False when another worker holds a live one."""
+    _user_dir(user_id).mkdir(parents=True, exist_ok=True)
+    try:
+        os.close(os.open(_marker_path(user_id, key), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        if _rendering_elsewhere(user_id, key):
+            return False
+        os.utime(_marker_path(user_id, key))
+        return True
+
+
+def evict_charts(now=None):
+    """Delete charts unused for CHART_MAX_AGE, then the least recently used beyond CHART_MAX_FILES."""
+    now = now or time.time()
+    charts = []
+    for path in CHART_DIR.glob("*/*.png"):
+        try:
+            charts.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            continue
+    charts.sort(reverse=True)
+    for index, (mtime, path) in enumerate(charts):
+        if index >= CHART_MAX_FILES or now - mtime > CHART_MAX_AGE:
+            path.unlink(missing_ok=True)
+
+
+def _render(user_id, key, deal_type, sq_ft, values):
+    fig = Figure(figsize=(6, 4), dpi=100)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    ax.scatter(sq_ft, values, s=12, alpha=0.7)
+    if len(sq_ft) > 1 and np.ptp(sq_ft) > 0:
+        slope, intercept = np.polyfit(sq_ft, values, 1)
+        xs = np.linspace(sq_ft.min(), sq_ft.max(), 50)
+        ax.plot(xs, slope * xs + intercept, color="tab:orange")
+    ax.set_title(f"{deal_type} trend")
+    ax.set_xlabel("Square feet")
+    ax.set_ylabel("Rent per month ($)" if deal_type == "LeaseComp" else "Sale price ($)")
+    fig.tight_layout()
+    tmp_path = _user_dir(user_id) / f"{key}.{threading.get_ident()}.tmp"
+    fig.savefig(tmp_path, format="png")
+    os.replace(tmp_path, chart_path(user_id, key))
+
+
+def _render_and_forget(user_id, key, deal_type, sq_ft, values):
+    try:
+        _render(user_id, key, deal_type, sq_ft, values)
+    except Exception as e:
+        logger.error(f"Chart render failed for {key}: {e}")
+        raise
+    finally:
+        _marker_path(user_id, key).unlink(missing_ok=True)
+        with _lock:
+            _pending.pop((user_id, key), None)
+    evict_charts()
+
+
+def request_deal_trend_chart(user_id, historical_data, deal_type):
+    """Queue a trend chart render unless it is cached or already rendering; returns its key or None."""
+    sq_ft, values = chart_series(historical_data, deal_type)
+    if not len(sq_ft):
+        return None
+    key = chart_key(deal_type, sq_ft, values)
+    try:
+        # Touching the cached PNG keeps it off the eviction list
+        os.utime(chart_path(user_id, key))
+        return key
+    except FileNotFoundError:
+        pass
+    with _lock:
+        if (user_id, key) not in _pending and _claim(user_id, key):
+            _pending[(user_id, key)] = _executor.submit(_render_and_forget, user_id, key, deal_type, sq_ft, values)
+    return key
+
+
+def wait_for_chart(user_id, key, timeout=5.0):
+    """Briefly wait on a render queued here or in another worker: 'ready', 'rendering' or 'missing'."""
+    with _lock:
+        future = _pending.get((user_id, key))
+    if future is not None:
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            pass
+    else:
+        deadline = time.monotonic() + timeout
+        while not chart_path(user_id, key).exists() and _rendering_elsewhere(user_id, key) and time.monotonic() < deadline:
+            time.sleep(0.1)
+    if chart_path(user_id, key).exists():
+        return "ready"
+    if (future is not None and not future.done()) or _rendering_elsewhere(user_id, key):
+        return "rendering"
+    return "missing"
@@ -0,0 +1,250 @@
+import json
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from deal_valuation import comps_frame, design_matrix, target_values
+
+# Comps pulled from RealNex are re-seeded after this long; local deals are folded in as they change
+COMPS_TTL = timedelta(hours=6)
+EPOCH = datetime(2000, 1, 1)
+
+# Two-sided 95% Student t quantiles by degrees of freedom; 1.96 beyond the table
+_T_975 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+          10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042}
+
+
+def comp_type(deal_type):
+    """Map a deals.deal_type value ('lease', 'sale', 'LeaseComp', ...) to the comp type used for models."""
+    return "SaleComp" if str(deal_type or "").lower().startswith("sale") else "LeaseComp"
+
+
+def deal_value(row, deal_type):
+    """Rent for lease comps, sale price (falling back to amount) for sale comps; None when the deal has neither."""
+    if deal_type == "LeaseComp":
+        return row.get("rent_month") or None
+    return row.get("sale_price") or row.get("amount") or None
+
+
+def feature_vector(row):
+    """One row of deal_valuation.design_matrix: intercept, square footage and close date in years since 2000.
+
+    Features must not depend on the current time, or removing a row later would not cancel its addition.
+    """
+    return [1.0, float(row.get("sq_ft") or 0), close_years(row.get("close_date"))]
+
+
+def close_years(close_date):
+    """Years since 2000 of an ISO date (UTC when it carries an offset, like deal_valuation.parse_dates); 0 when unparseable."""
+    try:
+        moment = datetime.fromisoformat(str(close_date))
+    except (TypeError, ValueError):
+        return 0.0
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - EPOCH).days / 365.25
+
+
+class DealStats:
+    """Sufficient statistics for regressing deal value on square footage.
+
+    n, Σx, Σy, Σx², Σxy, Σy² give the one-feature fit and its intervals; the Gram
+    matrix XᵀX and Xᵀy over feature_vector() give the extended fit. Adding or
+    removing one observation is O(1), so the fit never needs the comp history.
+    """
+
+    def __init__(self, n=0, sum_x=0.0, sum_y=0.0, sum_xx=0.0, sum_xy=0.0, sum_yy=0.0, gram=None, xty=None):
+        k = 3
+        self.n = n
+        self.sum_x = sum_x
+        self.sum_y = sum_y
+        self.sum_xx = sum_xx
+        self.sum_xy = sum_xy
+        self.sum_yy = sum_yy
+        self.gram = gram or [[0.0] * k for _ in range(k)]
+        self.xty = xty or [0.0] * k
+
+    def add(self, x, y, features=None, weight=1):
+        x, y = float(x), float(y)
+        self.n += weight
+        self.sum_x += weight * x
+        self.sum_y += weight * y
+        self.sum_xx += weight * x * x
+        self.sum_xy += weight * x * y
+        self.sum_yy += weight * y * y
+        features = features or [1.0, x, 0.0]
+        for i, fi in enumerate(features):
+            self.xty[i] += weight * fi * y
+            for j, fj in enumerate(features):
+                self.gram[i][j] += weight * fi * fj
+
+    def remove(self, x, y, features=None):
+        self.add(x, y, features, weight=-1)
+
+    def merge(self, other):
+        merged = DealStats(**self.to_dict())
+        for name in ("n", "sum_x", "sum_y", "sum_xx", "sum_xy", "sum_yy"):
+            setattr(merged, name, getattr(merged, name) + getattr(other, name))
+        merged.gram = [[a + b for a, b in zip(ra, rb)] for ra, rb in zip(self.gram, other.gram)]
+        merged.xty = [a + b for a, b in zip(self.xty, other.xty)]
+        return merged
+
+    def coefficients(self):
+        """(intercept, slope) of the one-feature least-squares fit."""
+        if self.n < 1:
+            return None
+        sxx = self.sum_xx - self.sum_x ** 2 / self.n
+        if self.n < 2 or abs(sxx) < 1e-9:
+            return self.sum_y / self.n, 0.0
+        slope = (self.sum_xy - self.sum_x * self.sum_y / self.n) / sxx
+        return (self.sum_y - slope * self.sum_x) / self.n, slope
+
+    def predict(self, x, years=None):
+        """Point prediction with a 95% prediction interval: (value, low, high).
+
+        With `years` (close date as years since 2000, see close_years) the value comes from the fit on
+        square footage and close date, i.e. adjusted for the market trend to that date; the square-footage
+        fit is used when that system is singular (e.g. every comp closed the same day) or too small.
+        """
+        if years is not None:
+            extended = self._predict_extended(x, years)
+            if extended is not None:
+                return extended
+        intercept, slope = self.coefficients()
+        value = intercept + slope * x
+        if self.n < 3:
+            return value, None, None
+        sxx = self.sum_xx - self.sum_x ** 2 / self.n
+        sse = self.sum_yy - intercept * self.sum_y - slope * self.sum_xy
+        s = math.sqrt(max(sse, 0.0) / (self.n - 2))
+        leverage = (x - self.sum_x / self.n) ** 2 / sxx if sxx > 1e-9 else 0.0
+        margin = t_quantile(self.n - 2) * s * math.sqrt(1 + 1 / self.n + leverage)
+        return value, value - margin, value + margin
+
+    def extended_coefficients(self):
+        """Solve XᵀX β = Xᵀy over feature_vector(); None when the system is singular."""
+        try:
+            return np.linalg.solve(np.array(self.gram), np.array(self.xty)).tolist()
+        except np.linalg.LinAlgError:
+            return None
+
+    def _predict_extended(self, x, years):
+        gram = np.array(self.gram)
+        k = len(gram)
+        if self.n <= k:
+            return None
+        # Centered (co)variances of square footage and close date: a (near) collinear pair has no unique fit
+        sxx = gram[1][1] - gram[0][1] ** 2 / self.n
+        stt = gram[2][2] - gram[0][2] ** 2 / self.n
+        sxt = gram[1][2] - gram[0][1] * gram[0][2] / self.n
+        if sxx <= 1e-9 or stt <= 1e-9 or sxx * stt - sxt ** 2 <= 1e-9 * sxx * stt:
+            return None
+        beta = np.array(self.extended_coefficients())
+        features = np.array([1.0, float(x), float(years)])
+        value = float(features @ beta)
+        # For least squares with an intercept, SSE = Σy² - βᵀXᵀy
+        sse = max(self.sum_yy - float(beta @ np.array(self.xty)), 0.0)
+        s = math.sqrt(sse / (self.n - k))
+        leverage = float(features @ np.linalg.solve(gram, features))
+        margin = t_quantile(self.n - k) * s * math.sqrt(1 + max(leverage, 0.0))
+        return value, value - margin, value + margin
+
+    def to_dict(self):
+        return {"n": self.n, "sum_x": self.sum_x, "sum_y": self.sum_y, "sum_xx": self.sum_xx,
+                "sum_xy": self.sum_xy, "sum_yy": self.sum_yy,
+                "gram": [list(r) for r in self.gram], "xty": list(self.xty)}
+
+
+def t_quantile(dof):
+    if dof <= 0:
+        return float("inf")
+    for limit in sorted(_T_975):
+        if dof <= limit:
+            return _T_975[limit]
+    return 1.96
+
+
+def _load(user_id, deal_type, source, cursor):
+    cursor.execute("""
+        SELECT n, sum_x, sum_y, sum_xx, sum_xy, sum_yy, gram, xty, updated_at
+        FROM deal_stats WHERE user_id = ? AND deal_type = ? AND source = ?
+    """, (user_id, deal_type, source))
+    row = cursor.fetchone()
+    if not row:
+        return None, None
+    stats = DealStats(row[0], row[1], row[2], row[3], row[4], row[5], json.loads(row[6]), json.loads(row[7]))
+    return stats, row[8]
+
+
+def _save(user_id, deal_type, source, stats, cursor):
+    cursor.execute("""
+        INSERT OR REPLACE INTO deal_stats
+            (user_id, deal_type, source, n, sum_x, sum_y, sum_xx, sum_xy, sum_yy, gram, xty, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (user_id, deal_type, source, stats.n, stats.sum_x, stats.sum_y, stats.sum_xx, stats.sum_xy,
+          stats.sum_yy, json.dumps(stats.gram), json.dumps(stats.xty), datetime.now().isoformat()))
+
+
+def get_deal_model(user_id, deal_type, cursor):
+    """Combined comps + local-deal statistics, or None when the comps need (re)seeding."""
+    comps, seeded_at = _load(user_id, deal_type, "comps", cursor)
+    if comps is None or datetime.now() - datetime.fromisoformat(seeded_at) > COMPS_TTL:
+        return None
+    deals, _ = _load(user_id, deal_type, "deals", cursor)
+    return comps.merge(deals) if deals else comps
+
+
+def fit_deal_model(user_id, deal_type, comps, cursor, conn):
+    """Seed the comps statistics from a full comps download (the only O(n) step), column-wise."""
+    df = comps_frame(comps)
+    df = df[(df["sq_ft"] > 0) & (target_values(df, deal_type) > 0)]
+    x = df["sq_ft"].to_numpy(dtype=float)
+    y = target_values(df, deal_type)
+    X = design_matrix(df)
+    stats = DealStats(len(y), float(x.sum()), float(y.sum()), float(x @ x), float(x @ y), float(y @ y),
+                      (X.T @ X).tolist(), (X.T @ y).tolist())
+    _save(user_id, deal_type, "comps", stats, cursor)
+    conn.commit()
+    deals, _ = _load(user_id, deal_type, "deals", cursor)
+    return stats.merge(deals) if deals else stats
+
+
+def apply_deal_change(user_id, old_deal, new_deal, cursor):
+    """Fold one deals-table insert, update or delete into the local-deal statistics in O(1).
+
+    old_deal/new_deal are dicts with sq_ft, rent_month, sale_price, close_date and deal_type
+    (None for insert/delete respectively).
+    """
+    apply_deal_changes(user_id, [(old_deal, new_deal)], cursor)
+
+
+def apply_deal_changes(user_id, changes, cursor):
+    """apply_deal_change for many (old_deal, new_deal) pairs: one load and save per deal type.
+
+    Deals without square footage or a value never entered the statistics and are skipped. Nothing is
+    committed here: the caller commits together with the deals-table write, so the two cannot drift.
+    """
+    touched = {}
+    for old_deal, new_deal in changes:
+        for deal, sign in ((old_deal, -1), (new_deal, 1)):
+            if not deal or not deal.get("sq_ft"):
+                continue
+            deal_type = comp_type(deal.get("deal_type"))
+            if deal_value(deal, deal_type) is None:
+                continue
+            if deal_type not in touched:
+                touched[deal_type] = _load(user_id, deal_type, "deals", cursor)[0] or DealStats()
+            touched[deal_type].add(deal["sq_ft"], deal_value(deal, deal_type), feature_vector(deal), weight=sign)
+    for deal_type, stats in touched.items():
+        _save(user_id, deal_type, "deals", stats, cursor)
+
+
+def invalidate_deal_models(user_id, cursor, conn, deal_type=None):
+    """Force the comps statistics to be re-seeded on the next prediction."""
+    if deal_type:
+        cursor.execute("DELETE FROM deal_stats WHERE user_id = ? AND deal_type = ? AND source = 'comps'",
+                       (user_id, deal_type))
+    else:
+        cursor.execute("DELETE FROM deal_stats WHERE user_id = ? AND source = 'comps'", (user_id,))
+    conn.commit()
@@ -0,0 +1,96 @@
+import hashlib
+import json
+
+import numpy as np
+
+PERIOD_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%Y-W%W",
+    "month": "%Y-%m",
+    "year": "%Y",
+}
+MAX_POINTS = 200
+
+# Value of a deal as used by predictions: rent for leases, sale price (falling back to amount) for sales
+_VALUE_SQL = """
+    CASE WHEN lower(deal_type) LIKE 'sale%' THEN COALESCE(NULLIF(sale_price, 0), amount) ELSE rent_month END
+"""
+_IS_SALE_SQL = "lower(deal_type) LIKE 'sale%'"
+
+
+def _filters(user_id, deal_type, start, end):
+    clauses = ["user_id = ?", "close_date IS NOT NULL",
+               _IS_SALE_SQL if deal_type == "SaleComp" else f"NOT {_IS_SALE_SQL}"]
+    params = [user_id]
+    if start:
+        clauses.append("close_date >= ?")
+        params.append(start)
+    if end:
+        clauses.append("close_date <= ?")
+        params.append(end)
+    return " AND ".join(clauses), params
+
+
+def trend_etag(user_id, deal_type, period, start, end, max_points, version):
+    """Validator for a series request; `version` is the user's deals table version, bumped on every write."""
+    payload = json.dumps([user_id, deal_type, period, start, end, max_points, version])
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def trend_series(user_id, deal_type, period, cursor, start=None, end=None):
+    """Per-period count, total, median value and price per sq ft, aggregated in SQLite.
+
+    The median comes from a window-ranked subquery, so only one row per period leaves the database.
+    """
+    where, params = _filters(user_id, deal_type, start, end)
+    cursor.execute(f"""
+        WITH ranked AS (
+            SELECT strftime(?, close_date) AS period,
+                   {_VALUE_SQL} AS value,
+                   sq_ft,
+                   ROW_NUMBER() OVER (PARTITION BY strftime(?, close_date) ORDER BY {_VALUE_SQL}) AS rn,
+                   COUNT(*) OVER (PARTITION BY strftime(?, close_date)) AS cnt
+            FROM deals WHERE {where}
+        )
+        SELECT period,
+               COUNT(*),
+               TOTAL(value),
+               AVG(CASE WHEN rn IN ((cnt + 1) / 2, (cnt + 2) / 2) THEN value END),
+               CASE WHEN TOTAL(CASE WHEN sq_ft > 0 THEN sq_ft END) > 0
+                    THEN TOTAL(CASE WHEN sq_ft > 0 THEN value END) / TOTAL(CASE WHEN sq_ft > 0 THEN sq_ft END) END
+        FROM ranked
+        WHERE period IS NOT NULL
+        GROUP BY period
+        ORDER BY period
+    """, [PERIOD_FORMATS[period]] * 3 + params)
+    return [{"period": row[0], "count": row[1], "total": round(row[2], 2),
+             "median": round(row[3], 2) if row[3] is not None else None,
+             "price_per_sq_ft": round(row[4], 4) if row[4] is not None else None}
+            for row in cursor.fetchall()]
+
+
+def lttb(values, threshold):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the visual shape of `values`."""
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    y = np.asarray(values, dtype=float)
+    x = np.arange(n, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = [0]
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        ax, ay = x[selected[-1]], y[selected[-1]]
+        areas = np.abs((ax - avg_x) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (avg_y - ay))
+        selected.append(lo + int(np.argmax(areas)))
+    selected.append(n - 1)
+    return selected
+
+
+def downsample(series, max_points=MAX_POINTS, key="median"):
+    """Keep at most `max_points` periods, chosen by LTTB over `key` (missing values count as 0)."""
+    if len(series) <= max_points:
+        return series
+    return [series[i] for i in lttb([p[key] or 0 for p in series], max_points)]
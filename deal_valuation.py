@@ -0,0 +1,109 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+COMP_COLUMNS = ["sq_ft", "rent_month", "sale_price", "amount", "close_date", "deal_type"]
+EPOCH = pd.Timestamp("2000-01-01")
+
+
+def parse_dates(values):
+    """Naive UTC timestamps (NaT when unparseable), whether the inputs carry a time zone or not."""
+    return pd.to_datetime(values, errors="coerce", format="mixed", utc=True).dt.tz_localize(None)
+
+
+def comps_frame(rows):
+    """DataFrame of comps or deals rows (dicts or tuples in COMP_COLUMNS order) with typed columns."""
+    if rows and not isinstance(rows[0], dict):
+        rows = [dict(zip(COMP_COLUMNS, row)) for row in rows]
+    df = pd.DataFrame(rows).reindex(columns=COMP_COLUMNS)
+    for column in ("sq_ft", "rent_month", "sale_price", "amount"):
+        df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0.0)
+    df["close_date"] = parse_dates(df["close_date"])
+    df["deal_type"] = df["deal_type"].fillna("").astype(str)
+    return df
+
+
+def target_values(df, deal_type):
+    """Rent for lease comps, sale price (falling back to amount) for sale comps."""
+    if deal_type == "LeaseComp":
+        return df["rent_month"].to_numpy(dtype=float)
+    return np.where(df["sale_price"] > 0, df["sale_price"], df["amount"]).astype(float)
+
+
+def design_matrix(df, with_deal_type=False):
+    """Column-wise design matrix: intercept, sq_ft, close date in years since 2000 and optionally an is-sale flag."""
+    close_years = ((df["close_date"] - EPOCH).dt.days / 365.25).fillna(0.0).to_numpy(dtype=float)
+    columns = [np.ones(len(df)), df["sq_ft"].to_numpy(dtype=float), close_years]
+    if with_deal_type:
+        columns.append(df["deal_type"].str.lower().str.startswith("sale").to_numpy(dtype=float))
+    return np.column_stack(columns)
+
+
+def recency_weights(df, half_life_days=365, now=None):
+    """Sample weights halving every `half_life_days`; undated rows get the weight of the oldest dated row."""
+    now = pd.Timestamp(now or datetime.now())
+    age_days = (now - df["close_date"]).dt.days.to_numpy(dtype=float)
+    if np.isnan(age_days).all():
+        return np.ones(len(df))
+    age_days = np.where(np.isnan(age_days), np.nanmax(age_days), np.clip(age_days, 0, None))
+    return 0.5 ** (age_days / half_life_days)
+
+
+class DealValuationModel:
+    """Weighted least-squares valuation over many comps, evaluated for many candidates at once."""
+
+    def __init__(self, deal_type, half_life_days=365, with_deal_type=False):
+        self.deal_type = deal_type
+        self.half_life_days = half_life_days
+        self.with_deal_type = with_deal_type
+        self.coefficients = None
+        self.residual_std = None
+        self.n_samples = 0
+        self.reference_date = None
+
+    def fit(self, comps):
+        df = comps if isinstance(comps, pd.DataFrame) else comps_frame(comps)
+        df = df[df["sq_ft"] > 0]
+        if df.empty:
+            raise ValueError("No comps with square footage to fit")
+        X = design_matrix(df, self.with_deal_type)
+        y = target_values(df, self.deal_type)
+        sqrt_w = np.sqrt(recency_weights(df, self.half_life_days))
+        # Constant features (e.g. every comp closed the same day) would only alias the intercept
+        active = np.ptp(X, axis=0) > 0
+        active[0] = True
+        self.coefficients = np.zeros(X.shape[1])
+        self.coefficients[active], *_ = np.linalg.lstsq(X[:, active] * sqrt_w[:, None], y * sqrt_w, rcond=None)
+        residuals = y - X @ self.coefficients
+        dof = max(len(y) - X.shape[1], 1)
+        self.residual_std = float(np.sqrt(np.sum(residuals ** 2) / dof))
+        self.n_samples = len(y)
+        # Candidates without a date are valued as of the newest comp rather than extrapolated to today
+        self.reference_date = df["close_date"].max() if df["close_date"].notna().any() else pd.Timestamp(datetime.now().date())
+        return self
+
+    def predict(self, candidates):
+        """Values, price per sq ft and a ±1.96σ band for every candidate in one vectorized call.
+
+        Candidates need sq_ft; close_date defaults to the newest comp's date and deal_type to the model's type.
+        """
+        df = candidates if isinstance(candidates, pd.DataFrame) else pd.DataFrame(candidates)
+        df = df.copy()
+        if "close_date" not in df:
+            df["close_date"] = self.reference_date
+        df["close_date"] = parse_dates(df["close_date"]).fillna(self.reference_date)
+        if "deal_type" not in df:
+            df["deal_type"] = self.deal_type
+        df = comps_frame(df.to_dict("records"))
+        values = design_matrix(df, self.with_deal_type) @ self.coefficients
+        sq_ft = df["sq_ft"].to_numpy(dtype=float)
+        price_per_sq_ft = np.divide(values, sq_ft, out=np.zeros_like(values), where=sq_ft > 0)
+        margin = 1.96 * self.residual_std
+        return pd.DataFrame({
+            "sq_ft": sq_ft,
+            "prediction": values,
+            "price_per_sq_ft": price_per_sq_ft,
+            "low": values - margin,
+            "high": values + margin,
+        })
@@ -0,0 +1,159 @@
+import re
+import zlib
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+NAME_THRESHOLD = 85
+EMAIL_THRESHOLD = 90
+# Blocks this large are stop-words (info@, "john") and would bring back quadratic work
+MAX_BLOCK_SIZE = 200
+LSH_BANDS = 10
+LSH_ROWS = 4
+
+_SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(["aeiouyhw", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"])
+                  for c in letters}
+_MERSENNE = (1 << 61) - 1
+_rng = np.random.default_rng(20240601)
+_HASH_A = _rng.integers(1, 1 << 31, LSH_BANDS * LSH_ROWS, dtype=np.uint64)
+_HASH_B = _rng.integers(0, 1 << 31, LSH_BANDS * LSH_ROWS, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 1 << 31, LSH_ROWS, dtype=np.uint64) | np.uint64(1)
+_NAME_BAND_TAG = 16
+_EMAIL_BAND_TAG = 48
+
+
+def soundex(word):
+    word = re.sub(r"[^a-z]", "", word.lower())
+    if not word:
+        return ""
+    codes = [_SOUNDEX_CODES.get(c, "0") for c in word]
+    out = [word[0]]
+    previous = codes[0]
+    for c, code in zip(word[1:], codes[1:]):
+        if code != "0" and code != previous:
+            out.append(code)
+        if c not in "hw":
+            previous = code
+    return ("".join(out) + "000")[:4]
+
+
+def normalize_email(email):
+    """(local part without +tags or dots, domain), lower-cased."""
+    email = (email or "").strip().lower()
+    local, _, domain = email.partition("@")
+    return local.split("+", 1)[0].replace(".", ""), domain
+
+
+def _tagged(tag, text):
+    return (tag << 32) | zlib.crc32(text.encode())
+
+
+def _minhash_keys(texts, tag):
+    """LSH band keys for many strings at once: MinHash over character 3-grams, one row of hashes at a time.
+
+    Returns parallel arrays (text index, key); strings shorter than one 3-gram get no keys.
+    """
+    processed = [default_process(t or "") for t in texts]
+    owners, shingles = [], []
+    for index, text in enumerate(processed):
+        for i in range(len(text) - 2):
+            owners.append(index)
+            shingles.append(zlib.crc32(text[i:i + 3].encode()))
+    if not shingles:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+    owners = np.asarray(owners, dtype=np.int64)
+    shingles = np.asarray(shingles, dtype=np.uint64)
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+    signature = np.empty((len(starts), LSH_BANDS * LSH_ROWS), dtype=np.uint64)
+    for h in range(LSH_BANDS * LSH_ROWS):
+        signature[:, h] = np.minimum.reduceat((_HASH_A[h] * shingles + _HASH_B[h]) % _MERSENNE, starts)
+    bands = signature.reshape(len(starts), LSH_BANDS, LSH_ROWS)
+    band_hash = (bands * _BAND_MIX).sum(axis=2) & np.uint64(0xFFFFFFFF)
+    band_tags = (np.uint64(tag) + np.arange(LSH_BANDS, dtype=np.uint64)) << np.uint64(32)
+    keys = (band_hash | band_tags).ravel()
+    return np.repeat(owners[starts], LSH_BANDS), keys
+
+
+def _exact_keys(name, email):
+    keys = []
+    local, domain = normalize_email(email)
+    if local:
+        keys.append(_tagged(1, local))
+        if domain:
+            keys.append(_tagged(2, f"{local}@{domain}"))
+    tokens = sorted(default_process(name or "").split())
+    if tokens:
+        keys.append(_tagged(3, "".join(soundex(t) for t in tokens)))
+    return keys
+
+
+def contact_keys(contacts):
+    """Parallel arrays (contact index, blocking key) for (id, name, email) rows."""
+    owners, keys = [], []
+    for i, contact in enumerate(contacts):
+        for key in _exact_keys(contact[1], contact[2]):
+            owners.append(i)
+            keys.append(key)
+    owner_arrays = [np.asarray(owners, dtype=np.int64)]
+    key_arrays = [np.asarray(keys, dtype=np.uint64)]
+    for tag, texts in ((_NAME_BAND_TAG, [c[1] for c in contacts]),
+                       (_EMAIL_BAND_TAG, [normalize_email(c[2])[0] for c in contacts])):
+        band_owners, band_keys = _minhash_keys(texts, tag)
+        owner_arrays.append(band_owners)
+        key_arrays.append(band_keys)
+    return np.concatenate(owner_arrays), np.concatenate(key_arrays)
+
+
+def blocking_keys(name, email):
+    """Integer keys under which two contacts must collide to be compared at all."""
+    _, keys = contact_keys([(None, name, email)])
+    return {int(k) for k in keys}
+
+
+def candidate_pairs(contacts):
+    """Unique (i, j) index pairs that share at least one non-oversized block, generated without Python loops."""
+    owners, keys = contact_keys(contacts)
+    order = np.lexsort((owners, keys))
+    owners, keys = owners[order], keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+    sizes = ends - starts
+    usable = (sizes > 1) & (sizes <= MAX_BLOCK_SIZE)
+    if not usable.any():
+        return np.empty((0, 2), dtype=np.int64)
+    # Every position pairs with the positions after it inside its block
+    block_end = np.repeat(ends[usable], sizes[usable])
+    positions = np.concatenate([np.arange(a, b) for a, b in zip(starts[usable], ends[usable])])
+    partners = block_end - positions - 1
+    left = np.repeat(positions, partners)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(partners) - partners, partners)
+    right = left + offsets + 1
+    n = len(contacts)
+    codes = np.unique(np.minimum(owners[left], owners[right]) * n + np.maximum(owners[left], owners[right]))
+    pairs = np.column_stack((codes // n, codes % n))
+    return pairs[pairs[:, 0] != pairs[:, 1]]
+
+
+def score_pairs(left, right):
+    """Element-wise name and email similarity for two aligned lists of contacts, in compiled code on all cores."""
+    if not left:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    names = process.cpdist([a[1] or "" for a in left], [b[1] or "" for b in right],
+                           scorer=fuzz.token_sort_ratio, processor=default_process, workers=-1)
+    emails = process.cpdist([a[2] or "" for a in left], [b[2] or "" for b in right],
+                            scorer=fuzz.token_sort_ratio, processor=default_process, workers=-1)
+    return np.rint(names).astype(int), np.rint(emails).astype(int)
+
+
+def find_duplicates(contacts):
+    """Duplicate pairs among (id, name, email) rows: blocking, then vectorized scoring of candidates only.
+
+    Returns (id1, id2, name_similarity, email_similarity) tuples.
+    """
+    pairs = candidate_pairs(contacts)
+    left = [contacts[i] for i in pairs[:, 0]]
+    right = [contacts[j] for j in pairs[:, 1]]
+    names, emails = score_pairs(left, right)
+    matched = np.flatnonzero((names > NAME_THRESHOLD) | (emails > EMAIL_THRESHOLD))
+    return [(left[k][0], right[k][0], int(names[k]), int(emails[k])) for k in matched]
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+from dedupe import MAX_BLOCK_SIZE, NAME_THRESHOLD, EMAIL_THRESHOLD, blocking_keys, contact_keys, find_duplicates, score_pairs
+
+
+def _ordered(id1, id2):
+    return (id1, id2) if id1 < id2 else (id2, id1)
+
+
+def _is_built(user_id, cursor):
+    cursor.execute("SELECT 1 FROM duplicate_index_state WHERE user_id = ?", (user_id,))
+    return cursor.fetchone() is not None
+
+
+def build_duplicate_index(user_id, cursor, conn):
+    """Full (re)build of a user's blocking keys and duplicate pairs; later writes keep it current."""
+    cursor.execute("SELECT id, name, email FROM contacts WHERE user_id = ?", (user_id,))
+    contacts = cursor.fetchall()
+    owners, keys = contact_keys(contacts)
+    cursor.execute("DELETE FROM contact_block_keys WHERE user_id = ?", (user_id,))
+    cursor.execute("DELETE FROM duplicate_pairs WHERE user_id = ?", (user_id,))
+    cursor.executemany("INSERT OR IGNORE INTO contact_block_keys (user_id, block_key, contact_id) VALUES (?, ?, ?)",
+                       [(user_id, int(key), contacts[owner][0]) for owner, key in zip(owners, keys)])
+    cursor.executemany("""
+        INSERT OR REPLACE INTO duplicate_pairs (user_id, contact_id1, contact_id2, name_similarity, email_similarity)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(user_id, *_ordered(id1, id2), name_similarity, email_similarity)
+          for id1, id2, name_similarity, email_similarity in find_duplicates(contacts)])
+    cursor.execute("INSERT OR REPLACE INTO duplicate_index_state (user_id, built_at) VALUES (?, ?)",
+                   (user_id, datetime.now().isoformat()))
+    conn.commit()
+
+
+def _unindex(user_id, contact_id, cursor):
+    cursor.execute("DELETE FROM contact_block_keys WHERE user_id = ? AND contact_id = ?", (user_id, contact_id))
+    cursor.execute("DELETE FROM duplicate_pairs WHERE user_id = ? AND (contact_id1 = ? OR contact_id2 = ?)",
+                   (user_id, contact_id, contact_id))
+
+
+def _index(user_id, contact_id, cursor):
+    """Re-key one contact and score it against the members of its own blocks only."""
+    _unindex(user_id, contact_id, cursor)
+    cursor.execute("SELECT id, name, email FROM contacts WHERE id = ? AND user_id = ?", (contact_id, user_id))
+    contact = cursor.fetchone()
+    if not contact:
+        return
+    keys = sorted(blocking_keys(contact[1], contact[2]))
+    if not keys:
+        return
+    cursor.executemany("INSERT OR IGNORE INTO contact_block_keys (user_id, block_key, contact_id) VALUES (?, ?, ?)",
+                       [(user_id, key, contact_id) for key in keys])
+    placeholders = ", ".join("?" * len(keys))
+    cursor.execute(f"""
+        SELECT block_key FROM contact_block_keys
+        WHERE user_id = ? AND block_key IN ({placeholders})
+        GROUP BY block_key HAVING COUNT(*) BETWEEN 2 AND ?
+    """, (user_id, *keys, MAX_BLOCK_SIZE))
+    shared = [row[0] for row in cursor.fetchall()]
+    if not shared:
+        return
+    placeholders = ", ".join("?" * len(shared))
+    cursor.execute(f"""
+        SELECT DISTINCT c.id, c.name, c.email
+        FROM contact_block_keys k JOIN contacts c ON c.id = k.contact_id AND c.user_id = k.user_id
+        WHERE k.user_id = ? AND k.block_key IN ({placeholders}) AND k.contact_id != ?
+    """, (user_id, *shared, contact_id))
+    others = cursor.fetchall()
+    names, emails = score_pairs([contact] * len(others), others)
+    cursor.executemany("""
+        INSERT OR REPLACE INTO duplicate_pairs (user_id, contact_id1, contact_id2, name_similarity, email_similarity)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(user_id, *_ordered(contact_id, other[0]), int(n), int(e))
+          for other, n, e in zip(others, names, emails) if n > NAME_THRESHOLD or e > EMAIL_THRESHOLD])
+
+
+def index_contacts(user_id, contact_ids, cursor, conn):
+    """Bring the index up to date after contacts were created, updated or deleted.
+
+    A no-op until the user's index is first built; the build then covers these contacts.
+    """
+    if not contact_ids or not _is_built(user_id, cursor):
+        return
+    for contact_id in contact_ids:
+        _index(user_id, contact_id, cursor)
+    conn.commit()
+
+
+def index_contact(user_id, contact_id, cursor, conn):
+    index_contacts(user_id, [contact_id], cursor, conn)
+
+
+def reset_duplicate_index(user_id, cursor, conn):
+    """Drop a user's index so the next read rebuilds it in bulk (cheaper than re-keying a large import row by row)."""
+    cursor.execute("DELETE FROM contact_block_keys WHERE user_id = ?", (user_id,))
+    cursor.execute("DELETE FROM duplicate_pairs WHERE user_id = ?", (user_id,))
+    cursor.execute("DELETE FROM duplicate_index_state WHERE user_id = ?", (user_id,))
+    conn.commit()
+
+
+def get_duplicate_pairs(user_id, cursor, conn):
+    """Current duplicate pairs with both contacts, read from the index (built on first use)."""
+    if not _is_built(user_id, cursor):
+        build_duplicate_index(user_id, cursor, conn)
+    cursor.execute("""
+        SELECT a.id, a.name, a.email, b.id, b.name, b.email, p.name_similarity, p.email_similarity
+        FROM duplicate_pairs p
+        JOIN contacts a ON a.id = p.contact_id1 AND a.user_id = p.user_id
+        JOIN contacts b ON b.id = p.contact_id2 AND b.user_id = p.user_id
+        WHERE p.user_id = ?
+    """, (user_id,))
+    return [{
+        "contact1": {"id": row[0], "name": row[1], "email": row[2]},
+        "contact2": {"id": row[3], "name": row[4], "email": row[5]},
+        "name_similarity": row[6],
+        "email_similarity": row[7]
+    } for row in cursor.fetchall()]
@@ -0,0 +1,21 @@
+import os
+
+# Default profile: sync workers, no real-time fan-out across processes.
+# Real-time profile (GUNICORN_PROFILE=realtime): one eventlet worker per process,
+# Socket.IO messages shared through Redis (SOCKETIO_MESSAGE_QUEUE). Scale out by
+# running more processes/containers behind a sticky load balancer (deploy/nginx.conf).
+profile = os.getenv("GUNICORN_PROFILE", "default")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+
+if profile == "realtime":
+    worker_class = os.getenv("GUNICORN_WORKER_CLASS", "eventlet")
+    # Gunicorn's own balancer is not sticky, so Socket.IO long-polling needs a single worker per process
+    workers = int(os.getenv("GUNICORN_WORKERS", 1))
+    worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))
+    os.environ.setdefault("SOCKETIO_MESSAGE_QUEUE", "redis")
+    os.environ.setdefault("SOCKETIO_ASYNC_MODE", "gevent" if "gevent" in worker_class else "eventlet")
+else:
+    worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+    workers = int(os.getenv("GUNICORN_WORKERS", 3))
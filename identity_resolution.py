@@ -0,0 +1,87 @@
+import hashlib
+import re
+
+from dedupe import normalize_email
+
+PROVIDER_PREFIXES = ("apollo_", "seamless_", "zoominfo_")
+GOLDEN_FIELDS = ("name", "email", "phone")
+# Shorter digit strings are extensions or typos, not numbers that identify a person
+MIN_PHONE_DIGITS = 7
+# Only Gmail ignores dots and +tags in the local part; elsewhere those can be different mailboxes
+GMAIL_DOMAINS = ("gmail.com", "googlemail.com")
+
+
+def _key(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+
+
+def email_key(email):
+    """Key of the mailbox an address delivers to: the lower-cased address, with Gmail's aliasing folded."""
+    local, _, domain = (email or "").strip().lower().partition("@")
+    if domain in GMAIL_DOMAINS:
+        local, domain = normalize_email(email)[0], GMAIL_DOMAINS[0]
+    return _key(f"e:{local}@{domain}") if local and domain else None
+
+
+def phone_key(phone):
+    digits = re.sub(r"\D", "", phone or "")
+    return _key("p:" + digits[-10:]) if len(digits) >= MIN_PHONE_DIGITS else None
+
+
+def source_rank(contact):
+    """Survivorship order: the user's own contacts first, then providers in the order of PROVIDER_PREFIXES."""
+    contact_id = str(contact.get("id", ""))
+    for rank, prefix in enumerate(PROVIDER_PREFIXES, start=1):
+        if contact_id.startswith(prefix):
+            return rank
+    return 0
+
+
+def resolve_identities(contacts):
+    """Merge records of the same person into one golden record each, in order of first appearance.
+
+    Records sharing a normalized email are one person. Records sharing a phone number are merged
+    too, unless that would join two different email addresses (a shared office line, not a person).
+    Every field of a golden record comes from its best-ranked record that has it; `merged_ids`
+    lists the ids of all the records it stands for.
+    """
+    parent = list(range(len(contacts)))
+    emails = [{key} if key else set() for key in (email_key(c.get("email")) for c in contacts)]
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j, require_one_email=False):
+        a, b = find(i), find(j)
+        if a == b or (require_one_email and len(emails[a] | emails[b]) > 1):
+            return
+        a, b = min(a, b), max(a, b)
+        parent[b] = a
+        emails[a] |= emails[b]
+
+    # Hash index from identity key to the first record seen with it
+    by_email, by_phone = {}, {}
+    for i, contact in enumerate(contacts):
+        key = email_key(contact.get("email"))
+        if key is not None:
+            union(by_email.setdefault(key, i), i)
+    for i, contact in enumerate(contacts):
+        key = phone_key(contact.get("phone"))
+        if key is not None:
+            union(by_phone.setdefault(key, i), i, require_one_email=True)
+
+    clusters = {}
+    for i in range(len(contacts)):
+        clusters.setdefault(find(i), []).append(contacts[i])
+    golden = []
+    for members in clusters.values():
+        ranked = sorted(members, key=source_rank)
+        record = {"id": ranked[0]["id"]}
+        for field in GOLDEN_FIELDS:
+            record[field] = next((m[field] for m in ranked if m.get(field)), "")
+        record["merged_ids"] = [m["id"] for m in ranked]
+        golden.append(record)
+    return golden
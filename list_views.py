@@ -0,0 +1,123 @@
+import base64
+import hashlib
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+VERSIONED_TABLES = ("contacts", "deals", "deal_alerts")
+# Indexed expressions: filters and sort keys below must use them verbatim for SQLite to pick the indexes
+EMAIL_DOMAIN_SQL = "lower(substr(email, instr(email, '@') + 1))"
+DEAL_SORT_SQL = "IFNULL(close_date, '')"
+
+
+def create_list_schema(cursor):
+    """Per-user version counters bumped by triggers on every write, plus the indexes list pages seek on."""
+    create_version_schema(cursor, VERSIONED_TABLES)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_contacts_user_id ON contacts (user_id, id)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_contacts_user_email_domain ON contacts (user_id, {EMAIL_DOMAIN_SQL}, id)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_deals_user_sort ON deals (user_id, {DEAL_SORT_SQL}, id)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_deals_user_type_sort ON deals (user_id, deal_type, {DEAL_SORT_SQL}, id)')
+
+
+def create_version_schema(cursor, tables):
+    """The table_versions counters plus the triggers bumping them on every write to `tables`."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            user_id TEXT,
+            table_name TEXT,
+            version INTEGER,
+            PRIMARY KEY (user_id, table_name)
+        )
+    ''')
+    for table in tables:
+        for event, row in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+                    INSERT INTO table_versions (user_id, table_name, version) VALUES ({row}.user_id, '{table}', 1)
+                    ON CONFLICT (user_id, table_name) DO UPDATE SET version = version + 1;
+                END
+            ''')
+
+
+def table_version(user_id, table, cursor):
+    cursor.execute("SELECT version FROM table_versions WHERE user_id = ? AND table_name = ?", (user_id, table))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def list_etag(user_id, table, version, args):
+    """Validator for one list request: changes when the user's table does or the query parameters differ."""
+    payload = json.dumps([user_id, table, version, sorted(args.items(multi=True))])
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except ValueError:
+        raise ValueError("cursor is not valid")
+    if not isinstance(values, list):
+        raise ValueError("cursor is not valid")
+    return values
+
+
+def page_args(args):
+    """(limit, decoded cursor or None) from request args; ValueError on bad input."""
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    after = args.get("cursor")
+    return min(max(limit, 1), MAX_PAGE_SIZE), decode_cursor(after) if after else None
+
+
+def select_fields(requested, allowed):
+    """Columns named in a comma-separated `fields` parameter (all of `allowed` when absent); id is always included."""
+    if not requested:
+        return list(allowed)
+    fields = [f.strip() for f in requested.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return ["id"] + [f for f in fields if f != "id"]
+
+
+def _seek(keys, values, op):
+    """`(k1, k2, ...) op (v1, v2, ...)` spelled out so SQLite can range-seek on k1 (it does not for row values of expressions)."""
+    clause, params = f"{keys[-1]} {op} ?", [values[-1]]
+    for key, value in zip(reversed(keys[:-1]), reversed(values[:-1])):
+        clause, params = f"({key} {op} ? OR ({key} = ? AND {clause}))", [value, value] + params
+    if len(keys) > 1:
+        clause, params = f"{keys[0]} {op}= ? AND {clause}", [values[0]] + params
+    return clause, params
+
+
+def keyset_page(cursor, table, fields, where, params, sort_keys, after=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+    """One page of rows ordered by `sort_keys` (SQL expressions ending in a unique column), seeking past `after`.
+
+    Returns (rows as dicts of `fields`, cursor for the next page or None). Pages cost the same
+    however deep they are, because the sort keys are an index the query seeks into.
+    """
+    where, params = list(where), list(params)
+    if after is not None:
+        if len(after) != len(sort_keys):
+            raise ValueError("cursor is not valid")
+        clause, clause_params = _seek(sort_keys, after, "<" if descending else ">")
+        where.append(clause)
+        params.extend(clause_params)
+    direction = " DESC" if descending else ""
+    cursor.execute(f"""
+        SELECT {", ".join(sort_keys)}, {", ".join(fields)} FROM {table}
+        WHERE {" AND ".join(where)}
+        ORDER BY {", ".join(key + direction for key in sort_keys)}
+        LIMIT ?
+    """, (*params, limit + 1))
+    rows = cursor.fetchall()
+    n = len(sort_keys)
+    items = [dict(zip(fields, row[n:])) for row in rows[:limit]]
+    next_cursor = encode_cursor(list(rows[limit - 1][:n])) if len(rows) > limit else None
+    return items, next_cursor
@@ -0,0 +1,241 @@
+import queue
+import smtplib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from email.mime.text import MIMEText
+
+from config import SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, TWILIO_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE
+from db import logger
+
+SMTP_POOL_SIZE = 2
+# Servers drop idle sessions after a few minutes; older connections are replaced instead of probed
+SMTP_MAX_IDLE = 120
+TWILIO_CONCURRENCY = 4
+# Messages to the same recipient and subject queued within this window go out as one
+COALESCE_WINDOW = 0.5
+MAX_BATCH = 100
+SMS_MAX_LENGTH = 1600
+
+
+class SMTPPool:
+    """A few logged-in SMTP sessions reused across sends, checked with NOOP before reuse."""
+
+    def __init__(self, size=SMTP_POOL_SIZE, max_idle=SMTP_MAX_IDLE):
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.connects = 0
+
+    def _connect(self):
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
+        server.starttls()
+        server.login(SMTP_USER, SMTP_PASSWORD)
+        self.connects += 1
+        return server
+
+    def _healthy(self, server, last_used):
+        if time.monotonic() - last_used > self.max_idle:
+            return False
+        try:
+            return server.noop()[0] == 250
+        except smtplib.SMTPException:
+            return False
+        except OSError:
+            return False
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        server = None
+        try:
+            while server is None:
+                try:
+                    candidate, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    server = self._connect()
+                    break
+                if self._healthy(candidate, last_used):
+                    server = candidate
+                else:
+                    self._close(candidate)
+            yield server
+            self._idle.put((server, time.monotonic()))
+        except Exception:
+            # A session that failed mid-send is not trusted again
+            if server is not None:
+                self._close(server)
+            raise
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+
+class ChannelMetrics:
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.started = time.monotonic()
+
+    def record(self, ok, latency, merged=1):
+        if ok:
+            self.sent += 1
+        else:
+            self.failed += 1
+        self.coalesced += merged - 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def to_dict(self):
+        done = self.sent + self.failed
+        elapsed_min = max((time.monotonic() - self.started) / 60, 1e-9)
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+            "per_minute": round(self.sent / elapsed_min, 2),
+            "avg_latency_ms": round(1000 * self.latency_total / done, 1) if done else None,
+            "max_latency_ms": round(1000 * self.latency_max, 1),
+        }
+
+
+class NotificationService:
+    """Queued email and SMS delivery.
+
+    A single worker drains the queue in short windows, merges messages bound for the same
+    recipient (and subject), sends email over pooled SMTP sessions and SMS through one
+    shared Twilio client with bounded concurrency. Every send returns a Future.
+    """
+
+    def __init__(self, maxsize=5000):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._smtp = SMTPPool()
+        self._sms_executor = ThreadPoolExecutor(max_workers=TWILIO_CONCURRENCY, thread_name_prefix="sms-send")
+        self._twilio_client = None
+        self._twilio_lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.dropped = 0
+        self.metrics = {"email": ChannelMetrics(), "sms": ChannelMetrics()}
+
+    def send_email(self, to, subject, body):
+        return self._enqueue(("email", to, subject), body)
+
+    def send_sms(self, to, body):
+        return self._enqueue(("sms", to, None), body)
+
+    def _enqueue(self, key, body):
+        future = Future()
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((key, body, time.monotonic(), future))
+        except queue.Full:
+            self.dropped += 1
+            future.set_exception(RuntimeError("Notification queue is full"))
+        return future
+
+    def _ensure_worker(self):
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="notifications", daemon=True)
+                self._thread.start()
+
+    def _twilio(self):
+        with self._twilio_lock:
+            if self._twilio_client is None:
+                from twilio.rest import Client as TwilioClient
+                self._twilio_client = TwilioClient(TWILIO_SID, TWILIO_AUTH_TOKEN)
+            return self._twilio_client
+
+    def _drain(self):
+        """Block for one message, then collect whatever else arrives within the coalescing window."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + COALESCE_WINDOW
+        while len(batch) < MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._drain()
+            groups = OrderedDict()
+            for key, body, queued_at, future in batch:
+                groups.setdefault(key, []).append((body, queued_at, future))
+            sms = []
+            for key, items in groups.items():
+                if key[0] == "email":
+                    self._deliver(key, items, self._send_email)
+                else:
+                    sms.append(self._sms_executor.submit(self._deliver, key, items, self._send_sms))
+            for pending in sms:
+                pending.result()
+            for _ in batch:
+                self._queue.task_done()
+
+    def _deliver(self, key, items, send):
+        channel, to, subject = key
+        body = "\n\n".join(body for body, _, _ in items)
+        try:
+            send(to, subject, body)
+            ok, error = True, None
+        except Exception as e:
+            ok, error = False, e
+            logger.error(f"Failed to send {channel} notification to {to}: {e}")
+        now = time.monotonic()
+        for index, (_, queued_at, future) in enumerate(items):
+            self.metrics[channel].record(ok, now - queued_at, len(items) if index == 0 else 1)
+            if ok:
+                future.set_result(True)
+            else:
+                future.set_exception(error)
+
+    def _send_email(self, to, subject, body):
+        msg = MIMEText(body)
+        msg['Subject'] = subject
+        msg['From'] = SMTP_USER
+        msg['To'] = to
+        with self._smtp.connection() as server:
+            server.sendmail(SMTP_USER, to, msg.as_string())
+
+    def _send_sms(self, to, subject, body):
+        self._twilio().messages.create(body=body[:SMS_MAX_LENGTH], from_=TWILIO_PHONE, to=to)
+
+    def get_metrics(self):
+        return {
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "smtp_connects": self._smtp.connects,
+            "channels": {channel: m.to_dict() for channel, m in self.metrics.items()},
+        }
+
+    def join(self):
+        """Block until everything queued so far has been handled."""
+        self._queue.join()
+
+
+notification_service = NotificationService()
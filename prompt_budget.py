@@ -0,0 +1,116 @@
+import hashlib
+import json
+from datetime import datetime
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+
+def count_tokens(text):
+    """Token count for a prompt fragment; ~4 characters per token when tiktoken is not installed."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, (len(text) + 3) // 4)
+
+
+def recency_score(timestamp, half_life_days=180):
+    """1.0 for today, halving every `half_life_days`; 0 for missing or unparseable dates."""
+    try:
+        age_days = (datetime.now() - datetime.fromisoformat(str(timestamp)[:19])).days
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.5 ** (max(age_days, 0) / half_life_days)
+
+
+def similarity_score(value, target):
+    """1.0 when value equals target, falling towards 0 with relative distance."""
+    try:
+        value, target = float(value), float(target)
+    except (TypeError, ValueError):
+        return 0.0
+    if not target:
+        return 0.0
+    return 1.0 / (1.0 + abs(value - target) / abs(target))
+
+
+class PromptBudget:
+    """Tracks the tokens left for one LLM call while a prompt is assembled."""
+
+    def __init__(self, max_tokens):
+        self.max_tokens = max_tokens
+        self.used = 0
+
+    @property
+    def remaining(self):
+        return self.max_tokens - self.used
+
+    def add(self, text):
+        tokens = count_tokens(text)
+        if tokens > self.remaining:
+            return False
+        self.used += tokens
+        return True
+
+    def fit(self, text):
+        """Charge `text`, cut down to the tokens left when it is too long; returns what was charged."""
+        if self.add(text):
+            return text
+        if self.remaining <= 0:
+            return ""
+        text = text[:self.remaining * 4]
+        while text and count_tokens(text) > self.remaining:
+            text = text[:-max(1, len(text) // 10)]
+        self.add(text)
+        return text
+
+    def select(self, rows, render, score=None, reserve=0):
+        """Render the highest scoring rows that fit, keeping `reserve` tokens for a summary.
+
+        Returns (lines, overflow_rows).
+        """
+        ranked = sorted(rows, key=score, reverse=True) if score else list(rows)
+        lines = []
+        overflow = []
+        for row in ranked:
+            line = render(row)
+            if not overflow and count_tokens(line) <= self.remaining - reserve:
+                self.add(line)
+                lines.append(line)
+            else:
+                overflow.append(row)
+        return lines, overflow
+
+
+def rolling_summary(user_id, scope, rows, summarize, cursor, conn):
+    """Summary of `rows` cached per user and scope; recomputed only when the rows change."""
+    if not rows:
+        return ""
+    fingerprint = hashlib.md5(json.dumps(rows, sort_keys=True, default=str).encode()).hexdigest()
+    cursor.execute("SELECT summary, fingerprint FROM prompt_summaries WHERE user_id = ? AND scope = ?",
+                   (user_id, scope))
+    cached = cursor.fetchone()
+    if cached and cached[1] == fingerprint:
+        return cached[0]
+
+    summary = summarize(rows)
+    cursor.execute("""
+        INSERT INTO prompt_summaries (user_id, scope, summary, fingerprint, row_count, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, scope) DO UPDATE SET summary = excluded.summary, fingerprint = excluded.fingerprint,
+            row_count = excluded.row_count, updated_at = excluded.updated_at
+    """, (user_id, scope, summary, fingerprint, len(rows), datetime.now().isoformat()))
+    conn.commit()
+    return summary
+
+
+def summarize_numbers(label, values):
+    values = sorted(float(v) for v in values if v is not None)
+    if not values:
+        return f"{label}: no numeric values"
+    mid = len(values) // 2
+    median = values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+    return (f"{label}: {len(values)} more, min {values[0]:,.2f}, median {median:,.2f}, "
+            f"mean {sum(values) / len(values):,.2f}, max {values[-1]:,.2f}")
@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta
+
+import httpx
+
+REALNEX_V1_BASE = "https://api.realnex.com/v1"
+# Incremental pulls cannot see deletions, so each entity is re-pulled in full this often
+MIRROR_FULL_REFRESH = timedelta(hours=24)
+MODIFIED_FIELD = "LastModified"
+# Entity -> (table, mirrored columns besides user_id and modified_at); id is RealNex's own key
+MIRROR_ENTITIES = {
+    "companies": ("realnex_companies", ["id", "name", "address", "city", "zip"]),
+    "properties": ("realnex_properties", ["id", "name", "address", "city", "zip"]),
+    "spaces": ("realnex_spaces", ["id", "property_id", "space_number", "sq_ft"]),
+}
+DEFAULT_LIMIT = 25
+
+
+def create_mirror_schema(cursor):
+    """Tables for the local copy of RealNex companies, properties and spaces, indexed for the lookups below.
+
+    Names, addresses and cities compare case-insensitively, so equality and prefix LIKE both use the indexes.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS realnex_companies (
+            user_id TEXT,
+            id TEXT,
+            name TEXT COLLATE NOCASE,
+            address TEXT COLLATE NOCASE,
+            city TEXT COLLATE NOCASE,
+            zip TEXT,
+            modified_at TEXT,
+            PRIMARY KEY (user_id, id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS realnex_properties (
+            user_id TEXT,
+            id TEXT,
+            name TEXT COLLATE NOCASE,
+            address TEXT COLLATE NOCASE,
+            city TEXT COLLATE NOCASE,
+            zip TEXT,
+            modified_at TEXT,
+            PRIMARY KEY (user_id, id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS realnex_spaces (
+            user_id TEXT,
+            id TEXT,
+            property_id TEXT,
+            space_number TEXT,
+            sq_ft REAL,
+            modified_at TEXT,
+            PRIMARY KEY (user_id, id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS realnex_mirror_sync (
+            user_id TEXT,
+            entity TEXT,
+            synced_at TEXT,
+            full_synced_at TEXT,
+            high_water TEXT,
+            PRIMARY KEY (user_id, entity)
+        )
+    ''')
+    for table in ("realnex_companies", "realnex_properties"):
+        for column in ("name", "city", "zip"):
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} (user_id, {column}, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_realnex_properties_address ON realnex_properties (user_id, address, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_realnex_spaces_property ON realnex_spaces (user_id, property_id, id)')
+
+
+def _record(entity, row):
+    """Mirror columns of one RealNex row; ids are stored as text whatever type the API used."""
+    _, columns = MIRROR_ENTITIES[entity]
+    values = [row.get(c) for c in columns]
+    values[0] = str(values[0])
+    if entity == "spaces" and values[1] is not None:
+        values[1] = str(values[1])
+    return values + [row.get(MODIFIED_FIELD) or row.get("last_modified")]
+
+
+def _fetch(client, token, entity, since=None):
+    params = {"$filter": f"{MODIFIED_FIELD} gt {since}"} if since else None
+    response = client.get(f"{REALNEX_V1_BASE}/{entity}", params=params, headers={'Authorization': f'Bearer {token}'})
+    response.raise_for_status()
+    body = response.json()
+    return body.get("value", []) if isinstance(body, dict) else body
+
+
+def sync_state(user_id, entity, cursor):
+    cursor.execute("SELECT synced_at, full_synced_at, high_water FROM realnex_mirror_sync WHERE user_id = ? AND entity = ?",
+                   (user_id, entity))
+    return cursor.fetchone()
+
+
+def refresh_mirror(user_id, entity, token, cursor, conn, client=None, full=False):
+    """Pull new or changed rows of one entity into its mirror table and return them (as RealNex sent them).
+
+    Only rows modified since the last pull are downloaded; once a day, or when RealNex rejects the
+    modification filter, the whole collection is re-pulled and replaces the mirror.
+    """
+    table, columns = MIRROR_ENTITIES[entity]
+    state = sync_state(user_id, entity, cursor)
+    now = datetime.now()
+    full = full or not state or not state[1] or now - datetime.fromisoformat(state[1]) > MIRROR_FULL_REFRESH
+    since = None if full else state[2]
+    owns_client = client is None
+    client = client or httpx.Client(timeout=30)
+    try:
+        try:
+            rows = _fetch(client, token, entity, since)
+        except httpx.HTTPStatusError as e:
+            if since is None or e.response.status_code != 400:
+                raise
+            full = True
+            rows = _fetch(client, token, entity)
+    finally:
+        if owns_client:
+            client.close()
+
+    rows = [row for row in rows if row.get("id") is not None]
+    records = [[user_id] + _record(entity, row) for row in rows]
+    high_water = max([r[-1] for r in records if r[-1]], default=state[2] if state else None)
+    if full:
+        cursor.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+    names = ["user_id"] + columns + ["modified_at"]
+    cursor.executemany(f"INSERT OR REPLACE INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                       records)
+    cursor.execute("""
+        INSERT OR REPLACE INTO realnex_mirror_sync (user_id, entity, synced_at, full_synced_at, high_water)
+        VALUES (?, ?, ?, ?, ?)
+    """, (user_id, entity, now.isoformat(), now.isoformat() if full else state[1], high_water))
+    conn.commit()
+    return rows
+
+
+def mirror_filters(args, columns):
+    """WHERE clauses and parameters for the mirror lookups: exact zip, city and property_id, name prefix."""
+    where, params = [], []
+    for column in ("zip", "city", "property_id"):
+        if column in columns and args.get(column):
+            where.append(f"{column} = ?")
+            params.append(args[column].strip())
+    if "name" in columns and args.get("name"):
+        where.append("name LIKE ? ESCAPE '\\'")
+        params.append(args["name"].strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    return where, params
+
+
+def _query(user_id, entity, filters, cursor, limit):
+    table, columns = MIRROR_ENTITIES[entity]
+    where, params = mirror_filters(filters, columns)
+    cursor.execute(f"""
+        SELECT {', '.join(columns)} FROM {table}
+        WHERE {' AND '.join(['user_id = ?'] + where)}
+        ORDER BY id LIMIT ?
+    """, (user_id, *params, limit))
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def find_companies(user_id, cursor, limit=DEFAULT_LIMIT, **filters):
+    return _query(user_id, "companies", filters, cursor, limit)
+
+
+def find_properties(user_id, cursor, limit=DEFAULT_LIMIT, **filters):
+    return _query(user_id, "properties", filters, cursor, limit)
+
+
+def resolve_property(user_id, ref, cursor):
+    """Mirrored property with id `ref`, or else with that name or address (case-insensitive)."""
+    ref = ref.strip()
+    _, columns = MIRROR_ENTITIES["properties"]
+    for column in ("id", "name", "address"):
+        cursor.execute(f"SELECT {', '.join(columns)} FROM realnex_properties WHERE user_id = ? AND {column} = ? ORDER BY id LIMIT 1",
+                       (user_id, ref))
+        row = cursor.fetchone()
+        if row:
+            return dict(zip(columns, row))
+    return None
+
+
+def spaces_at_property(user_id, property_id, cursor, limit=DEFAULT_LIMIT):
+    return _query(user_id, "spaces", {"property_id": property_id}, cursor, limit)
@@ -0,0 +1,22 @@
+import logging
+
+from config import REDIS_CACHE_ENABLED, redis_url
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+def get_redis():
+    """Shared Redis client for optional cache tiers, or None when Redis is disabled or unavailable."""
+    global _client
+    if not REDIS_CACHE_ENABLED:
+        return None
+    if _client is None:
+        try:
+            import redis
+            _client = redis.Redis.from_url(redis_url(), decode_responses=True)
+        except Exception as e:
+            logger.error(f"Redis client unavailable, using in-memory caches only: {e}")
+            return None
+    return _client
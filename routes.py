@@ -7,7 +7,6 @@ from datetime import datetime
 import pandas as pd
 import numpy as np
 from sklearn.linear_model import LinearRegression
-from fuzzywuzzy import fuzz
 from PIL import Image
 import pytesseract
 import httpx
@@ -19,6 +18,24 @@ from config import *
 from database import conn, cursor
 from utils import *
 from auth_utils import token_required
+from admission import admission_controlled
+from contact_import import load_field_mapping as fetch_field_mapping, save_field_mapping as store_field_mapping
+from duplicate_index import get_duplicate_pairs
+from prompt_budget import PromptBudget, recency_score, rolling_summary, summarize_numbers
+
+INSIGHTS_CANDIDATE_ROWS = 200
+# Each section has its own budget, so a long deal history cannot crowd out recent activity
+INSIGHTS_DEAL_TOKENS = 700
+INSIGHTS_ACTIVITY_TOKENS = 500
+INSIGHTS_SUMMARY_TOKENS = 60
+
+
+def summarize_activity(rows):
+    counts = {}
+    for action, _, _ in rows:
+        counts[action] = counts.get(action, 0) + 1
+    top = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:5]
+    return f"- {len(rows)} earlier actions, most frequent: " + ", ".join(f"{action} ({n})" for action, n in top)
 
 
 def register_routes(app):
@@ -32,6 +49,7 @@ def register_routes(app):
         return render_template("index.html")
 
     @app.route("/ask", methods=["POST"])
+    @admission_controlled("ask")
     def ask():
         data = request.get_json()
         question = data.get("query")
@@ -70,6 +88,7 @@ def register_routes(app):
         return jsonify({"status": f"Token saved for {service}"})
     @app.route("/process-ocr", methods=["POST"])
     @token_required
+    @admission_controlled("ocr")
     async def process_ocr(user_id):
         if 'image' not in request.files:
             return jsonify({"error": "No image uploaded"}), 400
@@ -120,25 +139,51 @@ def register_routes(app):
     def save_field_mapping(user_id, name):
         data = request.get_json()
         contacts = data.get("contacts", {})
+        store_field_mapping(user_id, name, {"contacts": contacts}, cursor, conn)
         return jsonify({"status": f"Mapping '{name}' saved", "contacts": contacts})
 
     @app.route("/field-map/saved/<name>", methods=["GET"])
     @token_required
     def load_field_mapping(user_id, name):
-        dummy_mappings = {"contacts": {"Full Name": "name", "Email": "email"}}
-        return jsonify(dummy_mappings)
+        mapping = fetch_field_mapping(user_id, name, cursor)
+        if mapping is None:
+            return jsonify({"error": f"No mapping named '{name}'"}), 404
+        return jsonify(mapping)
 
     @app.route("/market-insights", methods=["GET"])
     @token_required
     async def market_insights(user_id):
-        cursor.execute("SELECT amount, close_date FROM deals WHERE user_id = ? ORDER BY close_date DESC LIMIT 5", (user_id,))
+        # Candidate rows are bounded; whatever does not fit the token budget is folded into cached summaries
+        cursor.execute("SELECT amount, close_date FROM deals WHERE user_id = ? ORDER BY close_date DESC LIMIT ?",
+                       (user_id, INSIGHTS_CANDIDATE_ROWS))
         deals = cursor.fetchall()
 
-        cursor.execute("SELECT action, details, timestamp FROM user_activity_log WHERE user_id = ? ORDER BY timestamp DESC LIMIT 5", (user_id,))
+        cursor.execute("SELECT action, details, timestamp FROM user_activity_log WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
+                       (user_id, INSIGHTS_CANDIDATE_ROWS))
         activity = cursor.fetchall()
 
-        deal_summary = "\n".join([f"- Amount: ${d[0]}, Close Date: {d[1]}" for d in deals])
-        activity_summary = "\n".join([f"- {a[0]} at {a[2]}: {a[1]}" for a in activity])
+        deal_budget = PromptBudget(INSIGHTS_DEAL_TOKENS)
+        deal_lines, deal_overflow = deal_budget.select(
+            deals, render=lambda d: f"- Amount: ${d[0]}, Close Date: {d[1]}",
+            score=lambda d: recency_score(d[1]), reserve=INSIGHTS_SUMMARY_TOKENS
+        )
+        if deal_overflow:
+            deal_lines.append(deal_budget.fit(rolling_summary(
+                user_id, "market_insights:deals", deal_overflow,
+                lambda rows: "- Older deals " + summarize_numbers("amounts", [r[0] for r in rows]), cursor, conn
+            )))
+        deal_summary = "\n".join(deal_lines)
+
+        activity_budget = PromptBudget(INSIGHTS_ACTIVITY_TOKENS)
+        activity_lines, activity_overflow = activity_budget.select(
+            activity, render=lambda a: f"- {a[0]} at {a[2]}: {a[1]}",
+            score=lambda a: recency_score(a[2]), reserve=INSIGHTS_SUMMARY_TOKENS
+        )
+        if activity_overflow:
+            activity_lines.append(activity_budget.fit(rolling_summary(
+                user_id, "market_insights:activity", activity_overflow, summarize_activity, cursor, conn
+            )))
+        activity_summary = "\n".join(activity_lines)
 
         prompt = (
             "You are a CRE market analyst. Based on the data, offer 2-3 sentence insights.\n"
@@ -176,21 +221,8 @@ def register_routes(app):
     @app.route("/duplicates-data", methods=["GET"])
     @token_required
     def duplicates_data(user_id):
-        cursor.execute("SELECT id, name, email FROM contacts WHERE user_id = ?", (user_id,))
-        contacts = cursor.fetchall()
-        duplicates = []
-
-        for i, contact in enumerate(contacts):
-            for j, other in enumerate(contacts[i+1:], start=i+1):
-                name_similarity = fuzz.token_sort_ratio(contact[1], other[1])
-                email_similarity = fuzz.token_sort_ratio(contact[2], other[2])
-                if name_similarity > 85 or email_similarity > 90:
-                    duplicates.append({
-                        "contact1": {"id": contact[0], "name": contact[1], "email": contact[2]},
-                        "contact2": {"id": other[0], "name": other[1], "email": other[2]},
-                        "name_similarity": name_similarity,
-                        "email_similarity": email_similarity
-                    })
+        # Pairs are kept current on every contact write; only the first request builds the index
+        duplicates = get_duplicate_pairs(user_id, cursor, conn)
 
         return jsonify({"duplicates": duplicates})
 
@@ -228,6 +260,7 @@ def register_routes(app):
 
         cursor.execute("INSERT OR REPLACE INTO webhooks (user_id, webhook_url) VALUES (?, ?)", (user_id, webhook_url))
         conn.commit()
+        invalidate_webhook_url(user_id)
         return jsonify({"status": "Webhook registered successfully"})
 
     @app.route("/test-webhook", methods=["POST"])
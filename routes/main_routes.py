@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, request, jsonify
 import openai
 import os
 
+from admission import admission_controlled
+
 main_routes = Blueprint('main_routes', __name__)
 
 # 🌐 Publicly accessible frontend views
@@ -44,6 +46,7 @@ def login():
 
 # 🤖 Public chat endpoint (no token required)
 @main_routes.route("/ask", methods=["POST"])
+@admission_controlled("ask")
 def ask():
     query = request.json.get("query", "")
     if not query:
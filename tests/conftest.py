@@ -0,0 +1,29 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROUTES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "routes.py")
+
+
+@pytest.fixture
+def legacy_routes(tmp_path, monkeypatch):
+    """routes.py bound to a fresh database in tmp_path.
+
+    routes.py sits next to the routes/ package, so it is loaded from its path, once per session.
+    It holds the connection imported from database.py, which is swapped for one to the test's file.
+    """
+    monkeypatch.chdir(tmp_path)
+    module = sys.modules.get("legacy_routes")
+    if module is None:
+        spec = importlib.util.spec_from_file_location("legacy_routes", ROUTES_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules["legacy_routes"] = module
+    import database
+    conn, cursor = database.init_db()
+    monkeypatch.setattr(module, "conn", conn)
+    monkeypatch.setattr(module, "cursor", cursor)
+    yield module
+    conn.close()
@@ -0,0 +1,83 @@
+import threading
+import time
+
+from flask import Flask, jsonify
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+import admission
+from admission import TokenBucket, AdmissionController, _client_key
+
+
+def test_token_bucket_allows_burst_then_limits():
+    bucket = TokenBucket(rate=1, burst=2)
+    assert bucket.take()[0]
+    assert bucket.take()[0]
+    allowed, retry_after = bucket.take()
+    assert not allowed
+    assert 0 < retry_after <= 1
+
+
+def test_concurrency_cap_rejects_when_queue_is_full():
+    controller = AdmissionController("test", rate=10, burst=10, max_concurrent=1, max_queue=1, queue_timeout=0.2)
+    assert controller.acquire_slot() is None
+
+    waiter = []
+    thread = threading.Thread(target=lambda: waiter.append(controller.acquire_slot()))
+    thread.start()
+    time.sleep(0.05)
+    assert controller.acquire_slot() == "queue_full"
+    thread.join()
+    assert waiter == ["queue_timeout"]
+
+    controller.release_slot()
+    assert controller.acquire_slot() is None
+    assert controller.metrics()["in_flight"] == 1
+
+
+class _FlakyRedis:
+    def __init__(self):
+        self.up = False
+
+    def eval(self, *args):
+        if not self.up:
+            raise ConnectionError("connection refused")
+        return 1, "5"
+
+
+def test_redis_outage_is_logged_once_not_per_request(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(admission.logger, "warning", warnings.append)
+    redis = _FlakyRedis()
+    controller = AdmissionController("test", rate=10, burst=10, max_concurrent=1, max_queue=1, redis_client=redis)
+    for _ in range(5):
+        assert controller.take_token("user:u1")[0]
+    assert len(warnings) == 1
+
+    redis.up = True
+    controller.take_token("user:u1")
+    redis.up = False
+    controller.take_token("user:u1")
+    assert len(warnings) == 2
+
+
+def _key_app(proxy_hops=0):
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "test-secret"
+    app.add_url_rule("/key", "key", lambda: jsonify(key=_client_key()))
+    if proxy_hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops)
+    return app.test_client()
+
+
+def test_client_key_ignores_spoofed_forwarded_for():
+    client = _key_app()
+    response = client.get("/key", headers={"X-Forwarded-For": "1.2.3.4"}, environ_base={"REMOTE_ADDR": "10.0.0.9"})
+    assert response.get_json()["key"] == "ip:10.0.0.9"
+
+
+def test_client_key_trusts_only_configured_proxy_hops():
+    client = _key_app(proxy_hops=1)
+    # The client prepended a fake entry; our one proxy appended the real peer address
+    response = client.get("/key", headers={"X-Forwarded-For": "1.2.3.4, 203.0.113.7"},
+                          environ_base={"REMOTE_ADDR": "10.0.0.9"})
+    assert response.get_json()["key"] == "ip:203.0.113.7"
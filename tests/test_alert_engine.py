@@ -0,0 +1,50 @@
+import sqlite3
+
+from alert_engine import AlertIndex
+from list_views import create_version_schema
+
+
+def _cursor():
+    cursor = sqlite3.connect(":memory:").cursor()
+    cursor.execute("CREATE TABLE deal_alerts (user_id TEXT, threshold REAL, deal_type TEXT)")
+    create_version_schema(cursor, ["deal_alerts"])
+    cursor.executemany("INSERT INTO deal_alerts VALUES (?, ?, ?)", [
+        ("u1", 5000, "LeaseComp"), ("u1", 1000, "Any"), ("u1", 900000, "SaleComp"), ("u2", 10, "LeaseComp"),
+    ])
+    return cursor
+
+
+def test_matches_only_exceeded_thresholds_for_the_owner():
+    index = AlertIndex()
+    cursor = _cursor()
+    assert sorted(index.matches("u1", "LeaseComp", 6000, cursor)) == [("Any", 1000.0), ("LeaseComp", 5000.0)]
+    assert index.matches("u1", "LeaseComp", 5000, cursor) == [("Any", 1000.0)]
+    assert index.matches("u1", "SaleComp", 500, cursor) == []
+    assert index.matches("u3", "LeaseComp", 10 ** 9, cursor) == []
+
+
+def test_updates_only_match_newly_crossed_thresholds():
+    index = AlertIndex()
+    cursor = _cursor()
+    assert index.matches("u1", "LeaseComp", 6000, cursor, previous=2000) == [("LeaseComp", 5000.0)]
+    assert index.matches("u1", "LeaseComp", 7000, cursor, previous=6000) == []
+
+    cursor.execute("INSERT INTO deal_alerts VALUES ('u1', 6500, 'LeaseComp')")
+    assert index.matches("u1", "LeaseComp", 7000, cursor, previous=6000) == [("LeaseComp", 6500.0)]
+
+
+def test_alerts_written_through_another_connection_are_picked_up(tmp_path):
+    path = str(tmp_path / "alerts.db")
+    writer = sqlite3.connect(path)
+    writer.execute("CREATE TABLE deal_alerts (user_id TEXT, threshold REAL, deal_type TEXT)")
+    create_version_schema(writer.cursor(), ["deal_alerts"])
+    writer.execute("INSERT INTO deal_alerts VALUES ('u1', 5000, 'LeaseComp')")
+    writer.commit()
+    index = AlertIndex()
+    cursor = sqlite3.connect(path).cursor()
+    assert index.matches("u1", "LeaseComp", 6000, cursor) == [("LeaseComp", 5000.0)]
+
+    # The worker that handled "notify me of new deals over ..." is a different process
+    writer.execute("INSERT INTO deal_alerts VALUES ('u1', 1000, 'Any')")
+    writer.commit()
+    assert sorted(index.matches("u1", "LeaseComp", 6000, cursor)) == [("Any", 1000.0), ("LeaseComp", 5000.0)]
@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+from bulk_ops import (MAX_BULK_ITEMS, apply_patches, check_items, delete_results, delete_rows, fetch_rows, merge_ids,
+                      ordered_results, patch_ids, validate_patches)
+
+
+def _cursor():
+    cursor = sqlite3.connect(":memory:").cursor()
+    cursor.execute("CREATE TABLE deals (id TEXT, user_id TEXT, amount INTEGER, deal_type TEXT)")
+    cursor.executemany("INSERT INTO deals VALUES (?, ?, ?, ?)",
+                       [("d1", "u1", 10, "lease"), ("d2", "u1", 20, "lease"), ("d3", "u2", 30, "lease")])
+    return cursor
+
+
+def test_patches_are_validated_in_one_pass_with_per_item_results():
+    cursor = _cursor()
+    patches = [{"id": "d1", "deal_type": "sale"}, {"id": "d3", "amount": 1}, {"id": "d2", "owner": "x"},
+               {"amount": 5}, {"id": "d1", "amount": 2}, {"id": "d2"}]
+    existing = fetch_rows("deals", ["amount", "deal_type"], "u1", {"d1", "d2", "d3"}, cursor)
+    assert set(existing) == {"d1", "d2"}
+
+    valid, results = validate_patches(patches, ["amount", "deal_type"], existing)
+    assert [item_id for _, item_id, _ in valid] == ["d1"]
+    statuses = [r["status"] for r in ordered_results(len(patches), {**results, 0: {"status": "updated"}})]
+    assert statuses == ["updated", "not_found", "invalid", "invalid", "invalid", "invalid"]
+
+
+def test_patches_with_different_columns_are_applied_per_column_set():
+    cursor = _cursor()
+    apply_patches("deals", "u1", [(0, "d1", {"deal_type": "sale"}), (1, "d2", {"amount": 99, "deal_type": "sale"}),
+                                  (2, "d3", {"amount": 0})], cursor)
+    cursor.execute("SELECT id, amount, deal_type FROM deals ORDER BY id")
+    # d3 belongs to another user and is left alone
+    assert cursor.fetchall() == [("d1", 10, "sale"), ("d2", 99, "sale"), ("d3", 30, "lease")]
+
+    delete_rows("deals", "u1", ["d1", "d3"], cursor)
+    cursor.execute("SELECT id FROM deals ORDER BY id")
+    assert cursor.fetchall() == [("d2",), ("d3",)]
+
+
+def test_request_size_is_bounded():
+    with pytest.raises(ValueError):
+        check_items([])
+    with pytest.raises(ValueError):
+        check_items({"id": "d1"})
+    with pytest.raises(ValueError):
+        check_items([{}] * (MAX_BULK_ITEMS + 1))
+
+
+def test_ids_are_normalized_and_bad_ids_reported_per_item():
+    cursor = _cursor()
+    cursor.execute("INSERT INTO deals VALUES ('7', 'u1', 70, 'lease')")
+    patches = [{"id": 7, "amount": 1}, {"id": ["d1"], "amount": 2}, {"id": {"x": 1}, "amount": 3},
+               {"id": True, "amount": 4}, {"id": "d2", "amount": 5}]
+    ids = patch_ids(patches)
+    assert ids == {"7", "d2"}
+    existing = fetch_rows("deals", ["amount"], "u1", ids, cursor)
+
+    valid, results = validate_patches(patches, ["amount"], existing)
+    assert [(index, item_id) for index, item_id, _ in valid] == [(0, "7"), (4, "d2")]
+    assert [results[i]["status"] for i in (1, 2, 3)] == ["invalid"] * 3
+    assert results[1] == {"id": ["d1"], "status": "invalid", "error": "id must be a string or integer"}
+
+    deletes = delete_results([7, ["d1"], "nope"], existing)
+    assert [r["status"] for r in deletes] == ["deleted", "invalid", "not_found"]
+    assert deletes[0]["id"] == "7"
+
+
+def test_merge_ids_are_normalized_and_malformed_merges_rejected():
+    assert merge_ids({"keep": 7, "remove": ["c2", 3, "c2"]}) == ("7", ["c2", "3"], None)
+    for merge in ({"keep": "c1", "remove": "c2"}, {"keep": "c1", "remove": 5}, {"keep": "c1", "remove": {"id": "c2"}},
+                  {"keep": "c1", "remove": []}, {"keep": "c1", "remove": [["c2"]]}, {"keep": ["c1"], "remove": ["c2"]},
+                  {"keep": "c1", "remove": ["c1"]}, "c1"):
+        keep, remove, error = merge_ids(merge)
+        assert error and remove == []
@@ -0,0 +1,79 @@
+import sqlite3
+import time
+
+import pytest
+
+import utils
+from chat_turns import ChatTurn, current_chat_turn
+from utils import get_webhook_url, invalidate_webhook_url, log_user_activity
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE chat_messages (user_id TEXT, sender TEXT, message TEXT, timestamp TEXT)")
+    cursor.execute("CREATE TABLE user_activity_log (user_id TEXT, action TEXT, details TEXT, timestamp TEXT)")
+    cursor.execute("CREATE TABLE webhooks (user_id TEXT PRIMARY KEY, webhook_url TEXT)")
+    return cursor, conn
+
+
+def _count(cursor, table):
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def test_activity_is_buffered_until_the_turn_is_saved():
+    cursor, conn = _db()
+    turn = ChatTurn("u1", "sync contacts")
+    with turn.active():
+        log_user_activity("u1", "sync_data", {"type": "contacts"}, cursor, conn)
+        assert _count(cursor, "user_activity_log") == 0
+    turn.reply("Synced 3 contacts")
+    turn.save(cursor, conn)
+
+    cursor.execute("SELECT sender, message FROM chat_messages")
+    assert cursor.fetchall() == [("user", "sync contacts"), ("bot", "Synced 3 contacts")]
+    cursor.execute("SELECT action, details FROM user_activity_log")
+    assert cursor.fetchall() == [("sync_data", '{"type": "contacts"}')]
+
+
+def test_leaving_the_turn_restores_direct_writes_even_on_error():
+    cursor, conn = _db()
+    turn = ChatTurn("u1", "predict deal")
+    with pytest.raises(RuntimeError):
+        with turn.active():
+            raise RuntimeError("command failed")
+    assert current_chat_turn.get() is None
+
+    log_user_activity("u1", "predict_deal", {}, cursor, conn)
+    assert _count(cursor, "user_activity_log") == 1
+    assert turn.activities == []
+
+
+def test_failed_save_rolls_back_the_whole_turn():
+    cursor, conn = _db()
+    turn = ChatTurn("u1", "hello")
+    turn.log_activity("u1", "chat", {})
+    turn.reply("hi")
+    cursor.execute("DROP TABLE user_activity_log")
+    with pytest.raises(sqlite3.OperationalError):
+        turn.save(cursor, conn)
+    assert _count(cursor, "chat_messages") == 0
+
+
+def test_webhook_url_is_cached_until_invalidated_or_expired(monkeypatch):
+    cursor, conn = _db()
+    cursor.execute("INSERT INTO webhooks VALUES ('u-hook', 'https://old.example/hook')")
+    invalidate_webhook_url("u-hook")
+    assert get_webhook_url("u-hook", cursor) == "https://old.example/hook"
+
+    cursor.execute("UPDATE webhooks SET webhook_url = 'https://new.example/hook' WHERE user_id = 'u-hook'")
+    assert get_webhook_url("u-hook", cursor) == "https://old.example/hook"
+    invalidate_webhook_url("u-hook")
+    assert get_webhook_url("u-hook", cursor) == "https://new.example/hook"
+
+    # Another worker changing the URL cannot invalidate this one: the entry must expire on its own
+    cursor.execute("DELETE FROM webhooks WHERE user_id = 'u-hook'")
+    later = time.monotonic() + utils.WEBHOOK_CACHE_TTL + 1
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    assert get_webhook_url("u-hook", cursor) is None
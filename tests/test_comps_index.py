@@ -0,0 +1,23 @@
+from comps_index import CompsIndex
+
+
+def _comps():
+    return [{"sq_ft": sq_ft, "rent_month": 2 * sq_ft, "close_date": f"20{18 + i % 6}-06-01"}
+            for i, sq_ft in enumerate(range(500, 20500, 500))]
+
+
+def test_nearest_matches_brute_force():
+    comps = _comps()
+    index = CompsIndex(comps, "LeaseComp")
+    for target in (100, 4250, 7000, 19999, 50000):
+        expected = sorted(c["sq_ft"] for c in sorted(comps, key=lambda c: abs(c["sq_ft"] - target))[:5])
+        assert sorted(c["sq_ft"] for c in index.nearest(target, 5)) == expected
+
+
+def test_summary_is_precomputed_over_all_comps():
+    index = CompsIndex(_comps(), "LeaseComp")
+    assert index.summary["count"] == 40
+    assert index.summary["ppsf_percentiles"][50] == 2.0
+    assert abs(index.summary["ppsf_trend_per_year"]) < 1e-6
+    assert len(index.summary_lines("per month")) == 3
+    assert not CompsIndex([], "LeaseComp")
@@ -0,0 +1,116 @@
+import sqlite3
+from datetime import datetime
+
+import httpx
+import pytest
+
+import comps_mirror
+from comps_mirror import COMPS_FULL_REFRESH, _refresh, load_comps
+
+
+@pytest.fixture
+def mirror(tmp_path, monkeypatch):
+    """A file database with the mirror tables plus a fake RealNex answering from a list of pages."""
+    path = str(tmp_path / "comps.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE realnex_comps (user_id TEXT, deal_type TEXT, comp_id TEXT, sq_ft REAL, rent_month REAL,
+                                    sale_price REAL, amount REAL, close_date TEXT, modified_at TEXT,
+                                    PRIMARY KEY (user_id, deal_type, comp_id))
+    """)
+    conn.execute("""
+        CREATE TABLE comps_sync (user_id TEXT, deal_type TEXT, synced_at TEXT, full_synced_at TEXT, high_water TEXT,
+                                 PRIMARY KEY (user_id, deal_type))
+    """)
+    conn.commit()
+    monkeypatch.setattr(comps_mirror, "db_path", path)
+    monkeypatch.setattr(comps_mirror, "get_token", lambda user_id, service, cursor: "token")
+    monkeypatch.setattr(comps_mirror, "invalidate_deal_models", lambda *args, **kwargs: None)
+    alerts = []
+    monkeypatch.setattr(comps_mirror, "evaluate_deal", lambda user_id, deal, cursor, source, old_deal=None:
+                        alerts.append((deal["key"], old_deal and old_deal["rent_month"])))
+
+    pages, calls = [], []
+
+    def fetch(token, deal_type, since=None):
+        calls.append(since)
+        page = pages.pop(0)
+        if isinstance(page, int):
+            request = httpx.Request("GET", "https://realnex.test/LeaseComps")
+            raise httpx.HTTPStatusError("rejected", request=request, response=httpx.Response(page, request=request))
+        return page
+
+    monkeypatch.setattr(comps_mirror, "_fetch", fetch)
+    return conn.cursor(), pages, calls, alerts
+
+
+def _sq_ft(cursor):
+    return sorted(row["sq_ft"] for row in load_comps("u1", "LeaseComp", cursor))
+
+
+def test_incremental_pull_starts_at_the_high_water_mark(mirror):
+    cursor, pages, calls, alerts = mirror
+    pages.append([{"key": "a", "sq_ft": 1000, "rent_month": 2000, "LastModified": "2024-01-01T00:00:00"},
+                  {"key": "b", "sq_ft": 2000, "rent_month": 4000, "LastModified": "2024-01-05T00:00:00"}])
+    pages.append([{"key": "b", "sq_ft": 2500, "rent_month": 5000, "LastModified": "2024-02-01T00:00:00"},
+                  {"key": "c", "sq_ft": 900, "rent_month": 1800, "LastModified": "2024-02-02T00:00:00"},
+                  {"key": "a", "sq_ft": 1100, "rent_month": 2000, "LastModified": "2024-02-03T00:00:00"}])
+    assert _refresh("u1", "LeaseComp") == 2
+    assert _refresh("u1", "LeaseComp") == 3
+
+    assert calls == [None, "2024-01-05T00:00:00"]
+    assert _sq_ft(cursor) == [900, 1100, 2500]
+    # b moved from its mirrored value, c is new; a changed but its value did not
+    assert alerts == [("b", 4000), ("c", None)]
+    cursor.execute("SELECT high_water FROM comps_sync WHERE user_id = 'u1'")
+    assert cursor.fetchone()[0] == "2024-02-03T00:00:00"
+
+
+def test_refreshes_without_a_high_water_mark_send_no_alerts(mirror):
+    cursor, pages, calls, alerts = mirror
+    history = [{"key": "a", "sq_ft": 1000, "rent_month": 9000}, {"key": "b", "sq_ft": 2000, "rent_month": 12000}]
+    pages.extend([list(history), list(history)])
+    _refresh("u1", "LeaseComp")
+    _refresh("u1", "LeaseComp")
+    assert calls == [None, None]
+    assert alerts == []
+
+
+def test_full_pull_after_the_full_refresh_interval_drops_deleted_comps(mirror):
+    cursor, pages, calls, alerts = mirror
+    pages.append([{"key": "a", "sq_ft": 1000, "LastModified": "2024-01-01"},
+                  {"key": "b", "sq_ft": 2000, "LastModified": "2024-01-02"}])
+    pages.append([{"key": "a", "sq_ft": 1000, "LastModified": "2024-01-01"}])
+    _refresh("u1", "LeaseComp")
+    stale = (datetime.now() - COMPS_FULL_REFRESH * 2).isoformat()
+    cursor.execute("UPDATE comps_sync SET full_synced_at = ?", (stale,))
+    cursor.connection.commit()
+
+    _refresh("u1", "LeaseComp")
+    assert calls == [None, None]
+    assert _sq_ft(cursor) == [1000]
+    assert alerts == []
+
+
+def test_rejected_filter_falls_back_to_a_full_pull(mirror):
+    cursor, pages, calls, alerts = mirror
+    pages.append([{"key": "a", "sq_ft": 1000, "LastModified": "2024-01-01"},
+                  {"key": "b", "sq_ft": 2000, "LastModified": "2024-01-02"}])
+    pages.append(400)
+    pages.append([{"key": "b", "sq_ft": 2000, "LastModified": "2024-01-02"}])
+    _refresh("u1", "LeaseComp")
+    assert _refresh("u1", "LeaseComp") == 1
+
+    assert calls == [None, "2024-01-02", None]
+    assert _sq_ft(cursor) == [2000]
+    assert alerts == []
+
+
+def test_other_errors_leave_the_mirror_untouched(mirror):
+    cursor, pages, calls, alerts = mirror
+    pages.append([{"key": "a", "sq_ft": 1000, "LastModified": "2024-01-01"}])
+    pages.append(500)
+    _refresh("u1", "LeaseComp")
+    with pytest.raises(httpx.HTTPStatusError):
+        _refresh("u1", "LeaseComp")
+    assert _sq_ft(cursor) == [1000]
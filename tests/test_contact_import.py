@@ -0,0 +1,25 @@
+from contact_import import column_fields, fingerprint, map_row, read_rows
+
+
+def test_saved_mapping_wins_and_defaults_fill_the_rest():
+    fields = column_fields(["Contact", "First Name", "Last Name", "E-mail", "Notes"], {"Contact": "name"})
+    assert fields == {0: "name", 1: "first_name", 2: "last_name", 3: "email"}
+
+
+def test_rows_are_mapped_and_first_last_names_joined():
+    fields = column_fields(["First Name", "Last Name", "Email"])
+    assert map_row([" Ann ", "Lee", "ANN@X.COM"], fields) == ("Ann Lee", "ann@x.com", "", "")
+    assert map_row(["Bo"], fields) == ("Bo", "", "", "")
+
+
+def test_fingerprint_prefers_email_then_phone():
+    assert fingerprint("Ann Lee", "a.nn+crm@x.com", "") == fingerprint("Someone Else", "ann@x.com", "555")
+    assert fingerprint("Ann", "", "(555) 123-4567") == fingerprint("Bob", "", "+1 555 123 4567")
+    assert fingerprint("Ann  Lee", "", "") == fingerprint("ann lee", "", "")
+    assert fingerprint("Ann Lee", "", "") != fingerprint("Ann Lee", "", "5551234567")
+
+
+def test_csv_rows_stream_with_bom_header(tmp_path):
+    path = tmp_path / "contacts.csv"
+    path.write_bytes("﻿Name,Email\nAnn,ann@x.com\n".encode("utf-8"))
+    assert list(read_rows(str(path), "contacts.csv")) == [["Name", "Email"], ["Ann", "ann@x.com"]]
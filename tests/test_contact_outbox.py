@@ -0,0 +1,172 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import contact_outbox
+from contact_outbox import ContactSyncWorker, record_contact_change
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeClient:
+    calls = []
+    status_code = 200
+    # Status for RealNex calls only, to fail one target while the other succeeds
+    realnex_status_code = None
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _status(self, url):
+        if "realnex" in url and FakeClient.realnex_status_code:
+            return FakeClient.realnex_status_code
+        return FakeClient.status_code
+
+    def post(self, url, headers=None, json=None):
+        FakeClient.calls.append(("POST", url, json))
+        return FakeResponse(self._status(url), {"id": f"rn{len(FakeClient.calls)}"})
+
+    def put(self, url, headers=None, json=None):
+        FakeClient.calls.append(("PUT", url, json))
+        return FakeResponse(self._status(url))
+
+    def delete(self, url, headers=None):
+        FakeClient.calls.append(("DELETE", url, None))
+        return FakeResponse(FakeClient.status_code)
+
+
+def _db(monkeypatch):
+    FakeClient.calls, FakeClient.status_code, FakeClient.realnex_status_code = [], 200, None
+    monkeypatch.setattr(contact_outbox.httpx, "Client", FakeClient)
+    monkeypatch.setattr(contact_outbox, "get_token", lambda user_id, service, cursor: "key" if service == "mailchimp" else None)
+    monkeypatch.setattr(contact_outbox, "get_user_settings", lambda user_id, cursor, conn: {"mailchimp_group_id": "list1"})
+    monkeypatch.setattr(contact_outbox.contact_sync_worker, "start", lambda: None)
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE contacts (id TEXT, name TEXT, email TEXT, phone TEXT, company TEXT, user_id TEXT)")
+    cursor.execute("CREATE TABLE contact_outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, contact_id TEXT, op TEXT, payload TEXT, attempts INTEGER, available_at TEXT, created_at TEXT, done_targets TEXT)")
+    cursor.execute("CREATE TABLE realnex_contact_links (user_id TEXT, contact_id TEXT, realnex_id TEXT, PRIMARY KEY (user_id, contact_id))")
+    cursor.execute("CREATE TABLE user_activity_log (user_id TEXT, action TEXT, details TEXT, timestamp TEXT)")
+    return cursor, conn
+
+
+def _later(seconds=5):
+    return datetime.now() + timedelta(seconds=seconds)
+
+
+def test_edits_to_one_contact_coalesce_into_one_batched_push(monkeypatch):
+    cursor, conn = _db(monkeypatch)
+    cursor.execute("INSERT INTO contacts VALUES ('c1', 'Ann Lee', 'ann@x.com', '', '', 'u1')")
+    record_contact_change("u1", "c1", "upsert", cursor)
+    for name in ("Ann B Lee", "Ann Park"):
+        cursor.execute("UPDATE contacts SET name = ? WHERE id = 'c1'", (name,))
+        record_contact_change("u1", "c1", "upsert", cursor)
+    cursor.execute("INSERT INTO contacts VALUES ('c2', 'Bo Kim', 'bo@x.com', '', '', 'u1')")
+    record_contact_change("u1", "c2", "upsert", cursor)
+    conn.commit()
+
+    worker = ContactSyncWorker()
+    assert worker.process_due(cursor, conn, now=datetime.now()) == 0
+    assert worker.process_due(cursor, conn, now=_later()) == 4
+
+    assert len(FakeClient.calls) == 1
+    method, url, body = FakeClient.calls[0]
+    assert url.endswith("/lists/list1")
+    assert [(m["email_address"], m["merge_fields"]["LNAME"]) for m in body["members"]] == [("ann@x.com", "Park"), ("bo@x.com", "Kim")]
+    assert worker.metrics["coalesced"] == 2
+    cursor.execute("SELECT COUNT(*) FROM contact_outbox")
+    assert cursor.fetchone()[0] == 0
+
+
+def test_delete_supersedes_pending_upsert(monkeypatch):
+    cursor, conn = _db(monkeypatch)
+    cursor.execute("INSERT INTO contacts VALUES ('c1', 'Ann Lee', 'ann@x.com', '', '', 'u1')")
+    record_contact_change("u1", "c1", "upsert", cursor)
+    cursor.execute("DELETE FROM contacts WHERE id = 'c1'")
+    record_contact_change("u1", "c1", "delete", cursor, {"id": "c1", "name": "Ann Lee", "email": "ann@x.com"})
+    conn.commit()
+
+    ContactSyncWorker().process_due(cursor, conn, now=_later())
+    assert [call[0] for call in FakeClient.calls] == ["DELETE"]
+
+
+def test_failed_pushes_back_off_and_retry(monkeypatch):
+    cursor, conn = _db(monkeypatch)
+    FakeClient.status_code = 500
+    cursor.execute("INSERT INTO contacts VALUES ('c1', 'Ann Lee', 'ann@x.com', '', '', 'u1')")
+    record_contact_change("u1", "c1", "upsert", cursor)
+    conn.commit()
+
+    worker = ContactSyncWorker()
+    now = _later()
+    assert worker.process_due(cursor, conn, now=now) == 1
+    cursor.execute("SELECT attempts, available_at FROM contact_outbox")
+    attempts, available_at = cursor.fetchone()
+    assert attempts == 1 and datetime.fromisoformat(available_at) > now
+
+    FakeClient.status_code = 200
+    assert worker.process_due(cursor, conn, now=now) == 0
+    assert worker.process_due(cursor, conn, now=now + timedelta(minutes=5)) == 1
+    cursor.execute("SELECT COUNT(*) FROM contact_outbox")
+    assert cursor.fetchone()[0] == 0
+
+
+def _with_realnex(monkeypatch):
+    monkeypatch.setattr(contact_outbox, "get_token", lambda user_id, service, cursor: "key")
+    monkeypatch.setattr(contact_outbox, "get_user_settings",
+                        lambda user_id, cursor, conn: {"mailchimp_group_id": "list1", "realnex_group_id": "g1"})
+    monkeypatch.setattr(contact_outbox, "invalidate_realnex_queries", lambda user_id, entity_type=None: None)
+
+
+def test_realnex_contact_is_created_once_then_updated(monkeypatch):
+    cursor, conn = _db(monkeypatch)
+    _with_realnex(monkeypatch)
+    worker = ContactSyncWorker()
+    cursor.execute("INSERT INTO contacts VALUES ('c1', 'Ann Lee', 'ann@x.com', '', '', 'u1')")
+    record_contact_change("u1", "c1", "upsert", cursor)
+    conn.commit()
+    worker.process_due(cursor, conn, now=_later())
+    cursor.execute("UPDATE contacts SET name = 'Ann Park' WHERE id = 'c1'")
+    record_contact_change("u1", "c1", "upsert", cursor)
+    conn.commit()
+    worker.process_due(cursor, conn, now=_later())
+
+    realnex = [(method, url) for method, url, _ in FakeClient.calls if "realnex" in url]
+    assert realnex == [("POST", "https://api.realnex.com/v1/contacts"), ("PUT", "https://api.realnex.com/v1/contacts/rn2")]
+
+
+def test_retry_skips_targets_already_pushed(monkeypatch):
+    cursor, conn = _db(monkeypatch)
+    _with_realnex(monkeypatch)
+    FakeClient.realnex_status_code = 500
+    cursor.execute("INSERT INTO contacts VALUES ('c1', 'Ann Lee', 'ann@x.com', '', '', 'u1')")
+    record_contact_change("u1", "c1", "upsert", cursor)
+    conn.commit()
+
+    worker = ContactSyncWorker()
+    now = _later()
+    worker.process_due(cursor, conn, now=now)
+    cursor.execute("SELECT done_targets FROM contact_outbox")
+    assert cursor.fetchone()[0] == "mailchimp"
+
+    FakeClient.calls, FakeClient.realnex_status_code = [], None
+    assert worker.process_due(cursor, conn, now=now + timedelta(minutes=5)) == 1
+    assert [(method, "realnex" in url) for method, url, _ in FakeClient.calls] == [("POST", True)]
+    cursor.execute("SELECT COUNT(*) FROM contact_outbox")
+    assert cursor.fetchone()[0] == 0
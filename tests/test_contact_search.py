@@ -0,0 +1,77 @@
+import sqlite3
+
+from contact_search import create_contact_search_index, match_expression, search_contacts
+
+
+def _cursor():
+    cursor = sqlite3.connect(":memory:").cursor()
+    cursor.execute("CREATE TABLE contacts (id TEXT, name TEXT, email TEXT, phone TEXT, user_id TEXT, company TEXT, PRIMARY KEY (id, user_id))")
+    cursor.execute("INSERT INTO contacts VALUES ('c1', 'José Álvarez', 'jose@tower.io', '(212) 555-0199', 'u1', 'Tower Realty')")
+    create_contact_search_index(cursor)
+    return cursor
+
+
+def _ids(cursor, query, user_id="u1"):
+    return [c["id"] for c in search_contacts(user_id, query, cursor)]
+
+
+def test_existing_rows_are_indexed_and_matched_by_prefix():
+    cursor = _cursor()
+    assert _ids(cursor, "alva jos") == ["c1"]
+    assert _ids(cursor, "tower real") == ["c1"]
+    assert _ids(cursor, "2125550199") == ["c1"]
+    assert _ids(cursor, "212-555") == ["c1"]
+    assert _ids(cursor, "alvarez", user_id="u2") == []
+
+
+def test_triggers_follow_inserts_updates_and_deletes():
+    cursor = _cursor()
+    cursor.execute("INSERT INTO contacts (id, name, email, phone, user_id) VALUES ('c2', 'Ann Lee', 'ann@x.com', '', 'u1')")
+    assert _ids(cursor, "ann") == ["c2"]
+    cursor.execute("UPDATE contacts SET name = 'Ann Park' WHERE id = 'c2'")
+    assert _ids(cursor, "lee") == []
+    assert _ids(cursor, "park") == ["c2"]
+    cursor.execute("DELETE FROM contacts WHERE id = 'c2'")
+    assert _ids(cursor, "park") == []
+    cursor.execute("INSERT INTO contacts_fts (contacts_fts, rank) VALUES ('integrity-check', 1)")
+
+
+def test_name_matches_outrank_email_matches():
+    cursor = _cursor()
+    cursor.execute("INSERT INTO contacts (id, name, email, user_id) VALUES ('c2', 'Pat Kim', 'tower@kim.com', 'u1')")
+    cursor.execute("INSERT INTO contacts (id, name, email, user_id) VALUES ('c3', 'Tower Grant', 'g@x.com', 'u1')")
+    assert _ids(cursor, "tower")[0] == "c3"
+
+
+def test_match_expression_quotes_terms():
+    assert match_expression('acme "OR" xy') == '"acme"* "OR"* "xy"*'
+    assert match_expression("  ,, ") is None
+
+
+def test_single_character_terms_are_not_searched():
+    assert match_expression("j alvarez") == '"alvarez"*'
+    assert match_expression("j") is None
+    assert match_expression("5 ") is None
+    cursor = _cursor()
+    assert _ids(cursor, "j") == []
+
+
+def test_match_is_scoped_to_the_user_and_never_searches_user_ids():
+    cursor = _cursor()
+    cursor.execute("INSERT INTO contacts (id, name, email, user_id) VALUES ('c1', 'José Ruiz', 'j@x.com', 'u2')")
+    cursor.execute("INSERT INTO contacts (id, name, email, user_id) VALUES ('c9', 'Nobody', 'n@x.com', 'u1')")
+    assert _ids(cursor, "jose") == ["c1"]
+    assert [c["name"] for c in search_contacts("u2", "jose", cursor)] == ["José Ruiz"]
+    assert _ids(cursor, "u1") == []
+
+
+def test_index_without_user_id_is_rebuilt():
+    cursor = sqlite3.connect(":memory:").cursor()
+    cursor.execute("CREATE TABLE contacts (id TEXT, name TEXT, email TEXT, phone TEXT, user_id TEXT, company TEXT)")
+    cursor.execute("INSERT INTO contacts VALUES ('c1', 'Ann Lee', 'ann@x.com', '', 'u1', '')")
+    cursor.execute("CREATE VIRTUAL TABLE contacts_fts USING fts5(name, email, phone, company, content='contacts')")
+    cursor.execute("CREATE TRIGGER contacts_fts_insert AFTER INSERT ON contacts BEGIN SELECT 1; END")
+    create_contact_search_index(cursor)
+    assert _ids(cursor, "ann") == ["c1"]
+    cursor.execute("INSERT INTO contacts (id, name, user_id) VALUES ('c2', 'Ann Park', 'u1')")
+    assert sorted(_ids(cursor, "ann")) == ["c1", "c2"]
@@ -0,0 +1,33 @@
+import time
+
+from ttl_cache import TTLCache, MISSING
+from conversation_state import ConversationStateStore
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is MISSING
+
+
+def test_conversation_state_resumes_flow():
+    store = ConversationStateStore(maxsize=10, ttl=60)
+    store.update("user-1", "draft_email", campaign_type="RealBlast", step="subject")
+    store.update("user-1", "draft_email", subject="New Listing", step="audience")
+    state = store.get("user-1", "draft_email")
+    assert state == {"campaign_type": "RealBlast", "subject": "New Listing", "step": "audience"}
+    assert store.get("user-2", "draft_email") == {}
+    store.clear("user-1", "draft_email")
+    assert store.get("user-1", "draft_email") == {}
@@ -0,0 +1,24 @@
+import importlib
+import sqlite3
+
+
+def test_init_db_on_empty_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database = importlib.import_module("database")
+    conn, cursor = database.init_db()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name = 'idx_deals_user_type_sort'")
+    assert cursor.fetchone()
+    conn.close()
+
+
+def test_init_db_upgrades_old_deals_table(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    old = sqlite3.connect("chatbot.db")
+    old.execute("CREATE TABLE deals (id TEXT, amount INTEGER, close_date TEXT, user_id TEXT, PRIMARY KEY (id, user_id))")
+    old.commit()
+    old.close()
+    database = importlib.import_module("database")
+    conn, cursor = database.init_db()
+    cursor.execute("PRAGMA table_info(deals)")
+    assert {"sq_ft", "rent_month", "sale_price", "deal_type"} <= {row[1] for row in cursor.fetchall()}
+    conn.close()
@@ -0,0 +1,54 @@
+import os
+import threading
+import time
+
+import deal_charts
+from deal_charts import _user_dir, chart_path, evict_charts, request_deal_trend_chart, wait_for_chart
+
+
+def _comps():
+    return [{"sq_ft": sq_ft, "rent_month": 2 * sq_ft, "close_date": "2024-01-15"} for sq_ft in range(1000, 3000, 250)]
+
+
+def test_render_in_another_worker_is_waited_on_not_missing(tmp_path, monkeypatch):
+    monkeypatch.setattr(deal_charts, "CHART_DIR", tmp_path)
+    _user_dir("u1").mkdir()
+    # Another worker claimed the render: this process has no future for it
+    (_user_dir("u1") / "abc123.rendering").touch()
+    assert wait_for_chart("u1", "abc123", timeout=0.2) == "rendering"
+
+    threading.Timer(0.1, lambda: chart_path("u1", "abc123").write_bytes(b"png")).start()
+    assert wait_for_chart("u1", "abc123", timeout=2) == "ready"
+
+    marker = _user_dir("u1") / "dead99.rendering"
+    marker.touch()
+    stale = time.time() - deal_charts.RENDER_TIMEOUT - 1
+    os.utime(marker, (stale, stale))
+    assert wait_for_chart("u1", "dead99", timeout=0.2) == "missing"
+
+
+def test_rendered_chart_is_ready_and_marker_cleared(tmp_path, monkeypatch):
+    monkeypatch.setattr(deal_charts, "CHART_DIR", tmp_path)
+    key = request_deal_trend_chart("u1", _comps(), "LeaseComp")
+    assert wait_for_chart("u1", key) == "ready"
+    assert not (_user_dir("u1") / f"{key}.rendering").exists()
+
+
+def test_a_chart_only_resolves_for_the_user_it_was_drawn_for(tmp_path, monkeypatch):
+    monkeypatch.setattr(deal_charts, "CHART_DIR", tmp_path)
+    key = request_deal_trend_chart("u1", _comps(), "LeaseComp")
+    assert wait_for_chart("u1", key) == "ready"
+    assert wait_for_chart("u2", key, timeout=0.2) == "missing"
+
+
+def test_eviction_drops_old_and_least_recently_used_charts(tmp_path, monkeypatch):
+    monkeypatch.setattr(deal_charts, "CHART_DIR", tmp_path)
+    monkeypatch.setattr(deal_charts, "CHART_MAX_FILES", 2)
+    now = time.time()
+    _user_dir("u1").mkdir()
+    for name, age in (("fresh", 10), ("recent", 20), ("older", 30), ("ancient", deal_charts.CHART_MAX_AGE + 1)):
+        path = chart_path("u1", name)
+        path.write_bytes(b"png")
+        os.utime(path, (now - age, now - age))
+    evict_charts(now)
+    assert sorted(p.stem for p in tmp_path.glob("*/*.png")) == ["fresh", "recent"]
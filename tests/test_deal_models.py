@@ -0,0 +1,124 @@
+import sqlite3
+
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+from deal_models import DealStats, _load, apply_deal_changes, close_years, feature_vector
+
+
+def _comps():
+    return [{"sq_ft": sq_ft, "rent_month": 2 * sq_ft + 300 + (sq_ft % 7) * 10, "close_date": f"2024-0{1 + i % 9}-15"}
+            for i, sq_ft in enumerate(range(1000, 6000, 250))]
+
+
+def test_sufficient_statistics_match_full_refit():
+    comps = _comps()
+    stats = DealStats()
+    for comp in comps:
+        stats.add(comp["sq_ft"], comp["rent_month"], feature_vector(comp))
+
+    model = LinearRegression().fit([[c["sq_ft"]] for c in comps], [c["rent_month"] for c in comps])
+    intercept, slope = stats.coefficients()
+    assert np.isclose(slope, model.coef_[0])
+    assert np.isclose(intercept, model.intercept_)
+
+    value, low, high = stats.predict(4200)
+    assert np.isclose(value, model.predict([[4200]])[0])
+    assert low < value < high
+
+
+def test_removing_a_row_cancels_its_addition():
+    comps = _comps()
+    stats = DealStats()
+    for comp in comps:
+        stats.add(comp["sq_ft"], comp["rent_month"], feature_vector(comp))
+    extra = {"sq_ft": 9000, "rent_month": 50000, "close_date": "2025-01-01"}
+    stats.add(extra["sq_ft"], extra["rent_month"], feature_vector(extra))
+    stats.remove(extra["sq_ft"], extra["rent_month"], feature_vector(extra))
+
+    baseline = DealStats()
+    for comp in comps:
+        baseline.add(comp["sq_ft"], comp["rent_month"], feature_vector(comp))
+    assert np.allclose(stats.coefficients(), baseline.coefficients())
+    assert np.allclose(stats.extended_coefficients(), baseline.extended_coefficients())
+
+
+def test_vectorized_seed_matches_row_by_row_statistics():
+    from deal_valuation import comps_frame, design_matrix, target_values
+    comps = _comps()
+    stats = DealStats()
+    for comp in comps:
+        stats.add(comp["sq_ft"], comp["rent_month"], feature_vector(comp))
+
+    df = comps_frame(comps)
+    X = design_matrix(df)
+    y = target_values(df, "LeaseComp")
+    assert np.allclose(X.T @ X, stats.gram)
+    assert np.allclose(X.T @ y, stats.xty)
+
+
+def test_dated_prediction_matches_two_feature_refit():
+    comps = _comps()
+    stats = DealStats()
+    for comp in comps:
+        stats.add(comp["sq_ft"], comp["rent_month"], feature_vector(comp))
+
+    X = [feature_vector(c)[1:] for c in comps]
+    model = LinearRegression().fit(X, [c["rent_month"] for c in comps])
+    years = close_years("2025-06-01")
+    value, low, high = stats.predict(4200, years)
+    assert np.isclose(value, model.predict([[4200, years]])[0])
+    assert low < value < high
+
+
+def test_undated_comps_fall_back_to_square_footage_fit():
+    comps = [{**c, "close_date": None} for c in _comps()]
+    stats = DealStats()
+    for comp in comps:
+        stats.add(comp["sq_ft"], comp["rent_month"], feature_vector(comp))
+    assert np.isclose(stats.predict(4200, close_years("2025-06-01"))[0], stats.predict(4200)[0])
+
+
+def test_time_zone_aware_close_dates_are_parsed():
+    from deal_valuation import comps_frame, design_matrix, DealValuationModel
+    comps = [{**c, "close_date": c["close_date"] + "T00:00:00Z"} for c in _comps()]
+    comps[0]["close_date"] = "2024-01-15"
+    df = comps_frame(comps)
+    assert df["close_date"].notna().all()
+    stats = DealStats()
+    for comp in comps:
+        stats.add(comp["sq_ft"], comp["rent_month"], feature_vector(comp))
+    assert np.allclose(design_matrix(df).T @ design_matrix(df), stats.gram)
+    DealValuationModel("LeaseComp").fit(comps).predict([{"sq_ft": 2000, "close_date": "2024-03-01T00:00:00+02:00"}])
+
+
+def _stats_db():
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE deal_stats (user_id TEXT, deal_type TEXT, source TEXT, n REAL, sum_x REAL, sum_y REAL,
+                                 sum_xx REAL, sum_xy REAL, sum_yy REAL, gram TEXT, xty TEXT, updated_at TEXT,
+                                 PRIMARY KEY (user_id, deal_type, source))
+    """)
+    return cursor, conn
+
+
+def test_deals_without_a_value_stay_out_of_the_statistics():
+    cursor, conn = _stats_db()
+    priced = {"sq_ft": 2000, "rent_month": 4500, "close_date": "2024-03-01", "deal_type": "lease"}
+    unpriced = {"sq_ft": 3000, "rent_month": 0, "close_date": "2024-03-01", "deal_type": "lease"}
+    apply_deal_changes("u1", [(None, priced), (None, unpriced)], cursor)
+    stats, _ = _load("u1", "LeaseComp", "deals", cursor)
+    assert stats.n == 1 and stats.sum_y == 4500
+
+    apply_deal_changes("u1", [(unpriced, {**unpriced, "rent_month": 5000})], cursor)
+    stats, _ = _load("u1", "LeaseComp", "deals", cursor)
+    assert stats.n == 2 and stats.sum_y == 9500
+
+
+def test_statistics_roll_back_with_the_deal_write():
+    cursor, conn = _stats_db()
+    deal = {"sq_ft": 2000, "rent_month": 4500, "close_date": "2024-03-01", "deal_type": "lease"}
+    apply_deal_changes("u1", [(None, deal)], cursor)
+    conn.rollback()
+    assert _load("u1", "LeaseComp", "deals", cursor) == (None, None)
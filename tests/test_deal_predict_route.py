@@ -0,0 +1,34 @@
+import sqlite3
+
+import jwt
+from flask import Flask
+
+from blueprints import deals
+
+
+def _client(monkeypatch):
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.execute("CREATE TABLE deals (user_id TEXT, sq_ft REAL, rent_month REAL, sale_price REAL, amount REAL, "
+                 "close_date TEXT, deal_type TEXT)")
+    monkeypatch.setattr(deals, "cursor", conn.cursor())
+
+    async def get_comps(user_id, deal_type, cursor):
+        return [{"sq_ft": sq_ft, "rent_month": 2 * sq_ft, "close_date": "2024-01-15"} for sq_ft in range(1000, 3000, 250)]
+
+    monkeypatch.setattr(deals, "get_comps", get_comps)
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "test-secret"
+    app.register_blueprint(deals.deals_bp, url_prefix="/deals")
+    return app.test_client(), {"Authorization": f"Bearer {jwt.encode({'user_id': 'u1'}, 'test-secret', algorithm='HS256')}"}
+
+
+def test_non_numeric_sq_ft_is_reported_per_property(monkeypatch):
+    client, headers = _client(monkeypatch)
+    properties = [{"id": "ok", "sq_ft": 1500}, {"id": "bool", "sq_ft": True}, {"id": "text", "sq_ft": "1500"},
+                  {"id": "zero", "sq_ft": 0}]
+    response = client.post("/deals/predict", json={"deal_type": "LeaseComp", "properties": properties}, headers=headers)
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert [p["id"] for p in body["predictions"]] == ["ok"]
+    assert [(e["index"], e["id"]) for e in body["errors"]] == [(1, "bool"), (2, "text"), (3, "zero")]
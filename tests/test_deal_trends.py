@@ -0,0 +1,45 @@
+import sqlite3
+import statistics
+
+from deal_trends import downsample, lttb, trend_series
+
+
+def _cursor():
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE deals (id TEXT, amount INTEGER, close_date TEXT, user_id TEXT, sq_ft INTEGER,
+                            rent_month INTEGER, sale_price INTEGER, deal_type TEXT)
+    """)
+    rows = [(f"d{i}", 0, f"2024-{1 + i % 3:02d}-10", "u1", 1000 + i * 10, 1500 + (i * 37) % 400, 0, "lease")
+            for i in range(30)]
+    rows.append(("s1", 900000, "2024-01-10", "u1", 5000, 0, 0, "sale"))
+    cursor.executemany("INSERT INTO deals VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return cursor, rows
+
+
+def test_trend_series_aggregates_in_sql():
+    cursor, rows = _cursor()
+    series = trend_series("u1", "LeaseComp", "month", cursor)
+    assert [p["period"] for p in series] == ["2024-01", "2024-02", "2024-03"]
+
+    january = [r for r in rows if r[2].startswith("2024-01") and r[7] == "lease"]
+    assert series[0]["count"] == len(january)
+    assert series[0]["median"] == statistics.median(r[5] for r in january)
+    assert series[0]["total"] == sum(r[5] for r in january)
+
+    sales = trend_series("u1", "SaleComp", "month", cursor)
+    assert sales == [{"period": "2024-01", "count": 1, "total": 900000.0, "median": 900000.0,
+                      "price_per_sq_ft": 180.0}]
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    values = [0, 1, 0, 1, 0, 50, 0, 1, 0, 1, 0, 1]
+    selected = lttb(values, 5)
+    assert len(selected) == 5
+    assert selected[0] == 0 and selected[-1] == len(values) - 1
+    assert 5 in selected
+
+    series = [{"period": str(i), "median": v} for i, v in enumerate(values)]
+    assert downsample(series, 20) == series
+    assert len(downsample(series, 5)) == 5
@@ -0,0 +1,34 @@
+from fuzzywuzzy import fuzz
+
+from dedupe import find_duplicates, soundex
+
+
+def _contacts():
+    return [
+        ("1", "John Smith", "john.smith@acme.com"),
+        ("2", "Jon Smith", "jsmith@gmail.com"),
+        ("3", "Maria Garcia", "maria@brokerage.com"),
+        ("4", "Garcia Maria", "mgarcia@brokerage.com"),
+        ("5", "Alex Chen", "alex.chen@realty.com"),
+        ("6", "Priya Patel", "alex.chen+cre@realty.com"),
+        ("7", "Unrelated Person", "nobody@example.com"),
+    ]
+
+
+def test_soundex():
+    assert soundex("Robert") == soundex("Rupert") == "r163"
+    assert soundex("Tymczak") == "t522"
+    assert soundex("") == ""
+
+
+def test_blocked_matches_agree_with_all_pairs_scoring():
+    contacts = _contacts()
+    expected = set()
+    for i, a in enumerate(contacts):
+        for b in contacts[i + 1:]:
+            if fuzz.token_sort_ratio(a[1], b[1]) > 85 or fuzz.token_sort_ratio(a[2], b[2]) > 90:
+                expected.add((a[0], b[0]))
+
+    found = {(a, b) for a, b, _, _ in find_duplicates(contacts)}
+    assert found == expected
+    assert ("1", "2") in found and ("3", "4") in found and ("5", "6") in found
@@ -0,0 +1,70 @@
+import types
+
+import pytest
+from flask import Flask
+
+import cmd_draft_email
+from cmd_draft_email import DEFAULT_SUBJECT, FLOW, handle_draft_email
+from conversation_state import conversation_state
+
+SETTINGS = {"subject_generator_enabled": True}
+
+
+class _EchoClient:
+    """OpenAI stand-in whose draft is the prompt it was given."""
+
+    def __init__(self):
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, model, messages):
+        message = types.SimpleNamespace(content=messages[-1]["content"])
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+@pytest.fixture(autouse=True)
+def _no_activity_log(monkeypatch):
+    # The handler logs through database.py's connection; keep the drafts out of the repo's chatbot.db
+    monkeypatch.setattr(cmd_draft_email, "log_user_activity", lambda *args: None)
+
+
+def _answer(message, user_id, openai_client=None):
+    with Flask(__name__).app_context():
+        response = handle_draft_email(message, user_id, SETTINGS, openai_client)
+    return response.get_json()["answer"] if response is not None else None
+
+
+def test_only_a_pending_step_claims_bare_messages():
+    user_id = "u-draft-1"
+    conversation_state.clear(user_id, FLOW)
+    assert _answer("spring listings", user_id) is None
+
+    _answer("draft an email for mailchimp", user_id)
+    assert "Got the subject: 'spring listings'" in _answer("spring listings", user_id)
+    assert "Subject: spring listings" in _answer("aud1", user_id, _EchoClient())
+    assert conversation_state.get(user_id, FLOW)["step"] == "done"
+    assert _answer("predict deal leasecomp 2000 sq ft", user_id) is None
+
+
+def test_a_new_draft_does_not_reuse_an_earlier_subject():
+    user_id = "u-draft-3"
+    conversation_state.clear(user_id, FLOW)
+    client = _EchoClient()
+    _answer("draft an email for mailchimp", user_id)
+    _answer("old campaign", user_id)
+    _answer("aud1", user_id, client)
+
+    assert f"Subject: {DEFAULT_SUBJECT}" in _answer("audience id aud2", user_id, client)
+    _answer("draft an email for realblast", user_id)
+    assert "subject" not in conversation_state.get(user_id, FLOW)
+    assert f"Subject: {DEFAULT_SUBJECT}" in _answer("group id g1", user_id, client)
+
+
+def test_stale_flow_expires_instead_of_capturing_the_message(monkeypatch):
+    user_id = "u-draft-2"
+    conversation_state.clear(user_id, FLOW)
+    _answer("draft an email for realblast", user_id)
+
+    asked_at = conversation_state.get(user_id, FLOW)["asked_at"]
+    monkeypatch.setattr(cmd_draft_email.time, "time", lambda: asked_at + cmd_draft_email.REPLY_WINDOW + 1)
+    assert _answer("what's the weather", user_id) is None
+    assert conversation_state.get(user_id, FLOW) == {}
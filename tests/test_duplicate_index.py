@@ -0,0 +1,55 @@
+import sqlite3
+
+from duplicate_index import build_duplicate_index, get_duplicate_pairs, index_contact, index_contacts
+
+CONTACTS = [
+    ("c1", "John Smith", "john.smith@acme.com"),
+    ("c2", "Jon Smith", "johnsmith@acme.com"),
+    ("c3", "Maria Garcia", "maria@tower.io"),
+    ("c4", "Peter Parker", "pparker@dailybugle.com"),
+]
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE contacts (id TEXT PRIMARY KEY, name TEXT, email TEXT, phone TEXT, user_id TEXT)")
+    cursor.execute("CREATE TABLE contact_block_keys (user_id TEXT, block_key INTEGER, contact_id TEXT, PRIMARY KEY (user_id, block_key, contact_id))")
+    cursor.execute("CREATE TABLE duplicate_pairs (user_id TEXT, contact_id1 TEXT, contact_id2 TEXT, name_similarity INTEGER, email_similarity INTEGER, PRIMARY KEY (user_id, contact_id1, contact_id2))")
+    cursor.execute("CREATE TABLE duplicate_index_state (user_id TEXT PRIMARY KEY, built_at TEXT)")
+    cursor.executemany("INSERT INTO contacts VALUES (?, ?, ?, '', 'u1')", CONTACTS)
+    return cursor, conn
+
+
+def _pairs(cursor, conn):
+    return sorted((d["contact1"]["id"], d["contact2"]["id"]) for d in get_duplicate_pairs("u1", cursor, conn))
+
+
+def test_first_read_builds_the_index():
+    cursor, conn = _db()
+    assert _pairs(cursor, conn) == [("c1", "c2")]
+
+
+def test_writes_before_the_first_build_are_ignored():
+    cursor, conn = _db()
+    index_contacts("u1", ["c1", "c2"], cursor, conn)
+    cursor.execute("SELECT COUNT(*) FROM contact_block_keys")
+    assert cursor.fetchone()[0] == 0
+
+
+def test_incremental_writes_match_a_full_rebuild():
+    cursor, conn = _db()
+    build_duplicate_index("u1", cursor, conn)
+
+    cursor.execute("INSERT INTO contacts VALUES ('c5', 'Maria Garc1a', 'maria@tower.io', '', 'u1')")
+    index_contact("u1", "c5", cursor, conn)
+    cursor.execute("UPDATE contacts SET name = 'Pete Parker', email = 'peter.parker@dailybugle.com' WHERE id = 'c1'")
+    index_contact("u1", "c1", cursor, conn)
+    cursor.execute("DELETE FROM contacts WHERE id = 'c2'")
+    index_contact("u1", "c2", cursor, conn)
+    incremental = _pairs(cursor, conn)
+
+    build_duplicate_index("u1", cursor, conn)
+    assert incremental == _pairs(cursor, conn)
+    assert ("c3", "c5") in incremental
+    assert all("c2" not in pair for pair in incremental)
@@ -0,0 +1,18 @@
+import jwt
+from flask import Flask
+
+
+def test_field_mapping_round_trip(legacy_routes):
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "test-secret"
+    legacy_routes.register_routes(app)
+    client = app.test_client()
+    token = jwt.encode({"user_id": "u-field-map"}, "test-secret", algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.post("/field-map/save/crm", json={"contacts": {"E-mail": "email"}}, headers=headers)
+    assert response.status_code == 200
+    response = client.get("/field-map/saved/crm", headers=headers)
+    assert response.status_code == 200
+    assert response.get_json() == {"contacts": {"E-mail": "email"}}
+    assert client.get("/field-map/saved/other", headers=headers).status_code == 404
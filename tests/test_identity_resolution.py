@@ -0,0 +1,41 @@
+from identity_resolution import email_key, resolve_identities
+
+
+def test_provider_copies_merge_into_one_golden_record():
+    contacts = [
+        {"id": "apollo_1_u1", "name": "Jane Doe", "email": "Jane.Doe+cre@Gmail.com", "phone": ""},
+        {"id": "c1", "name": "Jane", "email": "janedoe@gmail.com", "phone": ""},
+        {"id": "zoominfo_9_u1", "name": "Jane M. Doe", "email": "", "phone": "+1 (212) 555-0199"},
+        {"id": "seamless_4_u1", "name": "", "email": "jane.doe@googlemail.com", "phone": "212.555.0199"},
+        {"id": "c2", "name": "Bob Lee", "email": "bob@lee.com", "phone": ""},
+    ]
+    golden = resolve_identities(contacts)
+    assert len(golden) == 2
+    jane, bob = golden
+    assert jane["id"] == "c1"
+    assert jane["name"] == "Jane"
+    assert jane["phone"] == "212.555.0199"
+    assert sorted(jane["merged_ids"]) == sorted(["c1", "apollo_1_u1", "seamless_4_u1", "zoominfo_9_u1"])
+    assert bob["merged_ids"] == ["c2"]
+
+
+def test_shared_phone_does_not_merge_different_emails():
+    contacts = [
+        {"id": "apollo_1_u1", "name": "Ann", "email": "ann@firm.com", "phone": "713-555-0100"},
+        {"id": "apollo_2_u1", "name": "Raj", "email": "raj@firm.com", "phone": "713-555-0100"},
+        {"id": "seamless_3_u1", "name": "Ann B", "email": "", "phone": "7135550100"},
+    ]
+    golden = resolve_identities(contacts)
+    assert [g["merged_ids"] for g in golden] == [["apollo_1_u1", "seamless_3_u1"], ["apollo_2_u1"]]
+
+
+def test_dots_and_tags_only_fold_for_gmail():
+    assert email_key("Jane.Doe+cre@gmail.com") == email_key("janedoe@googlemail.com")
+    assert email_key("Jane.Doe@Tower.io") == email_key("jane.doe@tower.io")
+    assert email_key("jane.doe@tower.io") != email_key("janedoe@tower.io")
+    assert email_key("sales+east@tower.io") != email_key("sales@tower.io")
+    contacts = [
+        {"id": "c1", "name": "Jane Doe", "email": "jane.doe@tower.io", "phone": ""},
+        {"id": "c2", "name": "Jan Edoe", "email": "janedoe@tower.io", "phone": ""},
+    ]
+    assert [g["merged_ids"] for g in resolve_identities(contacts)] == [["c1"], ["c2"]]
@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+from list_views import DEAL_SORT_SQL, create_list_schema, decode_cursor, keyset_page, select_fields, table_version
+
+
+def _cursor():
+    cursor = sqlite3.connect(":memory:").cursor()
+    cursor.execute("CREATE TABLE contacts (id TEXT, name TEXT, email TEXT, user_id TEXT)")
+    cursor.execute("""
+        CREATE TABLE deals (id TEXT, amount INTEGER, close_date TEXT, user_id TEXT, sq_ft INTEGER,
+                            rent_month INTEGER, sale_price INTEGER, deal_type TEXT)
+    """)
+    cursor.execute("CREATE TABLE deal_alerts (user_id TEXT, threshold REAL, deal_type TEXT)")
+    create_list_schema(cursor)
+    return cursor
+
+
+def test_writes_bump_the_owner_table_version_only():
+    cursor = _cursor()
+    assert table_version("u1", "deals", cursor) == 0
+    cursor.execute("INSERT INTO deals (id, user_id) VALUES ('d1', 'u1')")
+    cursor.execute("UPDATE deals SET amount = 5 WHERE id = 'd1'")
+    assert table_version("u1", "deals", cursor) == 2
+    cursor.execute("DELETE FROM deals WHERE id = 'd1'")
+    assert table_version("u1", "deals", cursor) == 3
+    assert table_version("u1", "contacts", cursor) == 0
+    assert table_version("u2", "deals", cursor) == 0
+
+
+def test_keyset_pages_cover_every_row_once_in_order():
+    cursor = _cursor()
+    dates = ["2024-01-01", "2024-01-01", None, "2023-05-05", "2024-03-01", None, "2023-05-05"]
+    cursor.executemany("INSERT INTO deals (id, close_date, user_id) VALUES (?, ?, 'u1')",
+                       [(f"d{i}", d) for i, d in enumerate(dates)])
+    expected = sorted(((d or "", f"d{i}") for i, d in enumerate(dates)), reverse=True)
+
+    seen, after = [], None
+    while True:
+        rows, next_cursor = keyset_page(cursor, "deals", ["id", "close_date"], ["user_id = ?"], ["u1"],
+                                        [DEAL_SORT_SQL, "id"], after, limit=2, descending=True)
+        seen.extend((r["close_date"] or "", r["id"]) for r in rows)
+        if not next_cursor:
+            break
+        after = decode_cursor(next_cursor)
+    assert seen == expected
+
+
+def test_select_fields():
+    allowed = ["id", "name", "email"]
+    assert select_fields(None, allowed) == allowed
+    assert select_fields("email, name", allowed) == ["id", "email", "name"]
+    with pytest.raises(ValueError):
+        select_fields("name,password", allowed)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
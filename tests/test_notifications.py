@@ -0,0 +1,58 @@
+import notifications
+from notifications import NotificationService
+
+
+class FakeSMTP:
+    instances = []
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        self.healthy = True
+        FakeSMTP.instances.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def noop(self):
+        return (250 if self.healthy else 421, b"")
+
+    def sendmail(self, sender, to, message):
+        self.sent.append((to, message))
+
+    def quit(self):
+        pass
+
+
+def test_emails_reuse_one_session_and_coalesce(monkeypatch):
+    FakeSMTP.instances = []
+    monkeypatch.setattr(notifications.smtplib, "SMTP", FakeSMTP)
+    service = NotificationService()
+
+    futures = [service.send_email("a@example.com", "Deal Alert", f"alert {i}") for i in range(3)]
+    futures.append(service.send_email("b@example.com", "Deal Alert", "other"))
+    service.join()
+    assert all(f.result() for f in futures)
+    service.send_email("a@example.com", "Deal Alert", "later").result(timeout=5)
+
+    assert len(FakeSMTP.instances) == 1
+    recipients = [to for to, _ in FakeSMTP.instances[0].sent]
+    assert recipients == ["a@example.com", "b@example.com", "a@example.com"]
+    assert "alert 0" in FakeSMTP.instances[0].sent[0][1] and "alert 2" in FakeSMTP.instances[0].sent[0][1]
+
+    email = service.get_metrics()["channels"]["email"]
+    assert email["sent"] == 5 and email["coalesced"] == 2 and email["failed"] == 0
+
+
+def test_unhealthy_session_is_replaced(monkeypatch):
+    FakeSMTP.instances = []
+    monkeypatch.setattr(notifications.smtplib, "SMTP", FakeSMTP)
+    service = NotificationService()
+
+    service.send_email("a@example.com", "Hi", "one").result(timeout=5)
+    FakeSMTP.instances[0].healthy = False
+    service.send_email("a@example.com", "Hi", "two").result(timeout=5)
+    assert len(FakeSMTP.instances) == 2
+    assert service.get_metrics()["smtp_connects"] == 2
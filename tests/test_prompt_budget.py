@@ -0,0 +1,43 @@
+import types
+
+import jwt
+from flask import Flask
+
+from prompt_budget import PromptBudget, count_tokens
+
+
+def test_fit_charges_and_truncates_to_what_is_left():
+    budget = PromptBudget(10)
+    assert budget.fit("short") == "short"
+    text = budget.fit("x" * 400)
+    assert text and count_tokens(text) <= 10 - count_tokens("short")
+    assert budget.remaining >= 0
+    assert budget.fit("more") == ""
+
+
+def test_market_insights_keeps_activity_when_deals_overflow(legacy_routes, monkeypatch):
+    routes = legacy_routes
+    prompts = []
+
+    def create(model, messages):
+        prompts.append(messages[-1]["content"])
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content="ok"))])
+
+    monkeypatch.setattr(routes, "openai", types.SimpleNamespace(api_key=None, ChatCompletion=types.SimpleNamespace(create=create)))
+    user_id = "u-insights"
+    routes.cursor.executemany("INSERT INTO deals (id, amount, close_date, user_id) VALUES (?, ?, ?, ?)",
+                              [(f"d{i}", 1000 + i, f"2024-01-{i % 28 + 1:02d}", user_id) for i in range(200)])
+    routes.cursor.executemany("INSERT INTO user_activity_log (user_id, action, details, timestamp) VALUES (?, ?, ?, ?)",
+                              [(user_id, "send_campaign", "{}", f"2024-02-{i + 1:02d}T10:00:00") for i in range(10)])
+    routes.conn.commit()
+
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "test-secret"
+    routes.register_routes(app)
+    token = jwt.encode({"user_id": user_id}, "test-secret", algorithm="HS256")
+    response = app.test_client().get("/market-insights", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    activity = prompts[0].split("Recent Activity:\n", 1)[1]
+    assert activity.count("- send_campaign at") == 10
+    assert "Older deals amounts" in prompts[0]
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from ttl_cache import SingleFlightCache
+from utils import realnex_query_key
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = SingleFlightCache(ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(2)
+        return ["contact"]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("k", fetch))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [["contact"]] * 8
+    assert cache.get("k", fetch) == ["contact"]
+    assert len(calls) == 1
+
+
+def test_stale_entry_is_served_while_refreshing():
+    cache = SingleFlightCache(ttl=0.01, stale_ttl=60)
+    values = iter(["old", "new"])
+    cache.get("k", lambda: next(values))
+    time.sleep(0.02)
+    assert cache.get("k", lambda: next(values)) == "old"
+    deadline = time.monotonic() + 2
+    while cache.get("k", lambda: "unexpected", ttl=60) != "new" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get("k", lambda: "unexpected", ttl=60) == "new"
+
+
+def test_failures_are_not_cached():
+    cache = SingleFlightCache(ttl=60)
+
+    def fail():
+        raise RuntimeError("RealNex down")
+
+    with pytest.raises(RuntimeError):
+        cache.get("k", fail)
+    assert cache.get("k", lambda: "ok") == "ok"
+
+
+def test_invalidate_drops_matching_entries():
+    cache = SingleFlightCache(ttl=60)
+    cache.get(("u1", "contacts"), lambda: 1)
+    cache.get(("u2", "contacts"), lambda: 2)
+    cache.invalidate(lambda key: key[0] == "u1")
+    assert cache.get(("u1", "contacts"), lambda: 3) == 3
+    assert cache.get(("u2", "contacts"), lambda: 4) == 2
+
+
+def test_query_key_ignores_param_order_and_whitespace():
+    assert realnex_query_key(1, "https://x/contacts/", {"b": "2", "a": " John  Doe "}) == \
+        realnex_query_key(1, "https://x/contacts", {"a": "John Doe", "b": "2", "c": ""})
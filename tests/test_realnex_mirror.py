@@ -0,0 +1,55 @@
+import sqlite3
+
+import httpx
+
+from realnex_mirror import (create_mirror_schema, find_companies, find_properties, refresh_mirror,
+                            resolve_property, spaces_at_property)
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    create_mirror_schema(cursor)
+    return cursor, conn
+
+
+def _client(pages, seen):
+    """Client serving the next page for every GET, recording the query parameters it was sent."""
+    def handler(request):
+        seen.append(dict(request.url.params))
+        return httpx.Response(200, json=pages.pop(0))
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def test_first_sync_is_full_then_incremental():
+    cursor, conn = _db()
+    seen = []
+    client = _client([
+        [{"id": 1, "name": "One Main", "city": "Houston", "zip": "77002", "LastModified": "2024-01-01"},
+         {"id": 2, "name": "Two Oak", "city": "Austin", "zip": "73301", "LastModified": "2024-01-02"}],
+        [{"id": 2, "name": "Two Oak Plaza", "city": "Austin", "zip": "73301", "LastModified": "2024-02-01"}],
+    ], seen)
+    assert len(refresh_mirror("u1", "properties", "token", cursor, conn, client)) == 2
+    assert len(refresh_mirror("u1", "properties", "token", cursor, conn, client)) == 1
+    assert seen == [{}, {"$filter": "LastModified gt 2024-01-02"}]
+    assert [p["id"] for p in find_properties("u1", cursor, city="houston")] == ["1"]
+    assert find_properties("u1", cursor, zip="73301")[0]["name"] == "Two Oak Plaza"
+    assert find_properties("u2", cursor, zip="73301") == []
+
+
+def test_spaces_and_companies_lookups():
+    cursor, conn = _db()
+    seen = []
+    client = _client([
+        [{"id": "p1", "name": "One Main", "address": "1 Main St"}],
+        [{"id": "s1", "property_id": "p1", "space_number": "100", "sq_ft": 2500},
+         {"id": "s2", "property_id": "p9", "space_number": "200"}],
+        [{"id": "c1", "name": "Acme Realty"}, {"id": "c2", "name": "Zenith 50% Partners"}],
+    ], seen)
+    for entity in ("properties", "spaces", "companies"):
+        refresh_mirror("u1", entity, "token", cursor, conn, client)
+    assert resolve_property("u1", "1 main st", cursor)["id"] == "p1"
+    assert [s["id"] for s in spaces_at_property("u1", "p1", cursor)] == ["s1"]
+    assert [c["id"] for c in find_companies("u1", cursor, name="acme")] == ["c1"]
+    assert [c["id"] for c in find_companies("u1", cursor, name="zenith 50%")] == ["c2"]
+    assert find_companies("u1", cursor, name="zenith 5_") == []
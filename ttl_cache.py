@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry else default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key) is not MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SingleFlightCache:
+    """LRU cache of fetched results with stale-while-revalidate and per-key request coalescing.
+
+    Entries younger than `ttl` are served as-is. For `stale_ttl` seconds after that they are still
+    served, while one background call refreshes them. Misses and older entries are fetched by the
+    first caller; concurrent callers for the same key wait on that call instead of making their own.
+    Failed fetches are never cached.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, stale_ttl=600, max_workers=4):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cache-refresh")
+        self.metrics = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def get(self, key, fetch, ttl=None):
+        """Cached value for `key`, calling `fetch()` at most once at a time per key to (re)load it."""
+        ttl = self.ttl if ttl is None else ttl
+        leader = False
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = time.monotonic() - fetched_at
+                if age < ttl:
+                    self._data.move_to_end(key)
+                    self.metrics["hits"] += 1
+                    return value
+                if age < ttl + self.stale_ttl:
+                    self.metrics["stale_hits"] += 1
+                    if key not in self._inflight:
+                        future = self._inflight[key] = Future()
+                        self._executor.submit(self._load, key, fetch, future)
+                    return value
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = Future()
+                leader = True
+                self.metrics["misses"] += 1
+            else:
+                self.metrics["coalesced"] += 1
+        if leader:
+            self._load(key, fetch, future)
+        return future.result()
+
+    def _load(self, key, fetch, future):
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+                self.metrics["errors"] += 1
+            future.set_exception(e)
+            return
+        with self._lock:
+            # A load started before invalidate() finishes for its waiters but is not stored
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+                self._data[key] = (value, time.monotonic())
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        future.set_result(value)
+
+    def invalidate(self, predicate=None):
+        """Drop every entry (and pending load) whose key matches `predicate`, or all of them without one."""
+        with self._lock:
+            for mapping in (self._data, self._inflight):
+                for key in [k for k in mapping if predicate is None or predicate(k)]:
+                    del mapping[key]
+
+    def __len__(self):
+        return len(self._data)
@@ -4,6 +4,17 @@ import hashlib
 import sqlite3
 from datetime import datetime
 
+from chat_turns import current_chat_turn
+from ttl_cache import TTLCache, MISSING, SingleFlightCache
+
+# Webhook URLs are read on every chat turn but change rarely. Only the worker handling a change
+# invalidates its copy, so the TTL bounds how long other workers keep posting to the old URL
+WEBHOOK_CACHE_TTL = 30
+_webhook_cache = TTLCache(maxsize=10000, ttl=WEBHOOK_CACHE_TTL)
+# RealNex lookups repeat within seconds (typeahead, chat retries): results are shared per user for a minute,
+# then served stale for up to ten more while one background call refreshes them
+realnex_query_cache = SingleFlightCache(maxsize=5000, ttl=60, stale_ttl=600)
+
 # Example functions
 def get_user_settings(user_id, cursor, conn):
     cursor.execute("SELECT * FROM user_settings WHERE user_id = ?", (user_id,))
@@ -29,12 +40,29 @@ def get_token(user_id, service, cursor):
     return token[0] if token else None
 
 def log_user_activity(user_id, action, details, cursor, conn):
+    turn = current_chat_turn.get()
+    if turn is not None:
+        # Inside a chat turn the entry is written with the turn's single commit
+        turn.log_activity(user_id, action, details)
+        return
     timestamp = datetime.now().isoformat()
     details_json = json.dumps(details)
     cursor.execute("INSERT INTO user_activity_log (user_id, action, details, timestamp) VALUES (?, ?, ?, ?)",
                    (user_id, action, details_json, timestamp))
     conn.commit()
 
+def get_webhook_url(user_id, cursor):
+    webhook_url = _webhook_cache.get(user_id)
+    if webhook_url is MISSING:
+        cursor.execute("SELECT webhook_url FROM webhooks WHERE user_id = ?", (user_id,))
+        row = cursor.fetchone()
+        webhook_url = row[0] if row else None
+        _webhook_cache.set(user_id, webhook_url)
+    return webhook_url
+
+def invalidate_webhook_url(user_id):
+    _webhook_cache.pop(user_id)
+
 def log_duplicate(user_id, contact_data, entity_type, cursor, conn):
     contact_hash = hashlib.md5(json.dumps(contact_data, sort_keys=True).encode()).hexdigest()
     timestamp = datetime.now().isoformat()
@@ -90,16 +118,54 @@ def sync_to_mailchimp(user_id, contact_data, cursor, conn):
 def hash_entity(entity_data, entity_type):
     return hashlib.md5(json.dumps(entity_data, sort_keys=True).encode()).hexdigest()
 
+def realnex_query_key(user_id, url, params=None):
+    """Cache key for a RealNex GET: parameter order, blank values and stray whitespace do not matter."""
+    normalized = tuple(sorted((str(k), " ".join(str(v).split())) for k, v in (params or {}).items()
+                              if v is not None and str(v).strip()))
+    return user_id, url.rstrip("/"), normalized
+
+
+def cached_realnex_get(user_id, url, token, params=None, ttl=None):
+    """JSON body of a RealNex GET through the shared query cache (callers must not mutate it).
+
+    Raises on HTTP errors, which are never cached.
+    """
+    def fetch():
+        with httpx.Client() as client:
+            response = client.get(url, headers={'Authorization': f'Bearer {token}'}, params=params)
+            response.raise_for_status()
+            return response.json()
+    return realnex_query_cache.get(realnex_query_key(user_id, url, params), fetch, ttl)
+
+
+def invalidate_realnex_queries(user_id, entity_type=None):
+    """Forget a user's cached RealNex results, only those for one entity type (e.g. "contacts") when given."""
+    def matches(key):
+        if key[0] != user_id:
+            return False
+        return entity_type is None or key[1].rsplit("/", 1)[-1].lower() == entity_type.lower()
+    realnex_query_cache.invalidate(matches)
+
+
 def search_realnex_entities(user_id, entity_type, query_params, cursor):
     token = get_token(user_id, "realnex", cursor)
     if not token:
         return []
     try:
-        with httpx.Client() as client:
-            response = client.get(
+        body = cached_realnex_get(user_id, f"https://sync.realnex.com/api/v1/Crm/{entity_type}", token, query_params)
+        return body.get("value", [])
+    except Exception:
+        return []
+
+async def get_realnex_data(user_id, entity_type, cursor):
+    token = get_token(user_id, "realnex", cursor)
+    if not token:
+        return []
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(
                 f"https://sync.realnex.com/api/v1/Crm/{entity_type}",
-                headers={'Authorization': f'Bearer {token}'},
-                params=query_params
+                headers={'Authorization': f'Bearer {token}'}
             )
             response.raise_for_status()
             return response.json().get("value", [])